@@ -0,0 +1,313 @@
+"""End-to-end benchmark of the conversation agent against a fake vLLM server.
+
+Every scenario drives AIConversationAgent.async_process with a stream of
+utterances, on a synthetic Home Assistant with thousands of entities, talking
+to an in-process stand-in for vLLM. The model time is fixed by the fake
+server, so changes in the reported numbers come from the agent, the tools,
+the prompt rendering and the API client.
+
+Reported per scenario: throughput, p50/p95/p99 turn latency, requests sent to
+the model per turn, and from a second pass under tracemalloc the peak traced
+memory and the memory allocated and not freed per turn.
+
+Usage: scripts/benchmark [--entities 2000] [--turns 200] [--scenario command ...]
+       [--json results.json] [--compare baseline.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Callable
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from homeassistant.components import conversation
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import Context, HomeAssistant
+from homeassistant.helpers import intent
+
+from ai_assistant.agent import AIConversationAgent
+from ai_assistant.api import VllmApiClient
+from ai_assistant.connection import VllmConnectionPool
+from ai_assistant.const import (
+    CONF_BASE_URL,
+    CONF_CTX_SIZE,
+    CONF_FAST_PATH,
+    CONF_HISTORY_PERSIST,
+    CONF_MODEL,
+    CONF_PROMPT_CACHE_FRIENDLY,
+    CONF_RESPONSE_CACHE,
+    CONF_STREAM,
+    CONF_TOOL_FILTERING,
+    DEFAULT_DNS_CACHE_TTL,
+    DOMAIN,
+)
+from ai_assistant.entity_index import async_get_entity_index
+from ai_assistant.entity_resolver import async_get_entity_resolver
+from ai_assistant.hass_provider import HassContextFactory
+
+from fake_home import FakeEntity, async_create_home, async_stop_home
+from fake_vllm import MODEL, FakeVllmServer
+
+# Turns run before measuring, so caches and connections are warm
+WARMUP_TURNS = 5
+
+# Turns of every conversation in the conversation scenario
+CONVERSATION_TURNS = 5
+
+# Context size the agent runs with, so the prompt of the largest synthetic home isn't trimmed
+CTX_SIZE = 131072
+
+
+class Scenario:
+    """Utterances sent to the agent and the options it runs with."""
+
+    def __init__(self, name: str, description: str, utterances: Callable[[list[FakeEntity], int], list[list[str]]], options: dict | None = None, concurrency: int = 1):
+        """Initialize the scenario.
+
+        Args:
+            name: The name of the scenario.
+            description: What the scenario measures.
+            utterances: Returns the conversations to run, each a list of utterances.
+            options: The options of the config entry.
+            concurrency: The number of conversations run at the same time.
+
+        """
+        self.name = name
+        self.description = description
+        self.utterances = utterances
+        self.options = options or {}
+        self.concurrency = concurrency
+
+
+def commands(entities: list[FakeEntity], turns: int) -> list[list[str]]:
+    """Return single turn conversations switching lights and switches."""
+    switchable = [entity for entity in entities if entity.domain in ("light", "switch")]
+    return [[f"Turn on the {switchable[index % len(switchable)].name}"] for index in range(turns)]
+
+
+def questions(entities: list[FakeEntity], turns: int) -> list[list[str]]:
+    """Return single turn conversations asking about lights and switches, answered without tools."""
+    switchable = [entity for entity in entities if entity.domain in ("light", "switch")]
+    return [[f"Is the {switchable[index % len(switchable)].name} on?"] for index in range(turns)]
+
+
+def conversations(entities: list[FakeEntity], turns: int) -> list[list[str]]:
+    """Return conversations of several turns mixing commands and questions."""
+    switchable = [entity for entity in entities if entity.domain in ("light", "switch")]
+    result = []
+    for start in range(0, turns, CONVERSATION_TURNS):
+        result.append([
+            f"Turn on the {switchable[index % len(switchable)].name}" if index % 2 else
+            f"Is the {switchable[index % len(switchable)].name} on?"
+            for index in range(start, min(turns, start + CONVERSATION_TURNS))
+        ])
+    return result
+
+
+SCENARIOS = [
+    Scenario("command", "one command per conversation, one tool round", commands),
+    Scenario("question", "one question per conversation, no tools", questions),
+    Scenario("conversation", f"{CONVERSATION_TURNS} turns per conversation, kept across restarts",
+             conversations, {CONF_HISTORY_PERSIST: True}),
+    Scenario("stream", "commands with streaming replies", commands, {CONF_STREAM: True}),
+    Scenario("concurrent", "commands, 16 conversations at a time", commands, concurrency=16),
+    Scenario("cache_friendly", "commands with the cache friendly prompt and tool filtering",
+             commands, {CONF_PROMPT_CACHE_FRIENDLY: True, CONF_TOOL_FILTERING: True}),
+    Scenario("fast_path", "commands handled without the model", commands, {CONF_FAST_PATH: True}),
+    Scenario("response_cache", "repeated questions answered from the cache",
+             lambda entities, turns: questions(entities[:40], turns), {CONF_RESPONSE_CACHE: True}),
+]
+
+
+def script_commands(server: FakeVllmServer, entities: list[FakeEntity]) -> None:
+    """Script the tool call answering every command."""
+    for entity in entities:
+        if entity.domain in ("light", "switch"):
+            server.add_tool_calls(
+                f"Turn on the {entity.name}", [("hass_turn_on", {"entity_ids": [entity.entity_id]})])
+
+
+async def async_run_turns(agent: AIConversationAgent, dialogs: list[list[str]], concurrency: int) -> tuple[list[float], int]:
+    """Run conversations through the agent and return the latency of every turn and the number of errors."""
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_dialog(utterances: list[str]) -> None:
+        nonlocal errors
+        async with semaphore:
+            conversation_id = None
+            for utterance in utterances:
+                started = time.perf_counter()
+                result = await agent.async_process(conversation.ConversationInput(
+                    text=utterance,
+                    context=Context(),
+                    conversation_id=conversation_id,
+                    device_id=None,
+                    language="en",
+                ))
+                latencies.append(time.perf_counter() - started)
+                conversation_id = result.conversation_id
+                if result.response.response_type == intent.IntentResponseType.ERROR:
+                    errors += 1
+
+    await asyncio.gather(*(run_dialog(utterances) for utterances in dialogs))
+    return latencies, errors
+
+
+async def async_run_scenario(hass: HomeAssistant, server: FakeVllmServer, entities: list[FakeEntity], scenario: Scenario, turns: int) -> dict:
+    """Run a scenario and return its results."""
+    entry = ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title=f"Benchmark {scenario.name}",
+        data={CONF_BASE_URL: server.base_url},
+        source="user",
+        options={CONF_MODEL: MODEL, CONF_CTX_SIZE: CTX_SIZE, **scenario.options},
+        unique_id=None,
+    )
+    # The entry is never set up, so collect its unload callbacks to stop the agent afterwards
+    unload_callbacks: list[Callable[[], None]] = []
+    entry.async_on_unload = unload_callbacks.append
+
+    pool = VllmConnectionPool(limit=32, keepalive_timeout=60, dns_cache_ttl=DEFAULT_DNS_CACHE_TTL)
+    client = VllmApiClient(base_url=server.base_url, timeout=60, session=pool.session)
+    agent = AIConversationAgent(hass, entry, client)
+    if agent.history_storage is not None:
+        await agent.history_storage.async_load()
+    try:
+        await async_run_turns(agent, scenario.utterances(entities, WARMUP_TURNS), scenario.concurrency)
+
+        requests = server.requests
+        started = time.perf_counter()
+        latencies, errors = await async_run_turns(
+            agent, scenario.utterances(entities, turns), scenario.concurrency)
+        elapsed = time.perf_counter() - started
+        requests = server.requests - requests
+
+        tracemalloc.start()
+        before, _peak = tracemalloc.get_traced_memory()
+        await async_run_turns(agent, scenario.utterances(entities, turns), scenario.concurrency)
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        for unload in unload_callbacks:
+            unload()
+        if agent.history_storage is not None:
+            await agent.history_storage.async_stop()
+        await pool.async_close()
+
+    latencies.sort()
+    return {
+        "turns": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "model_requests_per_turn": requests / len(latencies),
+        "peak_kib": peak / 1024,
+        "retained_kib_per_turn": (after - before) / 1024 / len(latencies),
+    }
+
+
+async def async_main(args: argparse.Namespace) -> dict:
+    """Set up the synthetic home and the fake server and run the selected scenarios."""
+    server = FakeVllmServer(ttft=args.ttft, tokens_per_second=args.tokens_per_second)
+    await server.async_start()
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass, entities = await async_create_home(config_dir, args.entities)
+        try:
+            HassContextFactory.set_instance(hass)
+            async_get_entity_index(hass)
+            async_get_entity_resolver(hass)
+            script_commands(server, entities)
+
+            sys.stdout.write(
+                f"{len(entities)} entities, {args.turns} turns per scenario, "
+                f"model time to first token {args.ttft * 1000:.0f} ms at {args.tokens_per_second:.0f} tokens/s\n\n")
+            _write_row("scenario", "turns/s", "p50 ms", "p95 ms", "p99 ms", "req/turn", "peak KiB", "KiB/turn", "errors")
+
+            results = {}
+            for scenario in SCENARIOS:
+                if args.scenario and scenario.name not in args.scenario:
+                    continue
+                result = results[scenario.name] = await async_run_scenario(
+                    hass, server, entities, scenario, args.turns)
+                _write_row(
+                    scenario.name,
+                    f"{result['throughput']:.1f}",
+                    f"{result['p50_ms']:.1f}",
+                    f"{result['p95_ms']:.1f}",
+                    f"{result['p99_ms']:.1f}",
+                    f"{result['model_requests_per_turn']:.2f}",
+                    f"{result['peak_kib']:.0f}",
+                    f"{result['retained_kib_per_turn']:.1f}",
+                    str(result["errors"]),
+                )
+            return results
+        finally:
+            await async_stop_home(hass)
+            await server.async_stop()
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Write the change of every metric against a baseline and return whether any latency regressed."""
+    regressed = False
+    sys.stdout.write(f"\nChange against the baseline, regressions above {threshold:.0f}% are flagged\n")
+    for name, result in results.items():
+        if (previous := baseline.get(name)) is None:
+            continue
+        changes = []
+        for metric in ("throughput", "p50_ms", "p95_ms", "p99_ms"):
+            change = (result[metric] - previous[metric]) / previous[metric] * 100 if previous[metric] else 0.0
+            worse = -change if metric == "throughput" else change
+            flag = " !" if worse > threshold else ""
+            regressed = regressed or bool(flag)
+            changes.append(f"{metric} {change:+.1f}%{flag}")
+        sys.stdout.write(f"  {name:<16} {', '.join(changes)}\n")
+    return regressed
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        epilog="scenarios: " + "; ".join(f"{scenario.name}: {scenario.description}" for scenario in SCENARIOS),
+    )
+    parser.add_argument("--entities", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--ttft", type=float, default=0.02, help="model time to first token in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=1000.0)
+    parser.add_argument("--scenario", action="append", choices=[scenario.name for scenario in SCENARIOS])
+    parser.add_argument("--json", type=Path, help="write the results to this file")
+    parser.add_argument("--compare", type=Path, help="compare with the results in this file")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percentage flagged as a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(async_main(args))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.compare and compare(results, json.loads(args.compare.read_text()), args.threshold):
+        sys.exit(1)
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    """Return a percentile of sorted values."""
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+
+def _write_row(*columns: str) -> None:
+    """Write a row of the results table."""
+    sys.stdout.write(f"{columns[0]:<16}" + "".join(f"{column:>10}" for column in columns[1:]) + "\n")
+
+
+if __name__ == "__main__":
+    main()
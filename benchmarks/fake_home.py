@@ -0,0 +1,132 @@
+"""Synthetic Home Assistant instance with thousands of entities.
+
+Builds a real HomeAssistant core in a temporary config directory, with the
+registries and the exposed entity settings the integration reads, and fills
+its state machine with entities spread over areas and domains. Services of
+those domains are stood in for by handlers that only update the states, so
+tool calls cost what the integration and the core cost, not device I/O.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+import random
+
+from homeassistant.components.homeassistant.exposed_entities import (
+    DATA_EXPOSED_ENTITIES,
+    ExposedEntities,
+)
+from homeassistant.config_entries import ConfigEntries
+from homeassistant.const import ATTR_ENTITY_ID, ATTR_FRIENDLY_NAME
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.helpers import (
+    area_registry,
+    device_registry,
+    entity_registry,
+    floor_registry,
+    label_registry,
+)
+
+AREAS = [
+    "Living Room", "Kitchen", "Dining Room", "Hallway", "Office", "Garage",
+    "Master Bedroom", "Guest Bedroom", "Kids Room", "Bathroom", "Basement", "Garden",
+]
+
+# Domains of the synthetic entities, with their share of the entities, their states and services
+DOMAINS = {
+    "light": (0.35, ["on", "off"], {"turn_on": "on", "turn_off": "off", "toggle": None}),
+    "switch": (0.2, ["on", "off"], {"turn_on": "on", "turn_off": "off", "toggle": None}),
+    "sensor": (0.25, ["21.5", "22.0", "48", "1013"], {}),
+    "cover": (0.06, ["open", "closed"], {"open_cover": "open", "close_cover": "closed", "toggle": None}),
+    "lock": (0.04, ["locked", "unlocked"], {"lock": "locked", "unlock": "unlocked"}),
+    "fan": (0.04, ["on", "off"], {"turn_on": "on", "turn_off": "off", "toggle": None}),
+    "media_player": (0.03, ["playing", "idle", "off"], {"turn_on": "on", "turn_off": "off", "media_play": "playing"}),
+    "climate": (0.03, ["heat", "cool", "off"], {"turn_on": "heat", "turn_off": "off", "set_temperature": None}),
+}
+
+TOGGLED_STATES = {"on": "off", "off": "on", "open": "closed", "closed": "open"}
+
+
+class FakeEntity:
+    """A synthetic entity."""
+
+    def __init__(self, entity_id: str, name: str, area: str):
+        """Initialize the entity."""
+        self.entity_id = entity_id
+        self.name = name
+        self.area = area
+
+    @property
+    def domain(self) -> str:
+        """Return the domain of the entity."""
+        return self.entity_id.split(".")[0]
+
+
+async def async_create_home(config_dir: str, entities: int, seed: int = 0) -> tuple[HomeAssistant, list[FakeEntity]]:
+    """Create a running Home Assistant with a number of exposed entities."""
+    hass = HomeAssistant(config_dir)
+    hass.config_entries = ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    await floor_registry.async_load(hass)
+    await label_registry.async_load(hass)
+    await area_registry.async_load(hass)
+    await device_registry.async_load(hass)
+    await entity_registry.async_load(hass)
+    exposed_entities = ExposedEntities(hass)
+    await exposed_entities.async_initialize()
+    hass.data[DATA_EXPOSED_ENTITIES] = exposed_entities
+    await hass.async_start()
+
+    areas = area_registry.async_get(hass)
+    area_ids = {name: areas.async_create(name).id for name in AREAS}
+    registry = entity_registry.async_get(hass)
+
+    created = []
+    rng = random.Random(seed)
+    for index, (domain, area) in enumerate(_assign_domains(entities, rng)):
+        name = f"{area} {domain.replace('_', ' ').title()} {index}"
+        entry = registry.async_get_or_create(
+            domain, "benchmark", f"{domain}_{index}",
+            suggested_object_id=name.lower().replace(" ", "_"))
+        registry.async_update_entity(entry.entity_id, area_id=area_ids[area])
+        states = DOMAINS[domain][1]
+        hass.states.async_set(entry.entity_id, rng.choice(states), {
+            ATTR_FRIENDLY_NAME: name,
+        })
+        created.append(FakeEntity(entry.entity_id, name, area))
+
+    for domain, (_share, _states, services) in DOMAINS.items():
+        for service, new_state in services.items():
+            hass.services.async_register(domain, service, _state_setter(hass, new_state))
+
+    await hass.async_block_till_done()
+    return hass, created
+
+
+async def async_stop_home(hass: HomeAssistant) -> None:
+    """Stop Home Assistant."""
+    await hass.async_stop(force=True)
+
+
+def _assign_domains(entities: int, rng: random.Random) -> Iterator[tuple[str, str]]:
+    """Yield the domain and area of every entity, following the domain shares."""
+    domains = list(DOMAINS)
+    weights = [DOMAINS[domain][0] for domain in domains]
+    for _index in range(entities):
+        yield rng.choices(domains, weights)[0], rng.choice(AREAS)
+
+
+def _state_setter(hass: HomeAssistant, new_state: str | None):
+    """Return a service handler setting the state of the targeted entities."""
+
+    async def handle(call: ServiceCall) -> None:
+        entity_ids = call.data.get(ATTR_ENTITY_ID) or []
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        for entity_id in entity_ids:
+            if (state := hass.states.get(entity_id)) is None:
+                continue
+            value = new_state or TOGGLED_STATES.get(state.state, state.state)
+            hass.states.async_set(entity_id, value, state.attributes)
+
+    return handle
@@ -0,0 +1,175 @@
+"""In-process stand-in for the vLLM OpenAI compatible server.
+
+Serves /v1/models and /v1/chat/completions from an aiohttp test server. Replies
+are scripted per user message: a scripted message is answered with its tool
+calls first, and with a short text once the tool results come back. Every reply
+waits for the configured time to first token and then generates its tokens at
+the configured rate, streamed as server-sent events when the request asks for it.
+Like vLLM, a streamed reply only ends with the token usage when the request sets
+stream_options.include_usage.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+MODEL = "meetkai/functionary-small-v2.5"
+
+
+class FakeVllmServer:
+    """A scripted, rate limited chat completion server."""
+
+    def __init__(
+        self,
+        ttft: float = 0.05,
+        tokens_per_second: float = 500.0,
+        chunk_tokens: int = 4,
+        reply: str = "Done, the house is in order.",
+    ) -> None:
+        """Initialize the server.
+
+        Args:
+            ttft: The seconds before the first token of every reply.
+            tokens_per_second: The rate tokens are generated at after the first one.
+            chunk_tokens: The number of tokens sent per streamed chunk.
+            reply: The text of replies that don't call a tool.
+
+        """
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = chunk_tokens
+        self.reply = reply
+        self.script: dict[str, list[tuple[str, dict]]] = {}
+        self.requests = 0
+        self.request_bytes = 0
+        self._server: TestServer | None = None
+
+    @property
+    def base_url(self) -> str:
+        """Return the base URL of the running server."""
+        return str(self._server.make_url("")).rstrip("/")
+
+    def add_tool_calls(self, utterance: str, tool_calls: list[tuple[str, dict]]) -> None:
+        """Script the tool calls, as names and arguments, the model answers a user message with."""
+        self.script[utterance] = tool_calls
+
+    async def async_start(self) -> None:
+        """Start serving on a free local port."""
+        app = web.Application()
+        app.router.add_get("/v1/models", self._handle_models)
+        app.router.add_post("/v1/chat/completions", self._handle_chat)
+        self._server = TestServer(app, host="127.0.0.1")
+        await self._server.start_server()
+
+    async def async_stop(self) -> None:
+        """Stop serving."""
+        if self._server is not None:
+            await self._server.close()
+
+    async def _handle_models(self, request: web.Request) -> web.Response:
+        """Answer the model list."""
+        return web.json_response({
+            "object": "list",
+            "data": [{"id": MODEL, "object": "model", "owned_by": "vllm"}],
+        })
+
+    async def _handle_chat(self, request: web.Request) -> web.StreamResponse:
+        """Answer a chat completion, streamed or not."""
+        body = await request.read()
+        self.requests += 1
+        self.request_bytes += len(body)
+        data = json.loads(body)
+        content, tool_calls = self._reply_to(data)
+        usage = {
+            "prompt_tokens": len(body) // 4,
+            "completion_tokens": _count_tokens(content, tool_calls),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if data.get("stream"):
+            include_usage = (data.get("stream_options") or {}).get("include_usage", False)
+            return await self._stream(request, content, tool_calls, usage if include_usage else None)
+
+        await asyncio.sleep(self.ttft + usage["completion_tokens"] / self.tokens_per_second)
+        return web.json_response({
+            "id": f"chat-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": MODEL,
+            "choices": [{
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": content,
+                    "tool_call_id": None,
+                    "tool_calls": tool_calls,
+                },
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": usage,
+        })
+
+    async def _stream(self, request: web.Request, content: str | None, tool_calls: list[dict] | None, usage: dict | None) -> web.StreamResponse:
+        """Stream a reply as server-sent events, followed by a usage chunk if usage is given."""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(self.ttft)
+
+        async def send_chunk(choices: list[dict], chunk_usage: dict | None = None) -> None:
+            chunk = {
+                "id": f"chat-{self.requests}",
+                "object": "chat.completion.chunk",
+                "model": MODEL,
+                "choices": choices,
+            }
+            if chunk_usage is not None:
+                chunk["usage"] = chunk_usage
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        async def send(delta: dict, finish_reason: str | None = None) -> None:
+            await send_chunk([{"index": 0, "delta": delta, "finish_reason": finish_reason}])
+
+        if tool_calls:
+            for index, tool_call in enumerate(tool_calls):
+                await send({"tool_calls": [{**tool_call, "index": index}]})
+            await asyncio.sleep(_count_tokens(content, tool_calls) / self.tokens_per_second)
+        else:
+            words = (content or "").split(" ")
+            for start in range(0, len(words), self.chunk_tokens):
+                piece = " ".join(words[start:start + self.chunk_tokens])
+                await send({"content": piece if start == 0 else f" {piece}"})
+                await asyncio.sleep(self.chunk_tokens / self.tokens_per_second)
+
+        await send({}, "tool_calls" if tool_calls else "stop")
+        if usage is not None:
+            await send_chunk([], usage)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def _reply_to(self, data: dict) -> tuple[str | None, list[dict] | None]:
+        """Return the scripted content or tool calls answering the last message."""
+        messages = data.get("messages") or []
+        last = messages[-1] if messages else {}
+        if last.get("role") == "user" and data.get("tool_choice") != "none":
+            if tool_calls := self.script.get(last.get("content") or ""):
+                return None, [
+                    {
+                        "id": f"call_{self.requests}_{index}",
+                        "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(arguments)},
+                    }
+                    for index, (name, arguments) in enumerate(tool_calls)
+                ]
+        return self.reply, None
+
+
+def _count_tokens(content: str | None, tool_calls: list[dict] | None) -> int:
+    """Return a rough token count of a reply."""
+    text = content or json.dumps(tool_calls or [])
+    return max(1, len(text) // 4)
@@ -0,0 +1,130 @@
+"""Micro-benchmark of the JSON paths used for chat requests and responses.
+
+Compares the standard library json module, as used through aiohttp's json=
+argument and response.json(), with the serializer of the integration, on a
+conversation shaped like the ones the agent sends to vLLM: a system prompt
+listing the exposed entities, user and assistant turns, tool calls and tool
+results.
+
+Usage: python benchmarks/json_serialization.py [--turns 20] [--entities 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+from pathlib import Path
+import sys
+import timeit
+
+SERIALIZATION_PATH = Path(__file__).parents[1] / \
+    "custom_components" / "ai_assistant" / "serialization.py"
+
+
+def load_serialization():
+    """Load the serializer without importing the integration and Home Assistant."""
+    spec = importlib.util.spec_from_file_location(
+        "ai_assistant_serialization", SERIALIZATION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_messages(turns: int, entities: int) -> list[dict]:
+    """Build a conversation with the given number of turns and exposed entities."""
+    entity_lines = "\n".join(
+        f"- names: Living Room Light {index}\n  domain: light\n  state: 'on'\n"
+        f"  areas: Living Room\n  attributes:\n    brightness: {index % 255}\n"
+        for index in range(entities)
+    )
+    messages = [{
+        "role": "system",
+        "content": "You are a voice assistant for Home Assistant.\n"
+        "Answer questions about the world truthfully.\n"
+        f"An overview of the areas and the devices in this smart home:\n{entity_lines}",
+    }]
+    for turn in range(turns):
+        call_id = f"call_{turn:04d}"
+        messages.extend([
+            {"role": "user", "content": f"Turn on the living room light {turn} and set it to 40% please"},
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": call_id,
+                    "type": "function",
+                    "function": {
+                        "name": "hass_turn_on",
+                        "arguments": json.dumps({"entity_ids": [f"light.living_room_light_{turn}"]}),
+                    },
+                }],
+            },
+            {
+                "role": "tool",
+                "tool_call_id": call_id,
+                "name": "hass_turn_on",
+                "content": f"Successfully turned on light.living_room_light_{turn}",
+            },
+            {"role": "assistant", "content": f"Living room light {turn} is on at 40% brightness. Ünïcödé ✓"},
+        ])
+    return messages
+
+
+def build_response(messages: list[dict]) -> dict:
+    """Build a chat completion response to the conversation."""
+    return {
+        "id": "chat-0123456789",
+        "object": "chat.completion",
+        "created": 1700000000,
+        "model": "meetkai/functionary-small-v2.5",
+        "choices": [{
+            "index": 0,
+            "message": messages[-1],
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 4000, "completion_tokens": 20, "total_tokens": 4020},
+    }
+
+
+def bench(name: str, function, number: int) -> float:
+    """Time a function and write the result."""
+    best = min(timeit.repeat(function, number=number, repeat=5)) / number
+    sys.stdout.write(f"  {name:<28} {best * 1e6:10.1f} us\n")
+    return best
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--entities", type=int, default=200)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    serialization = load_serialization()
+    messages = build_messages(args.turns, args.entities)
+    request = {"model": "model", "messages": messages, "temperature": 0.1, "top_p": 1.0, "max_tokens": 500}
+    response = build_response(messages)
+    encoded_request = serialization.json_dumps(request)
+    encoded_response = serialization.json_dumps(response)
+
+    sys.stdout.write(
+        f"Request body {len(encoded_request) / 1024:.1f} KiB, response body "
+        f"{len(encoded_response) / 1024:.1f} KiB, serializer backend: {serialization.JSON_BACKEND}\n")
+
+    sys.stdout.write("Encode request\n")
+    baseline = bench("json.dumps (aiohttp json=)",
+                     lambda: json.dumps(request).encode("utf-8"), args.number)
+    fast = bench("json_dumps", lambda: serialization.json_dumps(request), args.number)
+    sys.stdout.write(f"  speedup {baseline / fast:.1f}x\n")
+
+    sys.stdout.write("Decode response\n")
+    baseline = bench("json.loads (response.json())",
+                     lambda: json.loads(encoded_response.decode("utf-8")), args.number)
+    fast = bench("json_loads", lambda: serialization.json_loads(encoded_response), args.number)
+    sys.stdout.write(f"  speedup {baseline / fast:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,21 +9,50 @@ from .agent import AIConversationAgent
 
 from homeassistant.components import conversation
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryNotReady
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant
 
 from .api import VllmApiClient
+from .balancer import parse_base_urls
+from .resilience import CircuitBreaker, RetryPolicy
+from .connection import VllmConnectionPool
 from .const import (
     DOMAIN, CONF_BASE_URL,
+    DATA_AGENT,
+    DATA_CLIENT,
+    DATA_CONNECTION_POOL,
+    DATA_COORDINATOR,
     CONF_TIMEOUT,
-    DEFAULT_TIMEOUT
+    CONF_EXTRA_BASE_URLS,
+    CONF_ROUTING_STRATEGY,
+    CONF_RETRIES,
+    CONF_HEDGING,
+    CONF_HEDGE_PERCENTILE,
+    CONF_POOL_SIZE,
+    CONF_KEEPALIVE_TIMEOUT,
+    CONF_UNIX_SOCKET,
+    DEFAULT_TIMEOUT,
+    DEFAULT_EXTRA_BASE_URLS,
+    DEFAULT_ROUTING_STRATEGY,
+    DEFAULT_RETRIES,
+    DEFAULT_RETRY_BASE_DELAY,
+    DEFAULT_RETRY_MAX_DELAY,
+    DEFAULT_HEDGING,
+    DEFAULT_HEDGE_PERCENTILE,
+    DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+    DEFAULT_CIRCUIT_RESET_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_DNS_CACHE_TTL,
+    DEFAULT_UNIX_SOCKET,
 )
+from .calendar_cache import async_get_calendar_cache, async_release_calendar_cache
 from .coordinator import AIConversationDataUpdateCoordinator
-from .exceptions import (
-    ApiClientError
-)
+from .entity_index import async_get_entity_index, async_release_entity_index
+from .entity_resolver import async_get_entity_resolver, async_release_entity_resolver
 from .hass_provider import HassContextFactory
+from .history import async_remove_conversation_history_storage
+from .prompt import async_remove_prompt_template_cache
 
 
 # https://developers.home-assistant.io/docs/config_entries_index/#setting-up-an-entry
@@ -33,39 +62,97 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up AI Assistant using UI."""
     HassContextFactory.set_instance(hass)
     hass.data.setdefault(DOMAIN, {})
+    async_get_entity_index(hass)
+    async_get_entity_resolver(hass)
+    async_get_calendar_cache(hass)
+    pool = VllmConnectionPool(
+        limit=int(entry.options.get(CONF_POOL_SIZE, DEFAULT_POOL_SIZE)),
+        keepalive_timeout=entry.options.get(
+            CONF_KEEPALIVE_TIMEOUT, DEFAULT_KEEPALIVE_TIMEOUT),
+        dns_cache_ttl=DEFAULT_DNS_CACHE_TTL,
+        unix_socket=entry.options.get(CONF_UNIX_SOCKET, DEFAULT_UNIX_SOCKET) or None,
+    )
     client = VllmApiClient(
         base_url=entry.data[CONF_BASE_URL],
         timeout=entry.options.get(CONF_TIMEOUT, DEFAULT_TIMEOUT),
-        session=async_get_clientsession(hass),
+        session=pool.session,
+        extra_base_urls=parse_base_urls(
+            entry.options.get(CONF_EXTRA_BASE_URLS, DEFAULT_EXTRA_BASE_URLS)),
+        routing_strategy=entry.options.get(
+            CONF_ROUTING_STRATEGY, DEFAULT_ROUTING_STRATEGY),
+        retry_policy=RetryPolicy(
+            int(entry.options.get(CONF_RETRIES, DEFAULT_RETRIES)),
+            DEFAULT_RETRY_BASE_DELAY,
+            DEFAULT_RETRY_MAX_DELAY,
+        ),
+        circuit_breaker=CircuitBreaker(
+            DEFAULT_CIRCUIT_FAILURE_THRESHOLD, DEFAULT_CIRCUIT_RESET_TIMEOUT),
+        hedge_percentile=entry.options.get(
+            CONF_HEDGE_PERCENTILE, DEFAULT_HEDGE_PERCENTILE)
+        if entry.options.get(CONF_HEDGING, DEFAULT_HEDGING) else None,
     )
 
-    hass.data[DOMAIN][entry.entry_id] = coordinator = AIConversationDataUpdateCoordinator(
+    coordinator = AIConversationDataUpdateCoordinator(
         hass,
         client,
     )
-    # https://developers.home-assistant.io/docs/integration_fetching_data#coordinated-single-api-poll-for-data-for-all-entities
-    await coordinator.async_config_entry_first_refresh()
 
     try:
-        response = await client.async_get_heartbeat()
-        if not response:
-            raise ApiClientError("Invalid vLLM server")
-    except ApiClientError as err:
-        raise ConfigEntryNotReady(err) from err
-
+        # https://developers.home-assistant.io/docs/integration_fetching_data#coordinated-single-api-poll-for-data-for-all-entities
+        # The first refresh probes every server and fills the model catalog
+        await coordinator.async_config_entry_first_refresh()
+    except Exception:
+        await pool.async_close()
+        raise
+
+    async def async_close_pool(_event: Event) -> None:
+        await pool.async_close()
+
+    # The pool doesn't use the session Home Assistant closes on shutdown, so it's closed here
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, async_close_pool))
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
-    conversation.async_set_agent(
-        hass, entry, AIConversationAgent(hass, entry, client))
+    agent = AIConversationAgent(hass, entry, client)
+    if agent.history_storage is not None:
+        await agent.history_storage.async_load()
+    else:
+        await async_remove_conversation_history_storage(hass, entry.entry_id)
+    hass.data[DOMAIN][entry.entry_id] = {
+        DATA_CONNECTION_POOL: pool,
+        DATA_CLIENT: client,
+        DATA_COORDINATOR: coordinator,
+        DATA_AGENT: agent,
+    }
+
+    conversation.async_set_agent(hass, entry, agent)
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload AI conversation."""
     conversation.async_unset_agent(hass, entry)
+    if (entry_data := hass.data[DOMAIN].pop(entry.entry_id, None)) is not None:
+        await entry_data[DATA_CONNECTION_POOL].async_close()
+        if (history_storage := entry_data[DATA_AGENT].history_storage) is not None:
+            await history_storage.async_stop()
+
+    if not any(
+        other_entry.entry_id in hass.data[DOMAIN]
+        for other_entry in hass.config_entries.async_entries(DOMAIN)
+    ):
+        async_release_calendar_cache(hass)
+        async_release_entity_resolver(hass)
+        async_release_entity_index(hass)
     return True
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove AI conversation."""
+    async_remove_prompt_template_cache(hass, entry.entry_id)
+    await async_remove_conversation_history_storage(hass, entry.entry_id)
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload AI conversation."""
     await async_unload_entry(hass, entry)
@@ -0,0 +1,166 @@
+"""This module limits how many conversation turns query the model at the same time."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+import heapq
+import itertools
+import time
+
+import async_timeout
+
+from .exceptions import TurnRejectedError
+from .tracing import add_span_time
+
+# Priorities of turns, lower values are admitted first
+PRIORITY_VOICE = 0
+PRIORITY_USER = 1
+PRIORITY_AUTOMATION = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_VOICE: "voice",
+    PRIORITY_USER: "user",
+    PRIORITY_AUTOMATION: "automation",
+}
+
+
+def turn_priority(device_id: str | None, user_id: str | None) -> int:
+    """Return the priority of a turn.
+
+    Turns from a device, such as a voice satellite, have someone waiting for a
+    spoken answer. Turns with a user, such as from the app, come next. Turns
+    without either were started by an automation or a script.
+    """
+    if device_id is not None:
+        return PRIORITY_VOICE
+    if user_id is not None:
+        return PRIORITY_USER
+    return PRIORITY_AUTOMATION
+
+
+class AdmissionStats:
+    """Counters describing admitted, queued and rejected turns."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.admitted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary, with times in milliseconds."""
+        return {
+            "admitted": dict(self.admitted),
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "max_queue_depth": self.max_queue_depth,
+            "average_wait_ms": self.wait_time / self.queued * 1000 if self.queued else 0.0,
+            "max_wait_ms": self.max_wait_time * 1000,
+        }
+
+
+class AdmissionController:
+    """Admits a bounded number of turns at a time, queueing the others by priority.
+
+    Turns beyond the limit wait in a priority queue, so a voice request is
+    served before turns of automations that arrived earlier. Turns of the same
+    priority are served in the order they arrived. With a queue limit, a turn
+    arriving at a full queue is rejected right away instead of waiting. A turn
+    is also rejected once it has waited longer than its timeout.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int | None = None) -> None:
+        """Initialize the controller.
+
+        Args:
+            max_concurrent: The number of turns admitted at the same time.
+            max_queued: The number of turns that may wait, any number if None.
+
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.active = 0
+        self.stats = AdmissionStats()
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of turns waiting to be admitted."""
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def async_admit(self, priority: int, timeout: float | None = None) -> AsyncIterator[None]:
+        """Wait until a turn is admitted and release its slot when it is done.
+
+        Raises TurnRejectedError when the queue is full, or when no slot became
+        free within timeout seconds.
+        """
+        try:
+            async with async_timeout.timeout(max(timeout, 0) if timeout is not None else None):
+                await self._async_acquire(priority)
+        except asyncio.TimeoutError as err:
+            self.stats.timed_out += 1
+            raise TurnRejectedError("no slot became free in time") from err
+        self.stats.admitted[PRIORITY_NAMES[priority]] += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    def as_dict(self) -> dict:
+        """Return the state of the controller for diagnostics."""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "active": self.active,
+            "queue_depth": self.queue_depth,
+            **self.stats.as_dict(),
+        }
+
+    async def _async_acquire(self, priority: int) -> None:
+        """Take a slot, waiting in the queue when there is none."""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return
+
+        if self.max_queued is not None and len(self._waiters) >= self.max_queued:
+            self.stats.rejected += 1
+            raise TurnRejectedError("too many turns are waiting")
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.stats.queued += 1
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, len(self._waiters))
+        started = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the turn was cancelled
+                self._release()
+            else:
+                self._waiters = [waiter for waiter in self._waiters if waiter[2] is not future]
+                heapq.heapify(self._waiters)
+            raise
+        finally:
+            waited = time.monotonic() - started
+            self.stats.wait_time += waited
+            self.stats.max_wait_time = max(self.stats.max_wait_time, waited)
+            add_span_time("admission_wait_ms", waited)
+
+    def _release(self) -> None:
+        """Hand the slot of a finished turn to the next waiting turn, or free it."""
+        while self._waiters:
+            _priority, _sequence, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
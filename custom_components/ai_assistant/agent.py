@@ -4,41 +4,106 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import time
 from typing import Literal
 
-from .tools import TOOL_FUNCTIONS, tools, suggest_tool_call
+import async_timeout
+
+from .tools import TOOL_FUNCTIONS, get_tool_call_entity_ids, get_tool_schema_bundle, group_dependent_tool_calls, suggest_tool_call
 from homeassistant.components import conversation
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import MATCH_ALL
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError, TemplateError
-from homeassistant.helpers import intent, template
+from homeassistant.helpers import intent
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.util import ulid
 
 from .api import VllmApiClient
+from .context import ContextWindow, message_chars
+from .history import ConversationHistoryStorage, ConversationHistoryStore
+from .entity_index import async_get_entity_index
+from .prompt import async_get_prompt_template_cache, renders_live_state
+from .tool_selector import ToolSelection, ToolSelector
+from .response_cache import ResponseCache
+from .fast_path import FastPathMatch, FastPathMatcher
+from .response import VllmChatApiResponse, VllmChatStreamAccumulator
+from .serialization import json_dumps_str, json_loads
+from .tracing import Tracer, mark_span, set_span_attribute, span
+from .admission import AdmissionController, turn_priority
 
 from .const import (
     LOGGER,
 
+    CONF_HISTORY_MAX_CONVERSATIONS,
+    CONF_HISTORY_IDLE_TTL,
+    CONF_HISTORY_MAX_MESSAGES,
+    CONF_HISTORY_PERSIST,
+    CONF_MAX_TOOL_ROUNDS,
+    CONF_TURN_TIMEOUT,
     CONF_MODEL,
+    CONF_CTX_SIZE,
     CONF_MAX_TOKENS,
     CONF_TEMPERATURE,
     CONF_TOP_P,
     CONF_PROMPT_SYSTEM,
-
+    CONF_PROMPT_CACHE_FRIENDLY,
+    CONF_PROMPT_LIVE_STATE,
+    CONF_STREAM,
+    CONF_TOOL_FILTERING,
+    CONF_FAST_PATH,
+    CONF_MAX_CONCURRENT_TURNS,
+    CONF_MAX_QUEUED_TURNS,
+    CONF_SHED_LOAD,
+    CONF_RESPONSE_CACHE,
+    CONF_RESPONSE_CACHE_TTL,
+
+    DEFAULT_HISTORY_MAX_CONVERSATIONS,
+    DEFAULT_HISTORY_IDLE_TTL,
+    DEFAULT_HISTORY_MAX_MESSAGES,
+    DEFAULT_HISTORY_PERSIST,
+    DEFAULT_HISTORY_MAX_BYTES,
+    DEFAULT_MAX_TOOL_ROUNDS,
+    DEFAULT_TURN_TIMEOUT,
     DEFAULT_MODEL,
+    DEFAULT_CTX_SIZE,
     DEFAULT_MAX_TOKENS,
     DEFAULT_TEMPERATURE,
     DEFAULT_TOP_P,
     DEFAULT_PROMPT_SYSTEM,
+    DEFAULT_PROMPT_SYSTEM_STATIC,
+    DEFAULT_PROMPT_CACHE_FRIENDLY,
+    DEFAULT_PROMPT_LIVE_STATE,
+    DEFAULT_STREAM,
+    DEFAULT_TOOL_CALL_CONCURRENCY,
+    DEFAULT_TOOL_FILTERING,
+    DEFAULT_FAST_PATH,
+    DEFAULT_MAX_CONCURRENT_TURNS,
+    DEFAULT_MAX_QUEUED_TURNS,
+    DEFAULT_SHED_LOAD,
+    DEFAULT_RESPONSE_CACHE,
+    DEFAULT_RESPONSE_CACHE_TTL,
+
+    CONTENT_KEY,
+    ROLE_KEY,
+    TOOL_CALLS_KEY,
+    TOOL_NOT_RUN,
+    TOOL_TIMED_OUT,
+    SYSTEM_ROLE,
+    USER_ROLE,
+
+    SIGNAL_STREAM_SENTENCE,
+    TURN_LIMIT_REACHED,
+    TURN_BUSY,
+    TURN_TIMED_OUT,
 )
 from .exceptions import (
     ApiCommError,
     ApiJsonError,
-    ApiTimeoutError
+    ApiTimeoutError,
+    TurnRejectedError,
 )
-from .helpers import assistant_message, get_exposed_entities, system_message, tool_message, user_message
+from .helpers import SentenceSplitter, assistant_message, assistant_tool_call_message, get_exposed_entities, system_message, tool_message, user_message
 
 
 class AIConversationAgent(conversation.AbstractConversationAgent):
@@ -49,7 +114,58 @@ class AIConversationAgent(conversation.AbstractConversationAgent):
         self.hass = hass
         self.entry = entry
         self.client = client
-        self.history: dict[str, dict] = {}
+        self.history = ConversationHistoryStore(
+            max_conversations=int(entry.options.get(
+                CONF_HISTORY_MAX_CONVERSATIONS, DEFAULT_HISTORY_MAX_CONVERSATIONS)),
+            idle_ttl=entry.options.get(
+                CONF_HISTORY_IDLE_TTL, DEFAULT_HISTORY_IDLE_TTL) * 60,
+            max_messages=int(entry.options.get(
+                CONF_HISTORY_MAX_MESSAGES, DEFAULT_HISTORY_MAX_MESSAGES)),
+            max_bytes=DEFAULT_HISTORY_MAX_BYTES,
+        )
+        self.history_storage = None
+        if entry.options.get(CONF_HISTORY_PERSIST, DEFAULT_HISTORY_PERSIST):
+            self.history_storage = ConversationHistoryStorage(
+                hass,
+                entry.entry_id,
+                max_conversations=self.history.max_conversations,
+                idle_ttl=self.history.idle_ttl,
+            )
+        self.last_turn_rounds: list[dict] = []
+        self.prompt_templates = async_get_prompt_template_cache(
+            hass, entry.entry_id)
+        self.tool_selector = ToolSelector()
+        self.response_cache = None
+        if entry.options.get(CONF_RESPONSE_CACHE, DEFAULT_RESPONSE_CACHE):
+            self.response_cache = ResponseCache(
+                hass, entry.options.get(CONF_RESPONSE_CACHE_TTL, DEFAULT_RESPONSE_CACHE_TTL) * 60)
+            self.response_cache.async_start()
+            entry.async_on_unload(self.response_cache.async_stop)
+        self.fast_path = None
+        if entry.options.get(CONF_FAST_PATH, DEFAULT_FAST_PATH):
+            self.fast_path = FastPathMatcher(hass)
+            self.fast_path.async_start()
+            entry.async_on_unload(self.fast_path.async_stop)
+        self.tracer = Tracer()
+        self.admission = AdmissionController(
+            max_concurrent=int(entry.options.get(
+                CONF_MAX_CONCURRENT_TURNS, DEFAULT_MAX_CONCURRENT_TURNS)),
+            max_queued=int(entry.options.get(CONF_MAX_QUEUED_TURNS, DEFAULT_MAX_QUEUED_TURNS))
+            if entry.options.get(CONF_SHED_LOAD, DEFAULT_SHED_LOAD) else None,
+        )
+        self.context = ContextWindow(
+            ctx_size=int(entry.options.get(CONF_CTX_SIZE, DEFAULT_CTX_SIZE)),
+            max_tokens=int(entry.options.get(
+                CONF_MAX_TOKENS, DEFAULT_MAX_TOKENS)),
+        )
+        raw_system_prompt = entry.options.get(CONF_PROMPT_SYSTEM, DEFAULT_PROMPT_SYSTEM)
+        if (self._prompt_cache_friendly and raw_system_prompt != DEFAULT_PROMPT_SYSTEM
+                and renders_live_state(raw_system_prompt)):
+            LOGGER.warning(
+                "The custom system prompt renders entity states or the current time, which the "
+                "cache friendly layout already sends in the live state prompt. Remove them from "
+                "the system prompt, or the prompt repeats them and the server can't reuse its "
+                "prefix cache")
 
     @property
     def supported_languages(self) -> list[str] | Literal["*"]:
@@ -58,29 +174,89 @@ class AIConversationAgent(conversation.AbstractConversationAgent):
 
     async def async_process(
         self, user_input: conversation.ConversationInput
+    ) -> conversation.ConversationResult:
+        """Process a sentence, tracing where the time of the turn goes."""
+        with self.tracer.trace("turn", language=user_input.language) as turn:
+            result = await self._async_process(user_input)
+            turn.set_attribute("conversation_id", result.conversation_id)
+            return result
+
+    async def _async_process(
+        self, user_input: conversation.ConversationInput
     ) -> conversation.ConversationResult:
         """Process a sentence."""
+        # The time budget of the turn includes waiting to be admitted
+        deadline = time.monotonic() + self.entry.options.get(
+            CONF_TURN_TIMEOUT, DEFAULT_TURN_TIMEOUT)
 
-        conversation_id, messages = self._get_conversation_history(user_input)
+        with span("history"):
+            conversation_id, messages = await self._async_get_conversation_history(user_input)
 
         if not messages:
             try:
-                system_prompt = self._async_generate_prompt()
+                with span("prompt", kind="system"):
+                    system_prompt = self._async_generate_prompt()
             except TemplateError as err:
                 return self._handle_template_error(err, user_input.language, conversation_id)
             messages.append(
                 system_message(system_prompt)
             )
 
+        live_state_message = None
+        if self._prompt_cache_friendly:
+            try:
+                with span("prompt", kind="live_state"):
+                    live_state_message = system_message(
+                        self._async_generate_live_state_prompt())
+            except TemplateError as err:
+                return self._handle_template_error(err, user_input.language, conversation_id)
+
+        # Only questions opening a conversation are answered from the cache, as
+        # follow-up questions depend on what was said before
+        use_response_cache = self.response_cache is not None and all(
+            message.get(ROLE_KEY) == SYSTEM_ROLE for message in messages)
+        turn_start = len(messages)
         messages.append(
             user_message(user_input.text)
         )
 
-        assistant_response = await self._async_generate_response(messages, user_input.language, conversation_id)
+        fast_path_match = None
+        if self.fast_path is not None:
+            fast_path_match = self.fast_path.async_match(user_input.text, user_input.language)
+
+        if fast_path_match is not None:
+            set_span_attribute("path", "fast_path")
+            try:
+                assistant_response = await self._async_run_fast_path(messages, fast_path_match)
+            except HomeAssistantError as err:
+                return self._handle_homeassistant_error(err, user_input.language, conversation_id)
+        elif use_response_cache and (
+                assistant_response := self.response_cache.async_get(user_input.text, user_input.language)) is not None:
+            set_span_attribute("path", "response_cache")
+            messages.append(assistant_message(assistant_response))
+        else:
+            set_span_attribute("path", "model")
+            try:
+                async with self.admission.async_admit(
+                        turn_priority(user_input.device_id, user_input.context.user_id),
+                        timeout=deadline - time.monotonic()):
+                    assistant_response = await self._async_generate_response(messages, user_input.language, conversation_id, live_state_message, deadline)
+            except TurnRejectedError as err:
+                LOGGER.warning("Turned away a request, %s, %s requests are waiting", err, self.admission.queue_depth)
+                del messages[turn_start:]
+                return self._handle_busy(user_input.language, conversation_id)
+            if isinstance(assistant_response, conversation.ConversationResult):
+                return assistant_response
+
+            if use_response_cache and assistant_response not in (TURN_TIMED_OUT, TURN_LIMIT_REACHED):
+                self._async_store_response(
+                    user_input, assistant_response, messages[turn_start:])
 
         LOGGER.debug("Assistant response: %s", assistant_response)
 
-        self.history[conversation_id] = messages
+        messages = self.history.set(conversation_id, messages)
+        if self.history_storage is not None:
+            self.history_storage.async_save(conversation_id, messages)
 
         intent_response = intent.IntentResponse(language=user_input.language)
         intent_response.async_set_speech(assistant_response)
@@ -89,77 +265,343 @@ class AIConversationAgent(conversation.AbstractConversationAgent):
             response=intent_response, conversation_id=conversation_id
         )
 
+    async def _async_run_fast_path(self, messages: list[dict], match: FastPathMatch) -> str:
+        """Run the tool call of a command matched by the fast path and return the reply.
+
+        The tool call and its result are added to the messages as if the model
+        had made them, so follow-up questions have the same history either way.
+        """
+        LOGGER.debug("Handling the command with %s on %s locally", match.tool_name, match.entity_id)
+        tool_call = {
+            "id": f"call_{ulid.ulid()}",
+            "type": "function",
+            "function": {
+                "name": match.tool_name,
+                "arguments": json_dumps_str(match.tool_args),
+            },
+        }
+        messages.append(assistant_tool_call_message([tool_call]))
+        tool_response = await self._handle_tool_call(tool_call["id"], match.tool_name, match.tool_args)
+        messages.append(tool_response)
+
+        assistant_response = match.reply(str(tool_response.get(CONTENT_KEY) or ""))
+        messages.append(assistant_message(assistant_response))
+        return assistant_response
+
+    def _async_store_response(self, user_input: conversation.ConversationInput, assistant_response: str, turn_messages: list[dict]) -> None:
+        """Offer the answer of a turn to the response cache."""
+        tool_calls = []
+        for message in turn_messages:
+            for tool_call in message.get(TOOL_CALLS_KEY) or []:
+                _tool_call_id, tool_name, tool_args = self._parse_tool_call(tool_call)
+                tool_calls.append((tool_name, get_tool_call_entity_ids(tool_args)))
+
+        exposed_entities = get_exposed_entities(self.hass)
+        self.response_cache.async_store(
+            user_input.text,
+            user_input.language,
+            assistant_response,
+            tool_calls,
+            [record for records in exposed_entities.values() for record in records],
+        )
+
     async def query(
         self,
-        messages
-    ):
-        """Process a sentence."""
+        messages,
+        conversation_id: str | None = None,
+        use_tools: bool = True,
+        live_state_message: dict | None = None,
+        tool_selection: ToolSelection | None = None,
+    ) -> VllmChatApiResponse:
+        """Process a sentence.
+
+        With use_tools disabled the tools are still described to the model, but
+        it is asked to answer without calling any of them. A live state message
+        is only sent with this request and is not added to the messages. Only
+        the selected tools are sent when a tool selection is given.
+        """
+        messages = self._insert_live_state_message(messages, live_state_message)
         model = self.entry.options.get(CONF_MODEL, DEFAULT_MODEL)
+        stream = self.entry.options.get(CONF_STREAM, DEFAULT_STREAM)
 
         LOGGER.debug("Prompt for %s: %s", model, messages)
 
-        result = await self.client.async_chat({
+        data = {
             "model": model,
             "messages": messages,
-            "tools": tools,
-            "stream": False,
+            "stream": stream,
             "top_p": self.entry.options.get(CONF_TOP_P, DEFAULT_TOP_P),
             "temperature": self.entry.options.get(CONF_TEMPERATURE, DEFAULT_TEMPERATURE),
             "max_tokens": self.entry.options.get(CONF_MAX_TOKENS, DEFAULT_MAX_TOKENS),
-        })
+        }
+        if not use_tools:
+            data["tool_choice"] = "none"
+
+        tools_json = get_tool_schema_bundle().encoded if tool_selection is None else tool_selection.encoded
+
+        set_span_attribute("stream", stream)
+        if stream:
+            result = await self._async_query_stream(data, tools_json, conversation_id)
+        else:
+            result = await self.client.async_chat(data, tools_json, conversation_id)
+
+        set_span_attribute("prompt_tokens", result.prompt_tokens)
+        set_span_attribute("completion_tokens", (result.usage or {}).get("completion_tokens"))
+        if result.prompt_tokens:
+            self.context.estimator.calibrate(
+                sum(message_chars(message) for message in messages) + len(tools_json),
+                len(messages),
+                result.prompt_tokens,
+            )
 
         LOGGER.debug("Result %s", result)
         return result
 
-    async def _async_generate_response(self, messages: list[dict], language: str, conversation_id: str) -> str:
-        """Generate a response from a list of messages."""
+    async def _async_query_stream(self, data: dict, tools_json: bytes, conversation_id: str | None) -> VllmChatApiResponse:
+        """Query the API in streaming mode.
+
+        Every sentence of the reply is dispatched on SIGNAL_STREAM_SENTENCE as soon
+        as it is complete, so listeners such as a TTS pipeline can start speaking
+        before the model has finished generating.
+        """
+        accumulator = VllmChatStreamAccumulator()
+        splitter = SentenceSplitter()
+
+        async for delta in self.client.async_chat_stream(data, tools_json, conversation_id):
+            mark_span("ttft_ms")
+            accumulator.add(delta)
+            if delta.content:
+                for sentence in splitter.feed(delta.content):
+                    self._async_dispatch_sentence(conversation_id, sentence)
+
+        for sentence in splitter.flush():
+            self._async_dispatch_sentence(conversation_id, sentence)
+
+        return accumulator.response()
+
+    def _async_dispatch_sentence(self, conversation_id: str | None, sentence: str) -> None:
+        """Dispatch a completed sentence of a streamed reply."""
+        async_dispatcher_send(
+            self.hass, SIGNAL_STREAM_SENTENCE, conversation_id, sentence)
+
+    async def _async_generate_response(self, messages: list[dict], language: str, conversation_id: str, live_state_message: dict | None = None, deadline: float | None = None) -> str | conversation.ConversationResult:
+        """Generate a response from a list of messages.
+
+        The model is queried in rounds. As long as it answers with tool calls, the
+        tools are run and their results are sent back in the next round. After
+        the configured number of tool rounds the model is asked to answer without
+        tools, and once the time budget of the turn, which ends at deadline, is
+        spent a short apology is returned instead of an answer. A round cut short while its tools run is
+        kept, with the tools that didn't finish answered as timed out, so the
+        history records what may have been done.
+        """
+        max_tool_rounds = int(self.entry.options.get(
+            CONF_MAX_TOOL_ROUNDS, DEFAULT_MAX_TOOL_ROUNDS))
+        if deadline is None:
+            deadline = time.monotonic() + self.entry.options.get(
+                CONF_TURN_TIMEOUT, DEFAULT_TURN_TIMEOUT)
+        rounds: list[dict] = []
+        round_start = len(messages)
+        tool_calls: list[dict] = []
+        tool_responses: list[dict | None] = []
+        tool_selection = self._async_select_tools(messages)
+
         try:
-            response = await self.query(messages)
+            for round_number in range(max_tool_rounds + 1):
+                use_tools = round_number < max_tool_rounds
+                messages[:] = self._fit_context(
+                    messages, live_state_message, tool_selection)
+                round_start = len(messages)
+                tool_calls, tool_responses = [], []
+                round_stats = {"round": round_number + 1,
+                               "llm": 0.0, "tools": 0.0, "tool_calls": 0}
+                rounds.append(round_stats)
+
+                started = time.monotonic()
+                if tool_selection is not None:
+                    self.tool_selector.record_request(tool_selection)
+                with span("llm", round=round_number + 1):
+                    async with async_timeout.timeout(max(deadline - started, 0)):
+                        response = await self.query(messages, conversation_id, use_tools, live_state_message, tool_selection)
+                round_stats["llm"] = time.monotonic() - started
+
+                if not use_tools or not response.tool_calls:
+                    break
+
+                round_stats["tool_calls"] = len(response.tool_calls)
+                messages.append(
+                    assistant_tool_call_message(response.tool_calls))
+
+                started = time.monotonic()
+                tool_calls = response.tool_calls
+                tool_responses = [None] * len(tool_calls)
+                with span("tools", round=round_number + 1, tool_calls=len(tool_calls)):
+                    async with async_timeout.timeout(max(deadline - started, 0)):
+                        await self._async_handle_tool_calls(tool_calls, tool_responses)
+                messages.extend(tool_responses)
+                round_stats["tools"] = time.monotonic() - started
+
+                if tool_selection is not None and self.tool_selector.should_widen(
+                        tool_selection, response.tool_calls, tool_responses):
+                    tool_selection = self.tool_selector.full()
         except (ApiCommError, ApiJsonError, ApiTimeoutError) as err:
             return self._handle_api_error(err, language, conversation_id)
         except HomeAssistantError as err:
             return self._handle_homeassistant_error(err, language, conversation_id)
-
-        if response.tool_calls is not None and len(response.tool_calls) > 0:
-            for tool_call in response.tool_calls:
-                tool_call_response = await self._handle_tool_call(tool_call)
-
-                messages.append(tool_call_response)
-
-            assistant_response = await self._async_generate_response(messages, language, conversation_id)
+        except asyncio.TimeoutError:
+            LOGGER.warning(
+                "Conversation %s ran out of time after %s rounds", conversation_id, len(rounds))
+            if any(tool_responses):
+                # Tools ran, so keep the round and answer the calls that didn't finish
+                messages.extend(
+                    tool_response or tool_message(*self._parse_tool_call(tool_call)[:2], TOOL_NOT_RUN)
+                    for tool_call, tool_response in zip(tool_calls, tool_responses)
+                )
+            else:
+                # Nothing was done, drop the unfinished round
+                del messages[round_start:]
+            response = None
+        finally:
+            self.last_turn_rounds = rounds
+            LOGGER.debug("Turn rounds for %s: %s", conversation_id, rounds)
+
+        if response is None:
+            assistant_response = TURN_TIMED_OUT
+        elif not response.message:
+            LOGGER.warning(
+                "Conversation %s ended without an answer after %s rounds", conversation_id, len(rounds))
+            assistant_response = TURN_LIMIT_REACHED
         else:
             assistant_response = response.message
 
-            messages.append(
-                assistant_message(assistant_response)
-            )
+        messages.append(
+            assistant_message(assistant_response)
+        )
 
         return assistant_response
 
+    def _fit_context(self, messages: list[dict], live_state_message: dict | None, tool_selection: ToolSelection | None) -> list[dict]:
+        """Return the messages shortened to fit the context size along with the tools and live state."""
+        tools_json = get_tool_schema_bundle().encoded if tool_selection is None else tool_selection.encoded
+        reserved_tokens = self.context.estimator.estimate_chars(len(tools_json))
+        if live_state_message is not None:
+            reserved_tokens += self.context.estimator.estimate_message(
+                live_state_message)
+        return self.context.fit(messages, reserved_tokens)
+
+    def _async_select_tools(self, messages: list[dict]) -> ToolSelection | None:
+        """Select the tools to send for the latest user message, if tool filtering is enabled."""
+        if not self.entry.options.get(CONF_TOOL_FILTERING, DEFAULT_TOOL_FILTERING):
+            return None
+
+        utterance = messages[-1].get(CONTENT_KEY) or ""
+        tool_selection = self.tool_selector.select(
+            utterance, async_get_entity_index(self.hass).exposed_domains, messages)
+        LOGGER.debug("Selected tools: %s", tool_selection.tool_names)
+        return tool_selection
+
     def _async_generate_prompt(self) -> str:
-        """Generate a prompt for the user."""
+        """Generate a prompt for the user.
+
+        With the cache friendly layout enabled the default system prompt is
+        replaced by one that leaves out the current time, weather and entity
+        states, so it stays the same from one conversation to the next. A
+        custom system prompt is used as is, so it must leave them out itself.
+        """
         raw_system_prompt = self.entry.options.get(
             CONF_PROMPT_SYSTEM, DEFAULT_PROMPT_SYSTEM)
+        if self._prompt_cache_friendly and raw_system_prompt == DEFAULT_PROMPT_SYSTEM:
+            raw_system_prompt = DEFAULT_PROMPT_SYSTEM_STATIC
+
+        return self._async_render_prompt("system", raw_system_prompt)
+
+    def _async_generate_live_state_prompt(self) -> str:
+        """Generate the live state prompt sent with the latest user message."""
+        raw_live_state_prompt = self.entry.options.get(
+            CONF_PROMPT_LIVE_STATE, DEFAULT_PROMPT_LIVE_STATE)
+
+        return self._async_render_prompt("live_state", raw_live_state_prompt)
+
+    def _async_render_prompt(self, name: str, raw_prompt: str) -> str:
+        """Render a prompt template."""
         exposed_entities = get_exposed_entities(self.hass)
 
-        return template.Template(raw_system_prompt, self.hass).async_render(
+        return self.prompt_templates.async_render(
+            name,
+            raw_prompt,
             {
                 "ha_name": self.hass.config.location_name,
                 "exposed_entities": exposed_entities,
             },
-            parse_result=False,
         )
 
-    async def _handle_tool_call(self, tool_call: dict) -> dict:
-        """Handle tool calls."""
+    @property
+    def _prompt_cache_friendly(self) -> bool:
+        """Return whether the cache friendly prompt layout is enabled."""
+        return self.entry.options.get(CONF_PROMPT_CACHE_FRIENDLY, DEFAULT_PROMPT_CACHE_FRIENDLY)
+
+    @staticmethod
+    def _insert_live_state_message(messages: list[dict], live_state_message: dict | None) -> list[dict]:
+        """Return the messages to send, with the live state right before the latest user message.
+
+        The live state message is not kept in the history, so across turns only
+        the system prompt and the history up to the previous user message match
+        the previous request, and the server can reuse its cached prefix for
+        those. The tool rounds of one turn share the same live state message, so
+        each of them extends the request before it.
+        """
+        if live_state_message is None:
+            return messages
+
+        for index in range(len(messages) - 1, -1, -1):
+            if messages[index].get(ROLE_KEY) == USER_ROLE:
+                return messages[:index] + [live_state_message] + messages[index:]
+        return messages + [live_state_message]
+
+    async def _async_handle_tool_calls(self, tool_calls: list[dict], tool_responses: list[dict | None]) -> None:
+        """Handle the tool calls of one model turn concurrently.
+
+        Tool calls that touch the same entity are run one after the other in the
+        order the model requested them, independent tool calls run at the same
+        time. The tool messages are stored in tool_responses in the order of the
+        tool calls. A tool call that started is answered as timed out until it
+        finishes, and one that didn't start is left as None, so the caller knows
+        what was done when it stops waiting.
+        """
+        parsed_tool_calls = [self._parse_tool_call(tool_call) for tool_call in tool_calls]
+        semaphore = asyncio.Semaphore(DEFAULT_TOOL_CALL_CONCURRENCY)
+
+        async def handle_group(group: list[int]) -> None:
+            for index in group:
+                tool_call_id, tool_name, tool_args = parsed_tool_calls[index]
+                async with semaphore:
+                    tool_responses[index] = tool_message(tool_call_id, tool_name, TOOL_TIMED_OUT)
+                    tool_responses[index] = await self._handle_tool_call(
+                        tool_call_id, tool_name, tool_args)
+
+        groups = group_dependent_tool_calls(
+            [tool_args for _tool_call_id, _tool_name, tool_args in parsed_tool_calls])
+        await asyncio.gather(*(handle_group(group) for group in groups))
+
+    @staticmethod
+    def _parse_tool_call(tool_call: dict) -> tuple[str, str, dict]:
+        """Return the ID, name and arguments of a tool call."""
         tool = tool_call.get("function", {})
         tool_name = tool.get("name", "")
         tool_args = tool.get("arguments", {})
         tool_call_id = tool_call.get("id", "")
         # Ensure tool_args is a dictionary
         if isinstance(tool_args, str):
-            tool_args = json.loads(tool_args)
+            tool_args = json_loads(tool_args)
+        return tool_call_id, tool_name, tool_args
+
+    async def _handle_tool_call(self, tool_call_id: str, tool_name: str, tool_args: dict) -> dict:
+        """Handle tool calls."""
+        with span("tool", tool=tool_name):
+            return await self._async_call_tool(tool_call_id, tool_name, tool_args)
 
+    async def _async_call_tool(self, tool_call_id: str, tool_name: str, tool_args: dict) -> dict:
+        """Call a tool and return its tool message."""
         # Check if the tool_name is in any of the modules
         if tool_name in TOOL_FUNCTIONS:
             tool_function = TOOL_FUNCTIONS[tool_name]
@@ -170,15 +612,18 @@ class AIConversationAgent(conversation.AbstractConversationAgent):
             tool_response = tool_message(tool_call_id, tool_name, result)
         else:
             tool_response = tool_message(
-                tool_call_id, tool_name, suggest_tool_call(tool_args))
+                tool_call_id, tool_name, str(suggest_tool_call(sorted(get_tool_call_entity_ids(tool_args)))))
 
         return tool_response
 
-    def _get_conversation_history(self, user_input: conversation.ConversationInput) -> tuple[str, list[dict]]:
-        """Get conversation history or create a new conversation ID."""
-        if user_input.conversation_id in self.history:
+    async def _async_get_conversation_history(self, user_input: conversation.ConversationInput) -> tuple[str, list[dict]]:
+        """Get conversation history, loading it from storage after a restart, or create a new conversation ID."""
+        if (messages := self.history.get(user_input.conversation_id)) is not None:
             conversation_id = user_input.conversation_id
-            messages = self.history[conversation_id]
+        elif self.history_storage is not None and (
+                messages := await self.history_storage.async_get(user_input.conversation_id)) is not None:
+            conversation_id = user_input.conversation_id
+            set_span_attribute("loaded", True)
         else:
             conversation_id = ulid.ulid()
             messages = []
@@ -196,6 +641,14 @@ class AIConversationAgent(conversation.AbstractConversationAgent):
             response=intent_response, conversation_id=conversation_id
         )
 
+    def _handle_busy(self, language: str, conversation_id: str) -> conversation.ConversationResult:
+        """Answer that the assistant is too busy to take the request."""
+        intent_response = intent.IntentResponse(language=language)
+        intent_response.async_set_speech(TURN_BUSY)
+        return conversation.ConversationResult(
+            response=intent_response, conversation_id=conversation_id
+        )
+
     def _handle_api_error(self, err: Exception, language: str, conversation_id: str) -> conversation.ConversationResult:
         """Handle API errors."""
         LOGGER.error("API error: %s", err)
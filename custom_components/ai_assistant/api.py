@@ -3,7 +3,11 @@
 from __future__ import annotations
 
 import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+import hashlib
 import socket
+import time
+from typing import TypeVar
 
 import aiohttp
 import async_timeout
@@ -15,9 +19,24 @@ from .exceptions import (
     ApiTimeoutError
 )
 
-from .response import VllmApiResponseDecoder, VllmChatApiResponse, VllmModelsApiResponse
+from .balancer import VllmEndpoint, VllmEndpointPool
+from .coalescing import SingleFlight
+from .model_catalog import ModelCatalog
+from .resilience import CircuitBreaker, LatencyTracker, ResilienceStats, RetryPolicy
+from .serialization import json_dumps, json_loads
+from .tool_schemas import splice_json_field
+from .response import VllmApiResponseDecoder, VllmChatApiResponse, VllmChatStreamDelta, VllmModelsApiResponse
 
-from .const import LOGGER
+from .const import (
+    LOGGER,
+    ROUTING_LEAST_OUTSTANDING,
+    DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+    DEFAULT_CIRCUIT_RESET_TIMEOUT,
+    DEFAULT_RETRY_BASE_DELAY,
+    DEFAULT_RETRY_MAX_DELAY,
+)
+
+_T = TypeVar("_T")
 
 
 class VllmApiClient:
@@ -28,43 +47,288 @@ class VllmApiClient:
         base_url: str,
         timeout: int,
         session: aiohttp.ClientSession,
+        extra_base_urls: list[str] | None = None,
+        routing_strategy: str = ROUTING_LEAST_OUTSTANDING,
+        retry_policy: RetryPolicy | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        hedge_percentile: float | None = None,
     ) -> None:
-        """VLLM API Client."""
-        self._base_url = base_url.rstrip("/")
+        """VLLM API Client.
+
+        Requests are routed across base_url and any extra_base_urls, which must
+        serve the same model. Requests that fail to reach a server are retried
+        according to retry_policy, and are failed fast by circuit_breaker while
+        every server is down. With a hedge_percentile, a chat request that takes
+        longer than that percentile of the recent requests is sent to a second
+        server as well, and the first answer wins. Identical chat requests that
+        are in flight at the same time share one upstream request. The model list
+        is cached in a catalog shared by the heartbeat and the config flow.
+        """
+        self.endpoints = VllmEndpointPool(
+            [base_url, *(extra_base_urls or [])], routing_strategy)
         self.timeout = timeout
         self._session = session
+        self.retry_policy = retry_policy or RetryPolicy(
+            0, DEFAULT_RETRY_BASE_DELAY, DEFAULT_RETRY_MAX_DELAY)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            DEFAULT_CIRCUIT_FAILURE_THRESHOLD, DEFAULT_CIRCUIT_RESET_TIMEOUT)
+        self.latencies = LatencyTracker(hedge_percentile) if hedge_percentile else None
+        self.stats = ResilienceStats()
+        self.coalescer: SingleFlight[VllmChatApiResponse] = SingleFlight()
+        self.model_catalog = ModelCatalog()
 
-    async def async_get_heartbeat(self) -> bool:
-        """Get heartbeat from the API."""
-        response = await self.async_get_models()
-        return len(response.models) > 0
+    async def async_get_heartbeat(self, max_age: float | None = None) -> bool:
+        """Get heartbeat from the API.
+
+        Every endpoint is checked, those that fail are ejected and those that
+        answer again are put back into rotation. With a max_age, an endpoint that
+        answered a request within the last max_age seconds counts as healthy
+        without being probed, so live traffic stands in for the heartbeat. The
+        heartbeat succeeds as long as one endpoint is healthy, and then closes the
+        circuit breaker.
+        """
+        now = time.monotonic()
+        probed = [
+            endpoint for endpoint in self.endpoints
+            if max_age is None or not endpoint.healthy or endpoint.last_success is None
+            or now - endpoint.last_success >= max_age
+        ]
+        self.stats.heartbeat_probes += len(probed)
+        self.stats.passive_heartbeats += len(self.endpoints) - len(probed)
+
+        results = await asyncio.gather(
+            *(self._async_get_endpoint_heartbeat(endpoint) for endpoint in probed),
+            return_exceptions=True,
+        )
+        for endpoint, result in zip(probed, results):
+            endpoint.set_healthy(result is True)
+
+        if len(probed) < len(self.endpoints) or any(result is True for result in results):
+            self.circuit_breaker.record_success()
+            return True
+
+        if error := next((result for result in results if isinstance(result, ApiClientError)), None):
+            raise error
+        return False
 
     async def async_get_models(self) -> VllmModelsApiResponse:
-        """Get models from the API."""
-        response = await self._api_wrapper(
-            method="get", url=f"{self._base_url}/v1/models",
-            headers={
-                "Content-type": "application/json; charset=UTF-8",
-                "Authorization": "Bearer functionary"
-            },)
-        decoded_response: VllmModelsApiResponse = VllmApiResponseDecoder.decode(
-            response)
-        return decoded_response
+        """Get models from the API, answered from the model catalog while it is fresh."""
+        return await self.model_catalog.async_get(
+            lambda: self._async_request(self._async_get_endpoint_models, retry_timeouts=True))
+
+    async def async_chat(self, data: dict | None = None, tools_json: bytes | None = None, conversation_id: str | None = None) -> VllmChatApiResponse:
+        """Chat with the API.
+
+        Already encoded tool schemas passed as tools_json are spliced into the
+        request body as its "tools" field, instead of being encoded again.
+        Requests of the same conversation are sent to the same endpoint. A request
+        whose body is identical to one in flight, same model, messages, sampling
+        parameters and tools, waits for that one and gets the same response.
+        """
+        body = _encode_chat_request(data, tools_json)
+
+        async def async_chat_endpoint(endpoint: VllmEndpoint) -> VllmChatApiResponse:
+            response = await self._api_wrapper(
+                method="post",
+                url=f"{endpoint.base_url}/v1/chat/completions",
+                body=body,
+                headers={
+                    "Content-type": "application/json; charset=UTF-8",
+                    "Authorization": "Bearer functionary"
+                },)
+            LOGGER.debug("API response: %s", response)
+            decoded_response: VllmChatApiResponse = VllmApiResponseDecoder.decode(
+                response)
+            return decoded_response
+
+        return await self.coalescer.async_do(
+            hashlib.blake2b(body, digest_size=16).digest(),
+            lambda: self._async_request(async_chat_endpoint, conversation_id, hedge=True),
+        )
+
+    async def async_chat_stream(self, data: dict | None = None, tools_json: bytes | None = None, conversation_id: str | None = None) -> AsyncIterator[VllmChatStreamDelta]:
+        """Chat with the API, yielding chunks as the server generates them.
+
+        The request is sent with "stream" enabled and the server-sent events of
+        the response are decoded one at a time, so callers can act on the first
+        tokens before generation has finished. Use a VllmChatStreamAccumulator to
+        assemble the chunks, including tool call fragments, into a full response.
+        The token counts are requested as well, and arrive with the last chunk.
+        A request is only retried when it fails before the first chunk.
+        """
+        data = {**(data or {}), "stream": True, "stream_options": {"include_usage": True}}
+        delays = self.retry_policy.delays()
+        while True:
+            self.circuit_breaker.before_request()
+            endpoint = self.endpoints.select(conversation_id)
+            streaming = False
+            try:
+                with self.endpoints.track(endpoint):
+                    async for delta in self._async_chat_stream(endpoint, data, tools_json):
+                        streaming = True
+                        yield delta
+            except (ApiCommError, ApiTimeoutError) as err:
+                self.circuit_breaker.record_failure()
+                if streaming or isinstance(err, ApiTimeoutError):
+                    raise
+                await self._async_retry_delay(delays, err)
+                continue
+
+            self.circuit_breaker.record_success()
+            return
+
+    async def _async_request(
+        self,
+        request: Callable[[VllmEndpoint], Awaitable[_T]],
+        conversation_id: str | None = None,
+        retry_timeouts: bool = False,
+        hedge: bool = False,
+    ) -> _T:
+        """Send a request through the circuit breaker, retrying it when it fails.
+
+        Timed out requests are only retried with retry_timeouts, as a retry would
+        take as long again. Errors returned by the server are never retried. Only
+        the latency of requests that may be hedged, the chat requests, is
+        recorded, so quick requests such as listing the models don't pull down
+        the delay before hedging.
+
+        Args:
+            request: Sends the request to an endpoint.
+            conversation_id: The conversation the request belongs to.
+            retry_timeouts: Whether timed out requests are retried.
+            hedge: Whether the request may be hedged.
+
+        """
+        delays = self.retry_policy.delays()
+        while True:
+            self.circuit_breaker.before_request()
+            try:
+                if hedge and self.latencies is not None:
+                    result = await self._async_hedged_request(request, conversation_id)
+                else:
+                    result = await self._async_endpoint_request(
+                        request, self.endpoints.select(conversation_id), record_latency=hedge)
+            except (ApiCommError, ApiTimeoutError) as err:
+                self.circuit_breaker.record_failure()
+                if isinstance(err, ApiTimeoutError) and not retry_timeouts:
+                    raise
+                await self._async_retry_delay(delays, err)
+                continue
+
+            self.circuit_breaker.record_success()
+            return result
+
+    async def _async_hedged_request(self, request: Callable[[VllmEndpoint], Awaitable[_T]], conversation_id: str | None) -> _T:
+        """Send a request, and a copy of it to a second endpoint if it is slow."""
+        primary = self.endpoints.select(conversation_id)
+        secondary = self.endpoints.select_alternative(primary)
+        delay = self.latencies.hedge_delay()
+        if secondary is None or delay is None:
+            return await self._async_endpoint_request(request, primary, record_latency=True)
 
-    async def async_chat(self, data: dict | None = None,) -> VllmChatApiResponse:
-        """Chat with the API."""
+        tasks = [asyncio.create_task(
+            self._async_endpoint_request(request, primary, record_latency=True))]
+        try:
+            pending, error = set(tasks), None
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                LOGGER.debug("Hedging request to %s after %.2f s",
+                             secondary.base_url, delay)
+                self.stats.hedged_requests += 1
+                tasks.append(asyncio.create_task(
+                    self._async_endpoint_request(request, secondary, record_latency=True)))
+                pending.add(tasks[1])
+
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self.stats.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _async_endpoint_request(self, request: Callable[[VllmEndpoint], Awaitable[_T]], endpoint: VllmEndpoint, record_latency: bool = False) -> _T:
+        """Send a request to an endpoint, tracking its latency with record_latency."""
+        started = time.monotonic()
+        with self.endpoints.track(endpoint, record_latency):
+            result = await request(endpoint)
+        if record_latency and self.latencies is not None:
+            self.latencies.add(time.monotonic() - started)
+        return result
+
+    async def _async_retry_delay(self, delays: Iterator[float], err: ApiClientError) -> None:
+        """Wait before the next attempt of a request, or raise err when there is none left."""
+        if (delay := next(delays, None)) is None:
+            raise err
+        self.stats.retries += 1
+        LOGGER.debug("Retrying request in %.2f s after: %s", delay, err)
+        await asyncio.sleep(delay)
+
+    async def _async_chat_stream(self, endpoint: VllmEndpoint, data: dict, tools_json: bytes | None) -> AsyncIterator[VllmChatStreamDelta]:
+        """Stream a chat completion from an endpoint."""
+        try:
+            async with self._session.request(
+                method="post",
+                url=f"{endpoint.base_url}/v1/chat/completions",
+                headers={
+                    "Content-type": "application/json; charset=UTF-8",
+                    "Accept": "text/event-stream",
+                    "Authorization": "Bearer functionary"
+                },
+                data=_encode_chat_request(data, tools_json),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            ) as response:
+                if response.status == 404:
+                    json_response = json_loads(await response.read())
+                    raise ApiJsonError(json_response["error"])
+
+                response.raise_for_status()
+
+                async for line in response.content:
+                    payload = _parse_sse_line(line)
+                    if payload is None:
+                        continue
+                    if payload == b"[DONE]":
+                        break
+
+                    chunk = json_loads(payload)
+                    if "error" in chunk:
+                        raise ApiJsonError(chunk["error"])
+
+                    LOGGER.debug("API stream chunk: %s", chunk)
+                    yield VllmApiResponseDecoder.decode(chunk)
+        except ApiJsonError as e:
+            raise e
+        except asyncio.TimeoutError as e:
+            raise ApiTimeoutError("timeout while talking to the server") from e
+        except (aiohttp.ClientError, socket.gaierror) as e:
+            raise ApiCommError(
+                "unknown error while talking to the server") from e
+        except Exception as e:  # pylint: disable=broad-except
+            raise ApiClientError("something really went wrong!") from e
+
+    async def _async_get_endpoint_heartbeat(self, endpoint: VllmEndpoint) -> bool:
+        """Get heartbeat from an endpoint."""
+        response = await self._async_get_endpoint_models(endpoint)
+        self.model_catalog.set(response)
+        return len(response.models) > 0
+
+    async def _async_get_endpoint_models(self, endpoint: VllmEndpoint) -> VllmModelsApiResponse:
+        """Get models from an endpoint."""
         response = await self._api_wrapper(
-            method="post",
-            url=f"{self._base_url}/v1/chat/completions",
-            data=data,
+            method="get", url=f"{endpoint.base_url}/v1/models",
             headers={
                 "Content-type": "application/json; charset=UTF-8",
                 "Authorization": "Bearer functionary"
             },)
-        LOGGER.debug("API response: %s", response)
-        decoded_response: VllmChatApiResponse = VllmApiResponseDecoder.decode(
+        decoded_response: VllmModelsApiResponse = VllmApiResponseDecoder.decode(
             response)
-
         return decoded_response
 
     async def _api_wrapper(
@@ -74,25 +338,33 @@ class VllmApiClient:
         data: dict | None = None,
         headers: dict | None = None,
         decode_json: bool = True,
+        body: bytes | None = None,
     ) -> any:
-        """Get information from the API."""
+        """Get information from the API.
+
+        The request is sent with data encoded as JSON, or with an already
+        encoded body. Both are sent as raw bytes and JSON responses are decoded
+        from the raw bytes, bypassing the JSON handling of aiohttp.
+        """
+        if body is None and data is not None:
+            body = json_dumps(data)
         try:
             async with async_timeout.timeout(self.timeout):
                 response = await self._session.request(
                     method=method,
                     url=url,
                     headers=headers,
-                    json=data,
+                    data=body,
                 )
 
                 if response.status == 404 and decode_json:
-                    json = await response.json()
-                    raise ApiJsonError(json["error"])
+                    json_response = json_loads(await response.read())
+                    raise ApiJsonError(json_response["error"])
 
                 response.raise_for_status()
 
                 if decode_json:
-                    return await response.json()
+                    return json_loads(await response.read())
                 return await response.text()
         except ApiJsonError as e:
             raise e
@@ -103,3 +375,19 @@ class VllmApiClient:
                 "unknown error while talking to the server") from e
         except Exception as e:  # pylint: disable=broad-except
             raise ApiClientError("something really went wrong!") from e
+
+
+def _parse_sse_line(line: bytes) -> bytes | None:
+    """Return the data payload of a server-sent event line, if it has one."""
+    line = line.strip()
+    if not line.startswith(b"data:"):
+        return None
+    return line[5:].strip()
+
+
+def _encode_chat_request(data: dict | None, tools_json: bytes | None) -> bytes:
+    """Encode a chat request, splicing in already encoded tools."""
+    encoded = json_dumps(data or {})
+    if tools_json is None:
+        return encoded
+    return splice_json_field(encoded, "tools", tools_json)
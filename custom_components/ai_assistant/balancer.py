@@ -0,0 +1,208 @@
+"""This module routes requests across the vLLM servers of a config entry."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+import re
+import time
+
+from .const import LOGGER, ROUTING_LATENCY, ROUTING_LEAST_OUTSTANDING
+from .exceptions import ApiCommError, ApiTimeoutError
+
+# Weight of the latest request in the moving average of the latency
+EWMA_ALPHA = 0.3
+
+# Seconds after which the latency of an endpoint without requests counts half, so a slow endpoint is tried again
+LATENCY_HALF_LIFE = 60.0
+
+# Number of conversations remembered for sticky routing
+MAX_STICKY_CONVERSATIONS = 1000
+
+
+class VllmEndpoint:
+    """A vLLM server and its observed load, latency and health."""
+
+    def __init__(self, base_url: str) -> None:
+        """Initialize the endpoint."""
+        self.base_url = base_url.rstrip("/")
+        self.healthy = True
+        self.outstanding = 0
+        self.conversations = 0
+        self.latency: float | None = None
+        # Monotonic time the latency was last updated
+        self.latency_updated = 0.0
+        # Monotonic time of the last request the endpoint answered
+        self.last_success: float | None = None
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def add_latency(self, duration: float) -> None:
+        """Fold the duration of a request in seconds into the moving average."""
+        now = time.monotonic()
+        if self.latency is None:
+            self.latency = duration
+        else:
+            self.latency = EWMA_ALPHA * duration + \
+                (1 - EWMA_ALPHA) * self.current_latency(now)
+        self.latency_updated = now
+
+    def current_latency(self, now: float | None = None) -> float:
+        """Return the moving average of the latency in seconds, 0 if there is none yet.
+
+        The average decays towards 0 while the endpoint gets no requests, halving
+        every LATENCY_HALF_LIFE seconds. Otherwise an endpoint that was slow once
+        would never be picked again by the latency strategy, and never get the
+        requests that show it has recovered.
+        """
+        if self.latency is None:
+            return 0.0
+        age = (time.monotonic() if now is None else now) - self.latency_updated
+        return self.latency * 0.5 ** (max(age, 0.0) / LATENCY_HALF_LIFE)
+
+    def set_healthy(self, healthy: bool) -> None:
+        """Mark the endpoint as healthy or eject it."""
+        if healthy == self.healthy:
+            return
+
+        if healthy:
+            LOGGER.info("vLLM endpoint %s is back", self.base_url)
+        else:
+            LOGGER.warning("Ejecting vLLM endpoint %s", self.base_url)
+            self.ejections += 1
+        self.healthy = healthy
+
+    def as_dict(self) -> dict:
+        """Return the state of the endpoint, with the latency in milliseconds."""
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "conversations": self.conversations,
+            "latency_ms": self.current_latency() * 1000 if self.latency is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+        }
+
+
+class VllmEndpointPool:
+    """Routes requests across vLLM servers serving the same model.
+
+    A new conversation goes to the healthy endpoint with the fewest outstanding
+    requests, or with the lowest average latency, and then sticks to that
+    endpoint so the server can reuse its prefix cache for the following turns.
+    Endpoints are ejected when a request fails to reach them or when they miss a
+    heartbeat, and come back once a heartbeat succeeds again.
+    """
+
+    def __init__(self, base_urls: list[str], strategy: str = ROUTING_LEAST_OUTSTANDING) -> None:
+        """Initialize the pool.
+
+        Args:
+            base_urls: The base URLs of the vLLM servers.
+            strategy: How new conversations are routed, by least outstanding
+                requests or by latency.
+
+        """
+        self.endpoints = [VllmEndpoint(base_url) for base_url in base_urls]
+        self.strategy = strategy
+        self._sticky: OrderedDict[str, VllmEndpoint] = OrderedDict()
+        self._ejection_listeners: list[Callable[[VllmEndpoint], None]] = []
+
+    def __iter__(self) -> Iterator[VllmEndpoint]:
+        """Iterate over the endpoints."""
+        return iter(self.endpoints)
+
+    def __len__(self) -> int:
+        """Return the number of endpoints."""
+        return len(self.endpoints)
+
+    def add_ejection_listener(self, listener: Callable[[VllmEndpoint], None]) -> Callable[[], None]:
+        """Call listener with every endpoint a failed request ejects.
+
+        Returns a function that removes the listener.
+        """
+        self._ejection_listeners.append(listener)
+        return lambda: self._ejection_listeners.remove(listener)
+
+    def select(self, conversation_id: str | None = None) -> VllmEndpoint:
+        """Return the endpoint to send a request of a conversation to."""
+        if conversation_id is not None:
+            endpoint = self._sticky.get(conversation_id)
+            if endpoint is not None and endpoint.healthy:
+                self._sticky.move_to_end(conversation_id)
+                return endpoint
+
+        # Rather try an ejected endpoint than fail without sending anything
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.healthy] or self.endpoints
+        now = time.monotonic()
+        if self.strategy == ROUTING_LATENCY:
+            endpoint = min(candidates, key=lambda endpoint: (
+                endpoint.current_latency(now), endpoint.outstanding, endpoint.conversations))
+        else:
+            endpoint = min(candidates, key=lambda endpoint: (
+                endpoint.outstanding, endpoint.conversations, endpoint.current_latency(now)))
+
+        if conversation_id is not None:
+            if (previous := self._sticky.pop(conversation_id, None)) is not None:
+                previous.conversations -= 1
+            self._sticky[conversation_id] = endpoint
+            endpoint.conversations += 1
+            while len(self._sticky) > MAX_STICKY_CONVERSATIONS:
+                _, evicted = self._sticky.popitem(last=False)
+                evicted.conversations -= 1
+        return endpoint
+
+    def select_alternative(self, endpoint: VllmEndpoint) -> VllmEndpoint | None:
+        """Return another healthy endpoint to send a copy of a request to, if any."""
+        candidates = [other for other in self.endpoints if other.healthy and other is not endpoint]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        return min(candidates, key=lambda other: (other.outstanding, other.current_latency(now)))
+
+    @contextmanager
+    def track(self, endpoint: VllmEndpoint, record_latency: bool = True) -> Iterator[VllmEndpoint]:
+        """Track a request sent to an endpoint.
+
+        The endpoint counts the request as outstanding until it completes, records
+        its latency and is put back into rotation when it succeeds, and is ejected
+        when the server can't be reached, which the ejection listeners are told
+        about. Requests much quicker than a chat request, such as listing the
+        models, are tracked without record_latency.
+        """
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        started = time.monotonic()
+        try:
+            yield endpoint
+        except (ApiCommError, ApiTimeoutError):
+            endpoint.failures += 1
+            if endpoint.healthy:
+                endpoint.set_healthy(False)
+                for listener in list(self._ejection_listeners):
+                    listener(endpoint)
+            raise
+        else:
+            endpoint.last_success = time.monotonic()
+            if record_latency:
+                endpoint.add_latency(endpoint.last_success - started)
+            endpoint.set_healthy(True)
+        finally:
+            endpoint.outstanding -= 1
+
+    def as_dict(self) -> dict:
+        """Return the state of the pool for diagnostics."""
+        return {
+            "strategy": self.strategy,
+            "sticky_conversations": len(self._sticky),
+            "endpoints": [endpoint.as_dict() for endpoint in self.endpoints],
+        }
+
+
+def parse_base_urls(value: str | None) -> list[str]:
+    """Split a comma or whitespace separated list of base URLs."""
+    return [base_url for base_url in re.split(r"[,\s]+", value or "") if base_url]
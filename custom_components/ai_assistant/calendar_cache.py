@@ -0,0 +1,256 @@
+"""This module caches calendar events, so the calendar tools share what was fetched."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+import time
+
+from homeassistant.const import ATTR_ENTITY_ID, EVENT_STATE_CHANGED
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_CALENDAR_CACHE, DOMAIN, LOGGER
+from .tracing import span
+
+# Seconds fetched events are used for, in case a calendar changes without its state changing
+CALENDAR_CACHE_TTL = 300
+
+# Number of separate time windows kept per calendar, the least recently fetched is dropped first
+MAX_WINDOWS_PER_CALENDAR = 8
+
+
+class CalendarCacheStats:
+    """Counters describing the calendar event cache."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        return {
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "invalidations": self.invalidations,
+        }
+
+
+class CalendarEvent:
+    """An event returned by calendar.get_events, with its parsed start and end."""
+
+    def __init__(self, data: dict):
+        """Initialize the event."""
+        self.data = data
+        self.start = parse_calendar_time(data["start"])
+        self.end = parse_calendar_time(data["end"])
+
+    @property
+    def key(self) -> tuple:
+        """Return what identifies the event when windows fetched separately both hold it."""
+        return (self.data["start"], self.data["end"], self.data.get("summary"),
+                self.data.get("description"), self.data.get("location"))
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        """Return whether the event takes place in part between start and end."""
+        return self.end > start and self.start < end
+
+
+class CalendarWindow:
+    """The events of a calendar between two times, fetched together."""
+
+    def __init__(self, start: datetime, end: datetime, events: list[CalendarEvent], fetched_at: float):
+        """Initialize the window."""
+        self.start = start
+        self.end = end
+        self.events = events
+        self.fetched_at = fetched_at
+
+
+class CalendarEventCache:
+    """Per calendar cache of events keyed by time window.
+
+    A requested range is answered from the cached windows covering it, and only
+    the parts no window covers are fetched, then merged into the windows they
+    touch. The windows of a calendar are dropped when its state changes, after
+    an event is created in it, and once they are older than CALENDAR_CACHE_TTL.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache."""
+        self.hass = hass
+        self.stats = CalendarCacheStats()
+        self._windows: dict[str, list[CalendarWindow]] = {}
+        # Bumped on invalidation, so fetches that were in flight don't store stale events
+        self._generations: dict[str, int] = {}
+        self._listeners: list[CALLBACK_TYPE] = []
+
+    @callback
+    def async_start(self) -> None:
+        """Start listening for calendar updates."""
+        self._listeners = [
+            self.hass.bus.async_listen(
+                EVENT_STATE_CHANGED, self._async_state_changed),
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening for calendar updates."""
+        for unsubscribe in self._listeners:
+            unsubscribe()
+        self._listeners = []
+
+    async def async_get_events(self, entity_id: str, start: datetime, end: datetime) -> list[dict]:
+        """Return the events of a calendar taking place between start and end, sorted by start."""
+        windows = self._fresh_windows(entity_id)
+        gaps = _uncovered(windows, start, end)
+        if not gaps:
+            self.stats.hits += 1
+        elif gaps == [(start, end)]:
+            self.stats.misses += 1
+        else:
+            self.stats.partial_hits += 1
+
+        generation = self._generations.get(entity_id, 0)
+        fetched = await asyncio.gather(
+            *(self._async_fetch(entity_id, gap_start, gap_end) for gap_start, gap_end in gaps))
+        now = time.monotonic()
+        new_windows = [
+            CalendarWindow(gap_start, gap_end, events, now)
+            for (gap_start, gap_end), events in zip(gaps, fetched)
+        ]
+        if self._generations.get(entity_id, 0) == generation:
+            for window in new_windows:
+                self._add_window(entity_id, window)
+
+        events: dict[tuple, CalendarEvent] = {}
+        for window in [*windows, *new_windows]:
+            for event in window.events:
+                if event.overlaps(start, end):
+                    events.setdefault(event.key, event)
+        return [event.data for event in sorted(events.values(), key=lambda event: event.start)]
+
+    @callback
+    def async_invalidate(self, entity_id: str) -> None:
+        """Drop the cached events of a calendar."""
+        self._generations[entity_id] = self._generations.get(entity_id, 0) + 1
+        if self._windows.pop(entity_id, None) is not None:
+            LOGGER.debug("Dropping cached events of %s", entity_id)
+            self.stats.invalidations += 1
+
+    def as_dict(self) -> dict:
+        """Return the state of the cache for diagnostics."""
+        return {
+            "calendars": len(self._windows),
+            "windows": sum(len(windows) for windows in self._windows.values()),
+            "events": sum(len(window.events) for windows in self._windows.values() for window in windows),
+            **self.stats.as_dict(),
+        }
+
+    async def _async_fetch(self, entity_id: str, start: datetime, end: datetime) -> list[CalendarEvent]:
+        """Fetch the events of a calendar between start and end."""
+        self.stats.fetches += 1
+        with span("service", service="calendar.get_events", entities=1):
+            response = await self.hass.services.async_call(
+                "calendar",
+                "get_events",
+                {
+                    ATTR_ENTITY_ID: entity_id,
+                    "start_date_time": start.isoformat(),
+                    "end_date_time": end.isoformat(),
+                },
+                blocking=True,
+                return_response=True,
+            )
+        LOGGER.debug("Events: %s", response)
+        return [CalendarEvent(event) for event in response[entity_id]["events"]]
+
+    def _fresh_windows(self, entity_id: str) -> list[CalendarWindow]:
+        """Return the windows of a calendar sorted by start, dropping those older than the TTL."""
+        now = time.monotonic()
+        windows = [
+            window for window in self._windows.get(entity_id, [])
+            if now - window.fetched_at < CALENDAR_CACHE_TTL
+        ]
+        if windows:
+            self._windows[entity_id] = windows
+        else:
+            self._windows.pop(entity_id, None)
+        return windows
+
+    def _add_window(self, entity_id: str, window: CalendarWindow) -> None:
+        """Store a window, merging it with the windows it overlaps or touches."""
+        kept = []
+        for other in self._windows.get(entity_id, []):
+            if other.start > window.end or other.end < window.start:
+                kept.append(other)
+                continue
+            events = {event.key: event for event in [*other.events, *window.events]}
+            window = CalendarWindow(
+                min(window.start, other.start),
+                max(window.end, other.end),
+                list(events.values()),
+                # The merged window expires with the oldest of its parts
+                min(window.fetched_at, other.fetched_at),
+            )
+
+        kept.append(window)
+        if len(kept) > MAX_WINDOWS_PER_CALENDAR:
+            kept.remove(min(kept, key=lambda other: other.fetched_at))
+        self._windows[entity_id] = sorted(kept, key=lambda other: other.start)
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Drop the cached events of a calendar when it updates."""
+        if (entity_id := event.data["entity_id"]).startswith("calendar."):
+            self.async_invalidate(entity_id)
+
+
+def parse_calendar_time(value: str) -> datetime:
+    """Parse a date or a date and time, taking those without a time zone as local time."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    return parsed
+
+
+def _uncovered(windows: list[CalendarWindow], start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
+    """Return the parts of the range between start and end that no window covers."""
+    gaps = []
+    cursor = start
+    for window in windows:
+        if window.start >= end:
+            break
+        if window.end <= cursor:
+            continue
+        if window.start > cursor:
+            gaps.append((cursor, window.start))
+        cursor = window.end
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+@callback
+def async_get_calendar_cache(hass: HomeAssistant) -> CalendarEventCache:
+    """Return the shared calendar event cache, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (cache := domain_data.get(DATA_CALENDAR_CACHE)) is None:
+        cache = domain_data[DATA_CALENDAR_CACHE] = CalendarEventCache(hass)
+        cache.async_start()
+    return cache
+
+
+@callback
+def async_release_calendar_cache(hass: HomeAssistant) -> None:
+    """Stop and drop the shared calendar event cache."""
+    if (cache := hass.data.get(DOMAIN, {}).pop(DATA_CALENDAR_CACHE, None)) is not None:
+        cache.async_stop()
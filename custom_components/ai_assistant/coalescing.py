@@ -0,0 +1,82 @@
+"""This module coalesces identical requests that are in flight at the same time."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+_T = TypeVar("_T")
+
+
+class SingleFlightStats:
+    """Counters describing coalesced requests."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.requests = 0
+        self.coalesced = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+        }
+
+
+class SingleFlightCall(Generic[_T]):
+    """A request in flight and the number of callers waiting for it."""
+
+    def __init__(self, task: asyncio.Task[_T]):
+        """Initialize the call."""
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight(Generic[_T]):
+    """Runs one request per key at a time and shares its result with every caller.
+
+    A caller that asks for a key already in flight waits for that request
+    instead of starting its own, and gets the same result or exception. The
+    request runs in its own task, so a caller that is cancelled doesn't cancel
+    it for the others. It is only cancelled once every caller is gone.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the coalescer."""
+        self.stats = SingleFlightStats()
+        self._calls: dict[Hashable, SingleFlightCall[_T]] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """Return the number of requests in flight."""
+        return len(self._calls)
+
+    async def async_do(self, key: Hashable, request: Callable[[], Awaitable[_T]]) -> _T:
+        """Return the result of the request for a key, sharing it with identical calls in flight.
+
+        Args:
+            key: The key identifying identical requests.
+            request: Starts the request when none is in flight for the key.
+
+        """
+        if (call := self._calls.get(key)) is None:
+            call = self._calls[key] = SingleFlightCall(asyncio.create_task(request()))
+            call.task.add_done_callback(lambda _task: self._forget(key, call))
+            self.stats.requests += 1
+        else:
+            self.stats.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: SingleFlightCall[_T]) -> None:
+        """Forget a finished request, so the next call for its key starts a new one."""
+        if self._calls.get(key) is call:
+            del self._calls[key]
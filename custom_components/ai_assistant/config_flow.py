@@ -9,7 +9,7 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers import config_validation as cv
-from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.selector import (
     NumberSelector,
     NumberSelectorConfig,
@@ -20,29 +20,80 @@ from homeassistant.helpers.selector import (
 )
 
 from .api import VllmApiClient
+from .balancer import parse_base_urls
 from .response import VllmModelsApiResponse
 
 from .const import (
     DOMAIN, LOGGER,
     MENU_OPTIONS,
+    ROUTING_STRATEGIES,
+    DATA_CLIENT,
 
     CONF_BASE_URL,
     CONF_TIMEOUT,
+    CONF_EXTRA_BASE_URLS,
+    CONF_ROUTING_STRATEGY,
+    CONF_RETRIES,
+    CONF_HEDGING,
+    CONF_HEDGE_PERCENTILE,
+    CONF_POOL_SIZE,
+    CONF_KEEPALIVE_TIMEOUT,
+    CONF_UNIX_SOCKET,
+    CONF_MAX_TOOL_ROUNDS,
+    CONF_TURN_TIMEOUT,
+    CONF_MAX_CONCURRENT_TURNS,
+    CONF_SHED_LOAD,
+    CONF_MAX_QUEUED_TURNS,
+    CONF_HISTORY_MAX_CONVERSATIONS,
+    CONF_HISTORY_IDLE_TTL,
+    CONF_HISTORY_MAX_MESSAGES,
+    CONF_HISTORY_PERSIST,
+    CONF_FAST_PATH,
+    CONF_RESPONSE_CACHE,
+    CONF_RESPONSE_CACHE_TTL,
     CONF_MODEL,
     CONF_CTX_SIZE,
     CONF_MAX_TOKENS,
     CONF_TEMPERATURE,
     CONF_TOP_P,
     CONF_PROMPT_SYSTEM,
+    CONF_PROMPT_CACHE_FRIENDLY,
+    CONF_PROMPT_LIVE_STATE,
+    CONF_STREAM,
+    CONF_TOOL_FILTERING,
 
     DEFAULT_BASE_URL,
     DEFAULT_TIMEOUT,
+    DEFAULT_EXTRA_BASE_URLS,
+    DEFAULT_ROUTING_STRATEGY,
+    DEFAULT_RETRIES,
+    DEFAULT_HEDGING,
+    DEFAULT_HEDGE_PERCENTILE,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_UNIX_SOCKET,
+    DEFAULT_MAX_TOOL_ROUNDS,
+    DEFAULT_TURN_TIMEOUT,
+    DEFAULT_MAX_CONCURRENT_TURNS,
+    DEFAULT_SHED_LOAD,
+    DEFAULT_MAX_QUEUED_TURNS,
+    DEFAULT_HISTORY_MAX_CONVERSATIONS,
+    DEFAULT_HISTORY_IDLE_TTL,
+    DEFAULT_HISTORY_MAX_MESSAGES,
+    DEFAULT_HISTORY_PERSIST,
+    DEFAULT_FAST_PATH,
+    DEFAULT_RESPONSE_CACHE,
+    DEFAULT_RESPONSE_CACHE_TTL,
     DEFAULT_MODEL,
     DEFAULT_CTX_SIZE,
     DEFAULT_MAX_TOKENS,
     DEFAULT_TEMPERATURE,
     DEFAULT_TOP_P,
-    DEFAULT_PROMPT_SYSTEM
+    DEFAULT_PROMPT_SYSTEM,
+    DEFAULT_PROMPT_CACHE_FRIENDLY,
+    DEFAULT_PROMPT_LIVE_STATE,
+    DEFAULT_STREAM,
+    DEFAULT_TOOL_FILTERING
 )
 from .exceptions import (
     ApiClientError,
@@ -62,12 +113,36 @@ DEFAULT_OPTIONS = types.MappingProxyType(
     {
         CONF_BASE_URL: DEFAULT_BASE_URL,
         CONF_TIMEOUT: DEFAULT_TIMEOUT,
+        CONF_EXTRA_BASE_URLS: DEFAULT_EXTRA_BASE_URLS,
+        CONF_ROUTING_STRATEGY: DEFAULT_ROUTING_STRATEGY,
+        CONF_RETRIES: DEFAULT_RETRIES,
+        CONF_HEDGING: DEFAULT_HEDGING,
+        CONF_HEDGE_PERCENTILE: DEFAULT_HEDGE_PERCENTILE,
+        CONF_POOL_SIZE: DEFAULT_POOL_SIZE,
+        CONF_KEEPALIVE_TIMEOUT: DEFAULT_KEEPALIVE_TIMEOUT,
+        CONF_UNIX_SOCKET: DEFAULT_UNIX_SOCKET,
+        CONF_MAX_TOOL_ROUNDS: DEFAULT_MAX_TOOL_ROUNDS,
+        CONF_TURN_TIMEOUT: DEFAULT_TURN_TIMEOUT,
+        CONF_MAX_CONCURRENT_TURNS: DEFAULT_MAX_CONCURRENT_TURNS,
+        CONF_SHED_LOAD: DEFAULT_SHED_LOAD,
+        CONF_MAX_QUEUED_TURNS: DEFAULT_MAX_QUEUED_TURNS,
+        CONF_HISTORY_MAX_CONVERSATIONS: DEFAULT_HISTORY_MAX_CONVERSATIONS,
+        CONF_HISTORY_IDLE_TTL: DEFAULT_HISTORY_IDLE_TTL,
+        CONF_HISTORY_MAX_MESSAGES: DEFAULT_HISTORY_MAX_MESSAGES,
+        CONF_HISTORY_PERSIST: DEFAULT_HISTORY_PERSIST,
+        CONF_RESPONSE_CACHE: DEFAULT_RESPONSE_CACHE,
+        CONF_RESPONSE_CACHE_TTL: DEFAULT_RESPONSE_CACHE_TTL,
+        CONF_FAST_PATH: DEFAULT_FAST_PATH,
         CONF_MODEL: DEFAULT_MODEL,
         CONF_CTX_SIZE: DEFAULT_CTX_SIZE,
         CONF_MAX_TOKENS: DEFAULT_MAX_TOKENS,
         CONF_TEMPERATURE: DEFAULT_TEMPERATURE,
         CONF_TOP_P: DEFAULT_TOP_P,
-        CONF_PROMPT_SYSTEM: DEFAULT_PROMPT_SYSTEM
+        CONF_PROMPT_SYSTEM: DEFAULT_PROMPT_SYSTEM,
+        CONF_PROMPT_CACHE_FRIENDLY: DEFAULT_PROMPT_CACHE_FRIENDLY,
+        CONF_PROMPT_LIVE_STATE: DEFAULT_PROMPT_LIVE_STATE,
+        CONF_STREAM: DEFAULT_STREAM,
+        CONF_TOOL_FILTERING: DEFAULT_TOOL_FILTERING
     }
 )
 
@@ -96,7 +171,7 @@ class AIAssistantConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             self.client = VllmApiClient(
                 base_url=cv.url_no_path(user_input[CONF_BASE_URL]),
                 timeout=user_input[CONF_TIMEOUT],
-                session=async_create_clientsession(self.hass),
+                session=async_get_clientsession(self.hass),
             )
             response = await self.client.async_get_heartbeat()
             if not response:
@@ -150,14 +225,24 @@ class AIAssistantOptionsFlow(config_entries.OptionsFlow):
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Manage General Settings."""
+        errors = {}
+        options = self.config_entry.options
         if user_input is not None:
-            self.options.update(user_input)
-            return self.async_create_entry(title="", data=self.options)
-
-        schema = ai_assistant_schema_general_config(self.config_entry.options)
+            try:
+                for base_url in parse_base_urls(user_input.get(CONF_EXTRA_BASE_URLS)):
+                    cv.url_no_path(base_url)
+            except vol.Invalid:
+                errors[CONF_EXTRA_BASE_URLS] = "invalid_url"
+                options = {**self.options, **user_input}
+            else:
+                self.options.update(user_input)
+                return self.async_create_entry(title="", data=self.options)
+
+        schema = ai_assistant_schema_general_config(options)
         return self.async_show_form(
             step_id="general_config",
-            data_schema=vol.Schema(schema)
+            data_schema=vol.Schema(schema),
+            errors=errors
         )
 
     async def async_step_prompt_system(
@@ -183,12 +268,16 @@ class AIAssistantOptionsFlow(config_entries.OptionsFlow):
             return self.async_create_entry(title="", data=self.options)
 
         try:
-            client = VllmApiClient(
-                base_url=cv.url_no_path(self.config_entry.data[CONF_BASE_URL]),
-                timeout=self.config_entry.options.get(
-                    CONF_TIMEOUT, DEFAULT_TIMEOUT),
-                session=async_create_clientsession(self.hass),
-            )
+            entry_data = self.hass.data.get(DOMAIN, {}).get(self.config_entry.entry_id)
+            if entry_data is not None:
+                client = entry_data[DATA_CLIENT]
+            else:
+                client = VllmApiClient(
+                    base_url=cv.url_no_path(self.config_entry.data[CONF_BASE_URL]),
+                    timeout=self.config_entry.options.get(
+                        CONF_TIMEOUT, DEFAULT_TIMEOUT),
+                    session=async_get_clientsession(self.hass),
+                )
             response = await client.async_get_models()
             # models = response["models"]
         except ApiClientError as exception:
@@ -213,6 +302,132 @@ def ai_assistant_schema_general_config(options: MappingProxyType[str, Any]) -> d
                 CONF_TIMEOUT, DEFAULT_TIMEOUT)},
             default=DEFAULT_TIMEOUT,
         ): int,
+        vol.Optional(
+            CONF_EXTRA_BASE_URLS,
+            description={"suggested_value": options.get(
+                CONF_EXTRA_BASE_URLS, DEFAULT_EXTRA_BASE_URLS)},
+            default=DEFAULT_EXTRA_BASE_URLS,
+        ): str,
+        vol.Optional(
+            CONF_ROUTING_STRATEGY,
+            description={"suggested_value": options.get(
+                CONF_ROUTING_STRATEGY, DEFAULT_ROUTING_STRATEGY)},
+            default=DEFAULT_ROUTING_STRATEGY,
+        ): SelectSelector(
+            SelectSelectorConfig(
+                options=ROUTING_STRATEGIES,
+                mode=SelectSelectorMode.DROPDOWN,
+                translation_key=CONF_ROUTING_STRATEGY,
+            )
+        ),
+        vol.Optional(
+            CONF_RETRIES,
+            description={"suggested_value": options.get(
+                CONF_RETRIES, DEFAULT_RETRIES)},
+            default=DEFAULT_RETRIES,
+        ): NumberSelector(NumberSelectorConfig(min=0, max=5, step=1)),
+        vol.Optional(
+            CONF_HEDGING,
+            description={"suggested_value": options.get(
+                CONF_HEDGING, DEFAULT_HEDGING)},
+            default=DEFAULT_HEDGING,
+        ): bool,
+        vol.Optional(
+            CONF_HEDGE_PERCENTILE,
+            description={"suggested_value": options.get(
+                CONF_HEDGE_PERCENTILE, DEFAULT_HEDGE_PERCENTILE)},
+            default=DEFAULT_HEDGE_PERCENTILE,
+        ): NumberSelector(NumberSelectorConfig(min=50, max=99, step=1)),
+        vol.Optional(
+            CONF_POOL_SIZE,
+            description={"suggested_value": options.get(
+                CONF_POOL_SIZE, DEFAULT_POOL_SIZE)},
+            default=DEFAULT_POOL_SIZE,
+        ): NumberSelector(NumberSelectorConfig(min=1, max=100, step=1)),
+        vol.Optional(
+            CONF_KEEPALIVE_TIMEOUT,
+            description={"suggested_value": options.get(
+                CONF_KEEPALIVE_TIMEOUT, DEFAULT_KEEPALIVE_TIMEOUT)},
+            default=DEFAULT_KEEPALIVE_TIMEOUT,
+        ): int,
+        vol.Optional(
+            CONF_UNIX_SOCKET,
+            description={"suggested_value": options.get(
+                CONF_UNIX_SOCKET, DEFAULT_UNIX_SOCKET)},
+            default=DEFAULT_UNIX_SOCKET,
+        ): str,
+        vol.Optional(
+            CONF_MAX_TOOL_ROUNDS,
+            description={"suggested_value": options.get(
+                CONF_MAX_TOOL_ROUNDS, DEFAULT_MAX_TOOL_ROUNDS)},
+            default=DEFAULT_MAX_TOOL_ROUNDS,
+        ): NumberSelector(NumberSelectorConfig(min=0, max=20, step=1)),
+        vol.Optional(
+            CONF_TURN_TIMEOUT,
+            description={"suggested_value": options.get(
+                CONF_TURN_TIMEOUT, DEFAULT_TURN_TIMEOUT)},
+            default=DEFAULT_TURN_TIMEOUT,
+        ): int,
+        vol.Optional(
+            CONF_MAX_CONCURRENT_TURNS,
+            description={"suggested_value": options.get(
+                CONF_MAX_CONCURRENT_TURNS, DEFAULT_MAX_CONCURRENT_TURNS)},
+            default=DEFAULT_MAX_CONCURRENT_TURNS,
+        ): NumberSelector(NumberSelectorConfig(min=1, max=64, step=1)),
+        vol.Optional(
+            CONF_SHED_LOAD,
+            description={"suggested_value": options.get(
+                CONF_SHED_LOAD, DEFAULT_SHED_LOAD)},
+            default=DEFAULT_SHED_LOAD,
+        ): bool,
+        vol.Optional(
+            CONF_MAX_QUEUED_TURNS,
+            description={"suggested_value": options.get(
+                CONF_MAX_QUEUED_TURNS, DEFAULT_MAX_QUEUED_TURNS)},
+            default=DEFAULT_MAX_QUEUED_TURNS,
+        ): NumberSelector(NumberSelectorConfig(min=0, max=100, step=1)),
+        vol.Optional(
+            CONF_HISTORY_MAX_CONVERSATIONS,
+            description={"suggested_value": options.get(
+                CONF_HISTORY_MAX_CONVERSATIONS, DEFAULT_HISTORY_MAX_CONVERSATIONS)},
+            default=DEFAULT_HISTORY_MAX_CONVERSATIONS,
+        ): NumberSelector(NumberSelectorConfig(min=1, max=1000, step=1)),
+        vol.Optional(
+            CONF_HISTORY_IDLE_TTL,
+            description={"suggested_value": options.get(
+                CONF_HISTORY_IDLE_TTL, DEFAULT_HISTORY_IDLE_TTL)},
+            default=DEFAULT_HISTORY_IDLE_TTL,
+        ): NumberSelector(NumberSelectorConfig(min=1, max=1440, step=1, unit_of_measurement="min")),
+        vol.Optional(
+            CONF_HISTORY_MAX_MESSAGES,
+            description={"suggested_value": options.get(
+                CONF_HISTORY_MAX_MESSAGES, DEFAULT_HISTORY_MAX_MESSAGES)},
+            default=DEFAULT_HISTORY_MAX_MESSAGES,
+        ): NumberSelector(NumberSelectorConfig(min=2, max=500, step=1)),
+        vol.Optional(
+            CONF_HISTORY_PERSIST,
+            description={"suggested_value": options.get(
+                CONF_HISTORY_PERSIST, DEFAULT_HISTORY_PERSIST)},
+            default=DEFAULT_HISTORY_PERSIST,
+        ): bool,
+        vol.Optional(
+            CONF_RESPONSE_CACHE,
+            description={"suggested_value": options.get(
+                CONF_RESPONSE_CACHE, DEFAULT_RESPONSE_CACHE)},
+            default=DEFAULT_RESPONSE_CACHE,
+        ): bool,
+        vol.Optional(
+            CONF_RESPONSE_CACHE_TTL,
+            description={"suggested_value": options.get(
+                CONF_RESPONSE_CACHE_TTL, DEFAULT_RESPONSE_CACHE_TTL)},
+            default=DEFAULT_RESPONSE_CACHE_TTL,
+        ): NumberSelector(NumberSelectorConfig(min=1, max=1440, step=1, unit_of_measurement="min")),
+        vol.Optional(
+            CONF_FAST_PATH,
+            description={"suggested_value": options.get(
+                CONF_FAST_PATH, DEFAULT_FAST_PATH)},
+            default=DEFAULT_FAST_PATH,
+        ): bool,
     }
 
 
@@ -226,7 +441,19 @@ def ai_assistant_schema_prompt_system(options: MappingProxyType[str, Any]) -> di
             description={"suggested_value": options.get(
                 CONF_PROMPT_SYSTEM, DEFAULT_PROMPT_SYSTEM)},
             default=DEFAULT_PROMPT_SYSTEM,
-        ): TemplateSelector()
+        ): TemplateSelector(),
+        vol.Optional(
+            CONF_PROMPT_CACHE_FRIENDLY,
+            description={"suggested_value": options.get(
+                CONF_PROMPT_CACHE_FRIENDLY, DEFAULT_PROMPT_CACHE_FRIENDLY)},
+            default=DEFAULT_PROMPT_CACHE_FRIENDLY,
+        ): bool,
+        vol.Optional(
+            CONF_PROMPT_LIVE_STATE,
+            description={"suggested_value": options.get(
+                CONF_PROMPT_LIVE_STATE, DEFAULT_PROMPT_LIVE_STATE)},
+            default=DEFAULT_PROMPT_LIVE_STATE,
+        ): TemplateSelector(),
     }
 
 
@@ -274,4 +501,16 @@ def ai_assistant_schema_model_config(options: MappingProxyType[str, Any], MODELS
                 CONF_TOP_P, DEFAULT_TOP_P)},
             default=DEFAULT_TOP_P,
         ): NumberSelector(NumberSelectorConfig(min=0, max=1, step=0.05)),
+        vol.Optional(
+            CONF_STREAM,
+            description={"suggested_value": options.get(
+                CONF_STREAM, DEFAULT_STREAM)},
+            default=DEFAULT_STREAM,
+        ): bool,
+        vol.Optional(
+            CONF_TOOL_FILTERING,
+            description={"suggested_value": options.get(
+                CONF_TOOL_FILTERING, DEFAULT_TOOL_FILTERING)},
+            default=DEFAULT_TOOL_FILTERING,
+        ): bool,
     }
@@ -0,0 +1,131 @@
+"""This module provides a dedicated HTTP connection pool for the vLLM server."""
+
+from __future__ import annotations
+
+import time
+
+import aiohttp
+
+from .const import LOGGER
+from .tracing import add_span_time
+
+
+class VllmConnectionPoolStats:
+    """Counters describing the use of a connection pool."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.queued = 0
+        self.queued_time = 0.0
+        self.connect_time = 0.0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary, with times in milliseconds."""
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "queued": self.queued,
+            "average_queued_ms": self.queued_time / self.queued * 1000 if self.queued else 0.0,
+            "average_connect_ms": self.connect_time / self.connections_created * 1000 if self.connections_created else 0.0,
+        }
+
+
+class VllmConnectionPool:
+    """Connection pool dedicated to one vLLM server.
+
+    Connections are kept alive between requests, host names are resolved from a
+    DNS cache, and a co-located server can be reached over a Unix socket. The
+    pool is separate from the session Home Assistant shares between
+    integrations, so its size and keep-alive can be tuned for the LLM backend.
+    """
+
+    def __init__(self, limit: int, keepalive_timeout: float, dns_cache_ttl: int, unix_socket: str | None = None) -> None:
+        """Initialize the pool.
+
+        Args:
+            limit: The maximum number of simultaneous connections.
+            keepalive_timeout: The number of seconds an idle connection is kept open.
+            dns_cache_ttl: The number of seconds resolved host names are cached.
+            unix_socket: The path of a Unix socket to connect through instead of TCP.
+
+        """
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.unix_socket = unix_socket
+        self.stats = VllmConnectionPoolStats()
+
+        if unix_socket:
+            connector = aiohttp.UnixConnector(
+                path=unix_socket,
+                limit=limit,
+                keepalive_timeout=keepalive_timeout,
+            )
+        else:
+            connector = aiohttp.TCPConnector(
+                limit=limit,
+                limit_per_host=limit,
+                keepalive_timeout=keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=dns_cache_ttl,
+                enable_cleanup_closed=True,
+            )
+
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            trace_configs=[self._trace_config()],
+        )
+
+    async def async_close(self) -> None:
+        """Close the pool and all of its connections."""
+        LOGGER.debug("Closing vLLM connection pool")
+        await self.session.close()
+
+    def as_dict(self) -> dict:
+        """Return the configuration and stats of the pool for diagnostics."""
+        return {
+            "limit": self.limit,
+            "keepalive_timeout": self.keepalive_timeout,
+            "unix_socket": bool(self.unix_socket),
+            **self.stats.as_dict(),
+        }
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Return a trace config feeding the pool stats."""
+        stats = self.stats
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params) -> None:
+            stats.requests += 1
+
+        async def on_connection_queued_start(session, context, params) -> None:
+            context.queued_at = time.monotonic()
+
+        async def on_connection_queued_end(session, context, params) -> None:
+            queued_time = time.monotonic() - context.queued_at
+            stats.queued += 1
+            stats.queued_time += queued_time
+            add_span_time("queue_ms", queued_time)
+
+        async def on_connection_create_start(session, context, params) -> None:
+            context.connect_at = time.monotonic()
+
+        async def on_connection_create_end(session, context, params) -> None:
+            stats.connections_created += 1
+            stats.connect_time += time.monotonic() - context.connect_at
+
+        async def on_connection_reuseconn(session, context, params) -> None:
+            stats.connections_reused += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_queued_start.append(
+            on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(on_connection_queued_end)
+        trace_config.on_connection_create_start.append(
+            on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
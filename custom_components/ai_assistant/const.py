@@ -6,19 +6,72 @@ LOGGER: Logger = getLogger(__package__)
 NAME = "AI Assistant"
 DOMAIN = "ai_assistant"
 
+DATA_ENTITY_INDEX = "entity_index"
+DATA_ENTITY_RESOLVER = "entity_resolver"
+DATA_CALENDAR_CACHE = "calendar_cache"
+DATA_COORDINATOR = "coordinator"
+DATA_AGENT = "agent"
+DATA_CLIENT = "client"
+DATA_CONNECTION_POOL = "connection_pool"
+DATA_PROMPT_TEMPLATES = "prompt_templates"
+
 MENU_OPTIONS = ["general_config", "model_config", "prompt_system"]
 
+ROUTING_LEAST_OUTSTANDING = "least_outstanding"
+ROUTING_LATENCY = "latency"
+ROUTING_STRATEGIES = [ROUTING_LEAST_OUTSTANDING, ROUTING_LATENCY]
+
 CONF_BASE_URL = "base_url"
 CONF_TIMEOUT = "timeout"
+CONF_EXTRA_BASE_URLS = "extra_base_urls"
+CONF_ROUTING_STRATEGY = "routing_strategy"
+CONF_RETRIES = "retries"
+CONF_HEDGING = "hedging"
+CONF_HEDGE_PERCENTILE = "hedge_percentile"
+CONF_RESPONSE_CACHE = "response_cache"
+CONF_RESPONSE_CACHE_TTL = "response_cache_ttl"
+CONF_FAST_PATH = "fast_path"
+CONF_POOL_SIZE = "pool_size"
+CONF_KEEPALIVE_TIMEOUT = "keepalive_timeout"
+CONF_UNIX_SOCKET = "unix_socket"
 CONF_MODEL = "chat_model"
 CONF_CTX_SIZE = "ctx_size"
 CONF_MAX_TOKENS = "max_tokens"
 CONF_TEMPERATURE = "temperature"
 CONF_TOP_P = "top_p"
 CONF_PROMPT_SYSTEM = "prompt"
+CONF_PROMPT_CACHE_FRIENDLY = "prompt_cache_friendly"
+CONF_PROMPT_LIVE_STATE = "prompt_live_state"
+CONF_STREAM = "stream"
+CONF_TOOL_FILTERING = "tool_filtering"
+CONF_MAX_TOOL_ROUNDS = "max_tool_rounds"
+CONF_TURN_TIMEOUT = "turn_timeout"
+CONF_MAX_CONCURRENT_TURNS = "max_concurrent_turns"
+CONF_SHED_LOAD = "shed_load"
+CONF_MAX_QUEUED_TURNS = "max_queued_turns"
+CONF_HISTORY_MAX_CONVERSATIONS = "history_max_conversations"
+CONF_HISTORY_IDLE_TTL = "history_idle_ttl"
+CONF_HISTORY_MAX_MESSAGES = "history_max_messages"
+CONF_HISTORY_PERSIST = "history_persist"
 
 DEFAULT_BASE_URL = "http://localhost:8000"
 DEFAULT_TIMEOUT = 60
+DEFAULT_EXTRA_BASE_URLS = ""
+DEFAULT_ROUTING_STRATEGY = ROUTING_LEAST_OUTSTANDING
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_BASE_DELAY = 0.25
+DEFAULT_RETRY_MAX_DELAY = 2.0
+DEFAULT_HEDGING = False
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_RESPONSE_CACHE = False
+DEFAULT_RESPONSE_CACHE_TTL = 5
+DEFAULT_FAST_PATH = False
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 3
+DEFAULT_CIRCUIT_RESET_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 10
+DEFAULT_KEEPALIVE_TIMEOUT = 60
+DEFAULT_DNS_CACHE_TTL = 300
+DEFAULT_UNIX_SOCKET = ""
 DEFAULT_MODEL = "meetkai/functionary-small-v3.2"
 DEFAULT_CTX_SIZE = 8192
 DEFAULT_MAX_TOKENS = 2048
@@ -28,6 +81,23 @@ DEFAULT_MIROSTAT_TAU = 5.0
 DEFAULT_TEMPERATURE = 0.8
 DEFAULT_REPEAT_PENALTY = 1.1
 DEFAULT_TOP_P = 0.9
+DEFAULT_STREAM = False
+DEFAULT_TOOL_FILTERING = False
+DEFAULT_PROMPT_CACHE_FRIENDLY = False
+DEFAULT_MAX_TOOL_ROUNDS = 5
+DEFAULT_TURN_TIMEOUT = 120
+DEFAULT_MAX_CONCURRENT_TURNS = 4
+DEFAULT_SHED_LOAD = False
+DEFAULT_MAX_QUEUED_TURNS = 8
+DEFAULT_HISTORY_MAX_CONVERSATIONS = 50
+DEFAULT_HISTORY_IDLE_TTL = 30
+DEFAULT_HISTORY_MAX_MESSAGES = 40
+DEFAULT_HISTORY_PERSIST = False
+DEFAULT_HISTORY_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_TOOL_CALL_CONCURRENCY = 4
+DEFAULT_SERVICE_CALL_TIMEOUT = 10
+
+SIGNAL_STREAM_SENTENCE = f"{DOMAIN}_stream_sentence"
 
 ROLE_KEY = "role"
 CONTENT_KEY = "content"
@@ -41,6 +111,12 @@ SYSTEM_ROLE = "system"
 TOOL_ROLE = "tool"
 
 TOOL_DOES_NOT_EXIST = "Tool not found."
+TOOL_TIMED_OUT = "The tool did not finish in time, it may or may not have taken effect."
+TOOL_NOT_RUN = "The tool was not run, there was no time left."
+TURN_LIMIT_REACHED = "Sorry, I wasn't able to finish that request."
+TURN_TIMED_OUT = "Sorry, that took longer than expected. Please try again."
+TURN_BUSY = "Sorry, I'm busy right now. Please try again in a moment."
+CONTEXT_SUMMARY_HEADER = "Summary of the earlier conversation:"
 
 
 DEFAULT_PROMPT_SYSTEM = """You are 'Jarvis', a helpful Assistant that can control the devices in this house.
@@ -79,3 +155,58 @@ List of automations in this home, listed with their entity_id, name, and current
 Answer the user's questions about the world truthfully.
 If necessary, use the tools provided to complete the tasks requested by the user.
 """
+
+
+# Used when the cache friendly prompt layout is enabled. The system prompt only
+# describes things that rarely change, so consecutive requests share a long
+# prefix the inference server can serve from its prefix cache. Everything that
+# changes often lives in the live state prompt, which is sent right before the
+# latest user message and is not kept in the conversation history.
+DEFAULT_PROMPT_SYSTEM_STATIC = """You are 'Jarvis', a helpful Assistant that can control the devices in this house.
+
+List of devices in this home, grouped by area, listed with their entity_id and name:
+{%- for area, entities in exposed_entities.items() %}
+  {% if area not in ["scenes", "automations", "scripts"] %}
+    {%- set area_info = namespace(printed=false) %}
+    {%- for entity in entities %}
+      {%- if not area_info.printed %}
+  {{ area }}:
+          {%- set area_info.printed = true %}
+      {%- endif %}
+  - {{ entity.entity_id }} {{ entity.name }}
+    {%- endfor %}
+  {%- endif %}
+{%- endfor %}
+
+List of scenes in this home, listed with their entity_id and name:
+{%- for entity in exposed_entities.scenes %}
+  - {{ entity.entity_id }} {{ entity.name }}
+{%- endfor %}
+
+List of scripts in this home, listed with their entity_id and name:
+{%- for entity in exposed_entities.scripts %}
+  - {{ entity.entity_id }} {{ entity.name }}
+{%- endfor %}
+
+List of automations in this home, listed with their entity_id and name:
+{%- for entity in exposed_entities.automations %}
+  - {{ entity.entity_id }} {{ entity.name }}
+{%- endfor %}
+
+The current state of the home is provided in a separate message right before the user's latest request.
+Answer the user's questions about the world truthfully.
+If necessary, use the tools provided to complete the tasks requested by the user.
+"""
+
+DEFAULT_PROMPT_LIVE_STATE = """The current time and date is {{ (as_timestamp(now()) | timestamp_custom("%I:%M %p on %A %B %d, %Y")) }}
+The current weather is {{ states('weather.home') }} with a temperature of {{ state_attr('weather.home', 'temperature') }} degrees Fahrenheit.
+
+Current state of the devices and automations in this home, listed with their entity_id and state:
+{%- for area, entities in exposed_entities.items() %}
+  {%- if area not in ["scenes", "scripts"] %}
+    {%- for entity in entities %}
+  - {{ entity.entity_id }} - {{ entity.state }}
+    {%- endfor %}
+  {%- endif %}
+{%- endfor %}
+"""
@@ -0,0 +1,290 @@
+"""This module keeps the requests of a conversation within the context window."""
+
+from __future__ import annotations
+
+from .const import (
+    LOGGER,
+    CONTENT_KEY,
+    ROLE_KEY,
+    TOOL_CALLS_KEY,
+    ASSISTANT_ROLE,
+    SYSTEM_ROLE,
+    TOOL_ROLE,
+    USER_ROLE,
+    CONTEXT_SUMMARY_HEADER,
+)
+from .helpers import system_message
+
+# Characters per token assumed until the server reports actual token counts
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+# Bounds of the calibrated characters per token
+MIN_CHARS_PER_TOKEN = 1.5
+MAX_CHARS_PER_TOKEN = 8.0
+
+# Weight of the latest measurement in the calibrated characters per token
+CALIBRATION_ALPHA = 0.2
+
+# Tokens added by the chat template around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Longest line of the rolling summary, in characters
+SUMMARY_LINE_LENGTH = 200
+
+# Share of the budget the rolling summary may take up
+SUMMARY_BUDGET_SHARE = 0.25
+
+# Share of the budget a conversation is shortened to once it doesn't fit, so it
+# is only shortened every few turns and the cached prompt prefix stays valid in between
+TRIM_TARGET_SHARE = 0.75
+
+
+class TokenEstimator:
+    """Estimates the number of tokens of messages from their length.
+
+    The number of characters per token is calibrated against the prompt token
+    counts reported by the server, so the estimate adapts to the tokenizer of the
+    model and the language of the conversation without loading the tokenizer.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the estimator."""
+        self.chars_per_token = DEFAULT_CHARS_PER_TOKEN
+        self.calibrations = 0
+
+    def estimate_chars(self, chars: int) -> int:
+        """Return the estimated number of tokens of a number of characters."""
+        return int(chars / self.chars_per_token) + 1
+
+    def estimate_message(self, message: dict) -> int:
+        """Return the estimated number of tokens of a message."""
+        return self.estimate_chars(message_chars(message)) + MESSAGE_OVERHEAD_TOKENS
+
+    def estimate(self, messages: list[dict]) -> int:
+        """Return the estimated number of tokens of a list of messages."""
+        return sum(self.estimate_message(message) for message in messages)
+
+    def calibrate(self, chars: int, messages: int, prompt_tokens: int) -> None:
+        """Calibrate the estimate against the token count of a prompt.
+
+        Args:
+            chars: The number of characters sent, including the tools.
+            messages: The number of messages sent.
+            prompt_tokens: The number of prompt tokens reported by the server.
+
+        """
+        content_tokens = prompt_tokens - messages * MESSAGE_OVERHEAD_TOKENS
+        if chars <= 0 or content_tokens <= 0:
+            return
+
+        measured = min(MAX_CHARS_PER_TOKEN, max(MIN_CHARS_PER_TOKEN, chars / content_tokens))
+        self.chars_per_token += CALIBRATION_ALPHA * (measured - self.chars_per_token)
+        self.calibrations += 1
+
+
+class ContextStats:
+    """Counters describing the context window management."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.requests = 0
+        self.fitted_requests = 0
+        self.dropped_tool_messages = 0
+        self.summarized_turns = 0
+        self.overflows = 0
+        self.last_estimate = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        return {
+            "requests": self.requests,
+            "fitted_requests": self.fitted_requests,
+            "dropped_tool_messages": self.dropped_tool_messages,
+            "summarized_turns": self.summarized_turns,
+            "overflows": self.overflows,
+            "last_estimate": self.last_estimate,
+        }
+
+
+class ContextWindow:
+    """Fits the messages of a conversation into the context window of the model.
+
+    The prompt may use the context size minus the tokens reserved for the reply.
+    When a conversation grows past that, the tool calls and tool results of
+    earlier turns are dropped first, oldest first. If that is not enough, the
+    oldest turns are folded into a rolling summary kept right after the system
+    prompt. The system prompt and the current turn are never touched.
+    """
+
+    def __init__(self, ctx_size: int, max_tokens: int) -> None:
+        """Initialize the context window.
+
+        Args:
+            ctx_size: The context size of the model in tokens.
+            max_tokens: The number of tokens reserved for the reply.
+
+        """
+        self.ctx_size = ctx_size
+        self.max_tokens = max_tokens
+        self.estimator = TokenEstimator()
+        self.stats = ContextStats()
+
+    @property
+    def budget(self) -> int:
+        """Return the number of tokens the prompt may use."""
+        return self.ctx_size - self.max_tokens
+
+    def fit(self, messages: list[dict], reserved_tokens: int = 0) -> list[dict]:
+        """Return the messages, shortened as needed to fit the budget.
+
+        The messages are returned as they are when they already fit, which is
+        the case for most requests. Otherwise they are shortened well below the
+        budget, so the following turns fit again without shortening.
+
+        Args:
+            messages: The messages of the conversation.
+            reserved_tokens: Tokens sent along with the messages, such as tools.
+
+        """
+        budget = self.budget - reserved_tokens
+        estimate = self.estimator.estimate(messages)
+        self.stats.requests += 1
+        self.stats.last_estimate = estimate + reserved_tokens
+        if estimate <= budget:
+            return messages
+
+        self.stats.fitted_requests += 1
+        target = int(budget * TRIM_TARGET_SHARE)
+        head, summary, turns, current = _split_conversation(messages)
+        fixed = self.estimator.estimate(head) + self.estimator.estimate(current)
+        turn_tokens = [self.estimator.estimate(turn) for turn in turns]
+
+        def total() -> int:
+            return fixed + sum(turn_tokens) + (
+                self.estimator.estimate_message(summary) if summary is not None else 0)
+
+        # Drop the tool calls and tool results of earlier turns, oldest first
+        for index, turn in enumerate(turns):
+            if total() <= target:
+                break
+            kept = [message for message in turn if not _is_tool_exchange(message)]
+            if len(kept) != len(turn):
+                self.stats.dropped_tool_messages += len(turn) - len(kept)
+                turns[index] = kept
+                turn_tokens[index] = self.estimator.estimate(kept)
+
+        # Fold the oldest turns into the rolling summary
+        summary_lines = _summary_lines(summary)
+        summarized = 0
+        while turns and total() > target:
+            summary_lines.extend(_summarize_turn(turns.pop(0)))
+            turn_tokens.pop(0)
+            summarized += 1
+            summary_lines = self._cap_summary(summary_lines, budget)
+            summary = _summary_message(summary_lines)
+
+        self.stats.summarized_turns += summarized
+        fitted = head + ([summary] if summary is not None else []) + \
+            [message for turn in turns for message in turn] + current
+
+        if (estimate := self.estimator.estimate(fitted)) > budget:
+            self.stats.overflows += 1
+            LOGGER.warning(
+                "The prompt of about %s tokens doesn't fit the context size of %s tokens, "
+                "consider shortening the system prompt or increasing the context size",
+                estimate + reserved_tokens + self.max_tokens, self.ctx_size)
+        else:
+            LOGGER.debug("Fitted the conversation into %s tokens, summarized %s turns",
+                         estimate + reserved_tokens, summarized)
+        return fitted
+
+    def as_dict(self) -> dict:
+        """Return the state of the context window for diagnostics."""
+        return {
+            "ctx_size": self.ctx_size,
+            "max_tokens": self.max_tokens,
+            "chars_per_token": round(self.estimator.chars_per_token, 2),
+            "calibrations": self.estimator.calibrations,
+            **self.stats.as_dict(),
+        }
+
+    def _cap_summary(self, lines: list[str], budget: int) -> list[str]:
+        """Drop the oldest summary lines once the summary takes too much of the budget."""
+        max_tokens = int(budget * SUMMARY_BUDGET_SHARE)
+        while len(lines) > 1 and self.estimator.estimate_message(_summary_message(lines)) > max_tokens:
+            lines = lines[1:]
+        return lines
+
+
+def message_chars(message: dict) -> int:
+    """Return the number of characters of a message that count towards its tokens."""
+    chars = len(message.get(CONTENT_KEY) or "")
+    for tool_call in message.get(TOOL_CALLS_KEY) or []:
+        function = tool_call.get("function") or {}
+        chars += len(function.get("name") or "") + \
+            len(str(function.get("arguments") or ""))
+    return chars
+
+
+def _split_conversation(messages: list[dict]) -> tuple[list[dict], dict | None, list[list[dict]], list[dict]]:
+    """Split a conversation into its system prompt, summary, earlier turns and current turn."""
+    start = 0
+    while start < len(messages) and messages[start].get(ROLE_KEY) == SYSTEM_ROLE:
+        start += 1
+    head = messages[:start]
+
+    summary = None
+    if head and _is_summary(head[-1]):
+        summary = head.pop()
+
+    current_start = len(messages)
+    for index in range(len(messages) - 1, start - 1, -1):
+        if messages[index].get(ROLE_KEY) == USER_ROLE:
+            current_start = index
+            break
+
+    turns: list[list[dict]] = []
+    for message in messages[start:current_start]:
+        if message.get(ROLE_KEY) == USER_ROLE or not turns:
+            turns.append([])
+        turns[-1].append(message)
+
+    return head, summary, turns, messages[current_start:]
+
+
+def _is_tool_exchange(message: dict) -> bool:
+    """Return whether a message is a tool call or a tool result."""
+    return message.get(ROLE_KEY) == TOOL_ROLE or (
+        message.get(ROLE_KEY) == ASSISTANT_ROLE and bool(message.get(TOOL_CALLS_KEY)))
+
+
+def _is_summary(message: dict) -> bool:
+    """Return whether a message is the rolling summary."""
+    return message.get(ROLE_KEY) == SYSTEM_ROLE and \
+        (message.get(CONTENT_KEY) or "").startswith(CONTEXT_SUMMARY_HEADER)
+
+
+def _summary_lines(summary: dict | None) -> list[str]:
+    """Return the lines of the rolling summary."""
+    if summary is None:
+        return []
+    return summary[CONTENT_KEY][len(CONTEXT_SUMMARY_HEADER):].strip().splitlines()
+
+
+def _summary_message(lines: list[str]) -> dict:
+    """Return the rolling summary message made of lines."""
+    return system_message(CONTEXT_SUMMARY_HEADER + "\n" + "\n".join(lines))
+
+
+def _summarize_turn(turn: list[dict]) -> list[str]:
+    """Return the summary lines of a turn: what the user said and what the assistant answered."""
+    lines = []
+    for message in turn:
+        role = message.get(ROLE_KEY)
+        content = " ".join((message.get(CONTENT_KEY) or "").split())
+        if role not in (USER_ROLE, ASSISTANT_ROLE) or not content:
+            continue
+        if len(content) > SUMMARY_LINE_LENGTH:
+            content = content[:SUMMARY_LINE_LENGTH - 3].rstrip() + "..."
+        lines.append(f"- {role.capitalize()}: {content}")
+    return lines
@@ -4,7 +4,7 @@ from __future__ import annotations
 from datetime import timedelta
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
     UpdateFailed,
@@ -13,11 +13,28 @@ from homeassistant.helpers.update_coordinator import (
 from .const import DOMAIN, LOGGER
 from .exceptions import ApiClientError
 from .api import VllmApiClient
+from .balancer import VllmEndpoint
+
+# Interval of the heartbeat while a server is down or failing
+HEARTBEAT_MIN_INTERVAL = timedelta(seconds=30)
+
+# Interval of the heartbeat after setup and after recovering, doubled after every healthy heartbeat
+HEARTBEAT_INTERVAL = timedelta(minutes=5)
+
+# Longest interval of the heartbeat while every server is healthy
+HEARTBEAT_MAX_INTERVAL = timedelta(minutes=30)
 
 
 # https://developers.home-assistant.io/docs/integration_fetching_data#coordinated-single-api-poll-for-data-for-all-entities
 class AIConversationDataUpdateCoordinator(DataUpdateCoordinator):
-    """Class to manage fetching data from the API."""
+    """Class to manage fetching data from the API.
+
+    The heartbeat adapts to the health of the servers. While every server is
+    healthy it backs off up to HEARTBEAT_MAX_INTERVAL, and servers that answered
+    a request since the last heartbeat aren't probed at all. As soon as a server
+    fails, a heartbeat or a request, it is probed every HEARTBEAT_MIN_INTERVAL
+    until it is back.
+    """
 
     config_entry: ConfigEntry
 
@@ -32,12 +49,41 @@ class AIConversationDataUpdateCoordinator(DataUpdateCoordinator):
             hass=hass,
             logger=LOGGER,
             name=DOMAIN,
-            update_interval=timedelta(minutes=5),
+            update_interval=HEARTBEAT_INTERVAL,
         )
+        client.endpoints.add_ejection_listener(self._async_endpoint_ejected)
+
+    @callback
+    def _async_endpoint_ejected(self, endpoint: VllmEndpoint) -> None:
+        """Probe the servers right away when a request ejected one, and often until it is back."""
+        LOGGER.debug("Checking the vLLM servers after %s failed a request", endpoint.base_url)
+        self.update_interval = HEARTBEAT_MIN_INTERVAL
+        self.hass.async_create_task(self.async_request_refresh())
 
     async def _async_update_data(self):
         """Update data via library."""
         try:
-            return await self.client.async_get_heartbeat()
+            healthy = await self.client.async_get_heartbeat(
+                max_age=self.update_interval.total_seconds())
         except ApiClientError as exception:
+            self.update_interval = HEARTBEAT_MIN_INTERVAL
             raise UpdateFailed(exception) from exception
+
+        if not healthy:
+            self.update_interval = HEARTBEAT_MIN_INTERVAL
+            raise UpdateFailed("Invalid vLLM server")
+
+        if not all(endpoint.healthy for endpoint in self.client.endpoints):
+            self.update_interval = HEARTBEAT_MIN_INTERVAL
+        elif self.update_interval < HEARTBEAT_INTERVAL:
+            self.update_interval = HEARTBEAT_INTERVAL
+        else:
+            self.update_interval = min(self.update_interval * 2, HEARTBEAT_MAX_INTERVAL)
+        return healthy
+
+    def as_dict(self) -> dict:
+        """Return the state of the heartbeat for diagnostics."""
+        return {
+            "interval_s": self.update_interval.total_seconds(),
+            "last_update_success": self.last_update_success,
+        }
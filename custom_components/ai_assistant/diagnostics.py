@@ -0,0 +1,49 @@
+"""Diagnostics support for AI Assistant."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .agent import AIConversationAgent
+from .api import VllmApiClient
+from .connection import VllmConnectionPool
+from .const import DATA_AGENT, DATA_CLIENT, DATA_CONNECTION_POOL, DATA_COORDINATOR, DOMAIN
+from .coordinator import AIConversationDataUpdateCoordinator
+from .calendar_cache import async_get_calendar_cache
+from .entity_resolver import async_get_entity_resolver
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    agent: AIConversationAgent = hass.data[DOMAIN][entry.entry_id][DATA_AGENT]
+    client: VllmApiClient = hass.data[DOMAIN][entry.entry_id][DATA_CLIENT]
+    pool: VllmConnectionPool = hass.data[DOMAIN][entry.entry_id][DATA_CONNECTION_POOL]
+    coordinator: AIConversationDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id][DATA_COORDINATOR]
+
+    return {
+        "options": dict(entry.options),
+        "endpoints": client.endpoints.as_dict(),
+        "circuit_breaker": client.circuit_breaker.as_dict(),
+        "heartbeat": coordinator.as_dict(),
+        "model_catalog": client.model_catalog.as_dict(),
+        "resilience": client.stats.as_dict(),
+        "coalescing": client.coalescer.stats.as_dict(),
+        "connection_pool": pool.as_dict(),
+        "history": agent.history.as_dict(),
+        "history_storage": agent.history_storage.as_dict() if agent.history_storage is not None else None,
+        "context": agent.context.as_dict(),
+        "response_cache": agent.response_cache.as_dict() if agent.response_cache is not None else None,
+        "fast_path": agent.fast_path.stats.as_dict() if agent.fast_path is not None else None,
+        "entity_resolver": async_get_entity_resolver(hass).as_dict(),
+        "calendar_cache": async_get_calendar_cache(hass).as_dict(),
+        "admission": agent.admission.as_dict(),
+        "last_turn_rounds": agent.last_turn_rounds,
+        "tracing": agent.tracer.as_dict(),
+        "prompt_renders": agent.prompt_templates.as_dict(),
+        "tool_selector": agent.tool_selector.stats.as_dict(),
+    }
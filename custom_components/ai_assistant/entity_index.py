@@ -0,0 +1,254 @@
+"""This module provides an incrementally maintained index of exposed entities."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+
+from homeassistant.components.conversation import DOMAIN as CONVERSATION_DOMAIN
+from homeassistant.components.homeassistant.exposed_entities import (
+    async_listen_entity_updates,
+    async_should_expose,
+)
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, State, callback
+from homeassistant.helpers import area_registry, entity_registry
+
+from .const import DATA_ENTITY_INDEX, DOMAIN, LOGGER
+
+SPECIAL_GROUPS = {
+    "scene": "scenes",
+    "script": "scripts",
+    "automation": "automations",
+}
+NO_AREA = "No Area"
+
+
+class ExposedEntityIndex:
+    """Index of the entities exposed to conversation agents, grouped by area and domain.
+
+    The index is built once from the state machine and then kept up to date from
+    state changes, entity and area registry updates, and changes to the expose
+    settings, so reading it costs time proportional to the exposed entities only.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the index."""
+        self.hass = hass
+        self._entity_registry = entity_registry.async_get(hass)
+        self._area_registry = area_registry.async_get(hass)
+        self._entities: dict[str, str] = {}
+        self._groups: dict[str, dict[str, dict]] = {}
+        self._domains: dict[str, set[str]] = {}
+        self._not_exposed: set[str] = set()
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._update_listeners: list[Callable[[str, dict | None], None]] = []
+        self._reset()
+
+    @callback
+    def async_start(self) -> None:
+        """Build the index and start listening for updates."""
+        self._listeners = [
+            self.hass.bus.async_listen(
+                EVENT_STATE_CHANGED, self._async_state_changed),
+            self.hass.bus.async_listen(
+                entity_registry.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_registry_updated),
+            self.hass.bus.async_listen(
+                area_registry.EVENT_AREA_REGISTRY_UPDATED, self._async_area_registry_updated),
+            async_listen_entity_updates(
+                self.hass, CONVERSATION_DOMAIN, self._async_rebuild),
+        ]
+        self._async_rebuild()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening for updates."""
+        for unsubscribe in self._listeners:
+            unsubscribe()
+        self._listeners = []
+
+    @callback
+    def async_add_listener(self, update_listener: Callable[[str, dict | None], None]) -> CALLBACK_TYPE:
+        """Register a listener called with the entity ID and new record, or None on removal."""
+        self._update_listeners.append(update_listener)
+
+        @callback
+        def remove_listener() -> None:
+            self._update_listeners.remove(update_listener)
+
+        return remove_listener
+
+    @callback
+    def async_get_exposed_entities(self) -> dict[str, list[dict]]:
+        """Return the exposed entities grouped by area."""
+        return {
+            group: list(records.values())
+            for group, records in self._groups.items()
+        }
+
+    @callback
+    def async_get_entities_by_domain(self) -> dict[str, list[dict]]:
+        """Return the exposed entities grouped by domain."""
+        return {
+            domain: [self._groups[self._entities[entity_id]][entity_id]
+                     for entity_id in entity_ids]
+            for domain, entity_ids in self._domains.items()
+        }
+
+    @callback
+    def async_get_entity(self, entity_id: str) -> dict | None:
+        """Return the record of an exposed entity."""
+        group = self._entities.get(entity_id)
+        if group is None:
+            return None
+        return self._groups[group][entity_id]
+
+    @property
+    def exposed_domains(self) -> set[str]:
+        """Return the domains that have at least one exposed entity."""
+        return set(self._domains)
+
+    def __len__(self) -> int:
+        """Return the number of exposed entities."""
+        return len(self._entities)
+
+    def _reset(self) -> None:
+        """Clear the index."""
+        self._entities = {}
+        self._groups = {group: {} for group in SPECIAL_GROUPS.values()}
+        self._domains = {}
+        self._not_exposed = set()
+
+    @callback
+    def _async_rebuild(self) -> None:
+        """Rebuild the index from the state machine."""
+        self._reset()
+        for state in self.hass.states.async_all():
+            self._async_update_entity(state.entity_id, state)
+        LOGGER.debug("Built exposed entity index with %s entities", len(self))
+
+    @callback
+    def _async_update_entity(self, entity_id: str, state: State | None) -> None:
+        """Add, update or remove a single entity."""
+        if state is None or not async_should_expose(self.hass, CONVERSATION_DOMAIN, entity_id):
+            if state is not None:
+                self._not_exposed.add(entity_id)
+            self._async_remove_entity(entity_id)
+            return
+
+        self._not_exposed.discard(entity_id)
+        group, record = exposed_entity_record(
+            self._entity_registry, self._area_registry, state)
+
+        previous_group = self._entities.get(entity_id)
+        if previous_group is not None and previous_group != group:
+            del self._groups[previous_group][entity_id]
+            if not self._groups[previous_group] and previous_group not in SPECIAL_GROUPS.values():
+                del self._groups[previous_group]
+
+        self._entities[entity_id] = group
+        self._groups.setdefault(group, {})[entity_id] = record
+        self._domains.setdefault(state.domain, set()).add(entity_id)
+        self._async_notify(entity_id, record)
+
+    @callback
+    def _async_remove_entity(self, entity_id: str) -> None:
+        """Remove an entity from the index."""
+        group = self._entities.pop(entity_id, None)
+        if group is None:
+            return
+
+        del self._groups[group][entity_id]
+        if not self._groups[group] and group not in SPECIAL_GROUPS.values():
+            del self._groups[group]
+
+        domain = entity_id.split(".")[0]
+        self._domains[domain].discard(entity_id)
+        if not self._domains[domain]:
+            del self._domains[domain]
+        self._async_notify(entity_id, None)
+
+    @callback
+    def _async_notify(self, entity_id: str, record: dict | None) -> None:
+        """Notify update listeners about a changed entity."""
+        for update_listener in self._update_listeners:
+            update_listener(entity_id, record)
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Handle a state change."""
+        entity_id = event.data["entity_id"]
+        new_state = event.data.get("new_state")
+
+        if new_state is not None and entity_id in self._not_exposed:
+            return
+
+        self._async_update_entity(entity_id, new_state)
+
+    @callback
+    def _async_entity_registry_updated(self, event: Event) -> None:
+        """Handle an entity registry update."""
+        entity_id = event.data["entity_id"]
+        if old_entity_id := event.data.get("old_entity_id"):
+            self._not_exposed.discard(old_entity_id)
+            self._async_remove_entity(old_entity_id)
+
+        self._not_exposed.discard(entity_id)
+        self._async_update_entity(entity_id, self.hass.states.get(entity_id))
+
+    @callback
+    def _async_area_registry_updated(self, event: Event) -> None:
+        """Handle an area registry update by regrouping the entities assigned to areas."""
+        for entity_id, group in list(self._entities.items()):
+            if group not in SPECIAL_GROUPS.values():
+                self._async_update_entity(
+                    entity_id, self.hass.states.get(entity_id))
+
+
+def exposed_entity_record(
+    hass_entity: entity_registry.EntityRegistry,
+    hass_area: area_registry.AreaRegistry,
+    state: State,
+) -> tuple[str, dict]:
+    """Return the group and the prompt record of an exposed entity."""
+    if state.domain in ("scene", "script"):
+        return SPECIAL_GROUPS[state.domain], {
+            "entity_id": state.entity_id,
+            "name": state.name,
+        }
+
+    if state.domain == "automation":
+        return SPECIAL_GROUPS[state.domain], {
+            "entity_id": state.entity_id,
+            "name": state.name,
+            "state": state.state,
+        }
+
+    entity = hass_entity.async_get(state.entity_id)
+    area = hass_area.async_get_area(
+        entity.area_id) if entity and entity.area_id else None
+    area_name = area.name if area else NO_AREA
+
+    return area_name, {
+        "entity_id": state.entity_id,
+        "name": state.name,
+        "state": state.state,
+        "attributes": state.attributes,
+        "aliases": entity.aliases if entity else [],
+    }
+
+
+@callback
+def async_get_entity_index(hass: HomeAssistant) -> ExposedEntityIndex:
+    """Return the shared exposed entity index, building it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (index := domain_data.get(DATA_ENTITY_INDEX)) is None:
+        index = domain_data[DATA_ENTITY_INDEX] = ExposedEntityIndex(hass)
+        index.async_start()
+    return index
+
+
+@callback
+def async_release_entity_index(hass: HomeAssistant) -> None:
+    """Stop and drop the shared exposed entity index."""
+    if (index := hass.data.get(DOMAIN, {}).pop(DATA_ENTITY_INDEX, None)) is not None:
+        index.async_stop()
@@ -0,0 +1,240 @@
+"""This module resolves misspelled or invented entity IDs to exposed entities."""
+
+from __future__ import annotations
+
+from collections import Counter
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import DATA_ENTITY_RESOLVER, DOMAIN
+from .entity_index import async_get_entity_index
+from .helpers import normalize_utterance
+
+# Lowest similarity for an entity to be suggested
+MIN_SUGGESTION_SCORE = 0.35
+
+# Lowest similarity, and lead over the next best entity, for an entity ID to be corrected without asking
+AUTO_CORRECT_SCORE = 0.7
+AUTO_CORRECT_MARGIN = 0.15
+
+# Added to the similarity of entities in the domain the entity ID names, so they win ties
+DOMAIN_MATCH_BONUS = 0.05
+
+# Number of entities suggested for an entity ID that can't be corrected
+MAX_SUGGESTIONS = 3
+
+
+class EntityMatch:
+    """An exposed entity similar to the entity ID that was looked up."""
+
+    def __init__(self, entity_id: str, name: str, score: float):
+        """Initialize the match."""
+        self.entity_id = entity_id
+        self.name = name
+        self.score = score
+
+    def __str__(self):
+        """Return a string representation of the match."""
+        return f"{self.entity_id} ({self.name})"
+
+
+class EntityResolverStats:
+    """Counters describing the entity resolver."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.lookups = 0
+        self.corrections = 0
+        self.suggestions = 0
+        self.misses = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        return {
+            "lookups": self.lookups,
+            "corrections": self.corrections,
+            "suggestions": self.suggestions,
+            "misses": self.misses,
+        }
+
+
+class EntityResolver:
+    """Trigram index over the IDs, names and aliases of the exposed entities.
+
+    Every key of an entity, its object ID with the underscores replaced by spaces,
+    its friendly name and each of its aliases, is split into trigrams. A lookup
+    counts the trigrams it shares with each key through the posting lists, so it
+    only touches keys that have something in common with the query, and scores
+    the keys with the Dice coefficient. The index is kept up to date from the
+    exposed entity index.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the resolver."""
+        self.hass = hass
+        self.stats = EntityResolverStats()
+        self._keys: dict[int, str] = {}
+        self._key_trigrams: dict[int, set[str]] = {}
+        self._entity_keys: dict[str, list[int]] = {}
+        self._names: dict[str, str] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._next_key = 0
+        self._unsubscribe: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Index the exposed entities and follow their updates."""
+        index = async_get_entity_index(self.hass)
+        for records in index.async_get_exposed_entities().values():
+            for record in records:
+                self._async_update_entity(record["entity_id"], record)
+        self._unsubscribe = index.async_add_listener(self._async_update_entity)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following entity updates."""
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+
+    def __contains__(self, entity_id: str) -> bool:
+        """Return whether an entity is exposed."""
+        return entity_id in self._entity_keys
+
+    @callback
+    def async_lookup(self, entity_id: str, domains: list[str] | None = None, limit: int = MAX_SUGGESTIONS) -> list[EntityMatch]:
+        """Return the exposed entities most similar to an entity ID or a name, best first.
+
+        Args:
+            entity_id: The entity ID, or a name when it has no domain.
+            domains: The domains the entities must be in, any domain if None.
+            limit: The maximum number of entities to return.
+
+        """
+        self.stats.lookups += 1
+        domain, _, object_id = entity_id.rpartition(".")
+        query_trigrams = _trigrams(_entity_key(object_id))
+        if not query_trigrams:
+            return []
+
+        shared: Counter[int] = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._postings.get(trigram, ()))
+
+        scores: dict[str, float] = {}
+        for key, count in shared.items():
+            key_entity_id = self._keys[key]
+            key_domain = key_entity_id.split(".")[0]
+            if domains is not None and key_domain not in domains:
+                continue
+            score = 2 * count / (len(query_trigrams) + len(self._key_trigrams[key]))
+            if key_domain == domain:
+                score = min(1.0, score + DOMAIN_MATCH_BONUS)
+            if score > scores.get(key_entity_id, 0.0):
+                scores[key_entity_id] = score
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [
+            EntityMatch(match_id, self._names[match_id], score)
+            for match_id, score in ranked[:limit]
+            if score >= MIN_SUGGESTION_SCORE
+        ]
+
+    @callback
+    def async_resolve(self, entity_id: str, domains: list[str] | None = None) -> tuple[str | None, list[EntityMatch]]:
+        """Return the entity an unknown entity ID was meant to be, or suggestions if it's unclear.
+
+        Args:
+            entity_id: The unknown entity ID, or a name when it has no domain.
+            domains: The domains the entity must be in, any domain if None.
+
+        Returns:
+            tuple: The corrected entity ID, or None, and the suggested entities.
+
+        """
+        matches = self.async_lookup(entity_id, domains)
+        if not matches:
+            self.stats.misses += 1
+            return None, []
+
+        best = matches[0]
+        runner_up = matches[1].score if len(matches) > 1 else 0.0
+        if best.score >= AUTO_CORRECT_SCORE and best.score - runner_up >= AUTO_CORRECT_MARGIN:
+            self.stats.corrections += 1
+            return best.entity_id, matches
+
+        self.stats.suggestions += 1
+        return None, matches
+
+    def as_dict(self) -> dict:
+        """Return the state of the resolver for diagnostics."""
+        return {
+            "entities": len(self._entity_keys),
+            "keys": len(self._keys),
+            "trigrams": len(self._postings),
+            **self.stats.as_dict(),
+        }
+
+    @callback
+    def _async_update_entity(self, entity_id: str, record: dict | None) -> None:
+        """Update the keys of an entity, or drop them when it is no longer exposed."""
+        for key in self._entity_keys.pop(entity_id, []):
+            del self._keys[key]
+            for trigram in self._key_trigrams.pop(key):
+                postings = self._postings[trigram]
+                postings.discard(key)
+                if not postings:
+                    del self._postings[trigram]
+        self._names.pop(entity_id, None)
+
+        if record is None:
+            return
+
+        names = [record.get("name"), *(record.get("aliases") or [])]
+        texts = {_entity_key(entity_id.split(".", 1)[-1])} | {
+            normalize_utterance(str(name)) for name in names if name
+        }
+        keys = []
+        for text in texts:
+            if not (trigrams := _trigrams(text)):
+                continue
+            key = self._next_key
+            self._next_key += 1
+            self._keys[key] = entity_id
+            self._key_trigrams[key] = trigrams
+            for trigram in trigrams:
+                self._postings.setdefault(trigram, set()).add(key)
+            keys.append(key)
+
+        self._entity_keys[entity_id] = keys
+        self._names[entity_id] = record.get("name") or entity_id
+
+
+def _entity_key(text: str) -> str:
+    """Return the searchable form of an object ID or a name."""
+    return normalize_utterance(text.replace("_", " "))
+
+
+def _trigrams(text: str) -> set[str]:
+    """Return the trigrams of a text, padded so short words and word starts count."""
+    if not text:
+        return set()
+    padded = f"  {text} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+@callback
+def async_get_entity_resolver(hass: HomeAssistant) -> EntityResolver:
+    """Return the shared entity resolver, building it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (resolver := domain_data.get(DATA_ENTITY_RESOLVER)) is None:
+        resolver = domain_data[DATA_ENTITY_RESOLVER] = EntityResolver(hass)
+        resolver.async_start()
+    return resolver
+
+
+@callback
+def async_release_entity_resolver(hass: HomeAssistant) -> None:
+    """Stop and drop the shared entity resolver."""
+    if (resolver := hass.data.get(DOMAIN, {}).pop(DATA_ENTITY_RESOLVER, None)) is not None:
+        resolver.async_stop()
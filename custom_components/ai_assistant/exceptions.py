@@ -7,8 +7,14 @@ class ApiClientError(HomeAssistantError):
 class ApiCommError(ApiClientError):
     """Exception to indicate a communication error."""
 
+class ApiCircuitOpenError(ApiCommError):
+    """Exception to indicate that requests are failed fast while the server is down."""
+
 class ApiJsonError(ApiClientError):
     """Exception to indicate an error with json response."""
 
 class ApiTimeoutError(ApiClientError):
      """Exception to indicate a timeout error."""
+
+class TurnRejectedError(HomeAssistantError):
+    """Exception to indicate that a turn was turned away because too many are waiting, or it waited too long."""
@@ -0,0 +1,175 @@
+"""This module handles simple commands without querying the model."""
+
+from __future__ import annotations
+
+import re
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import LOGGER
+from .entity_index import async_get_entity_index
+from .helpers import normalize_utterance
+from .tools import SUPPORTED_DOMAINS
+
+# Commands handled locally, matched against the normalized utterance, and the tool each of them calls
+COMMAND_PATTERNS = [
+    (r"(?:turn|switch|power) on (?:the )?(?P<target>.+)", "hass_turn_on"),
+    (r"(?:turn|switch|power) (?:the )?(?P<target>.+) on", "hass_turn_on"),
+    (r"(?:turn|switch|power) off (?:the )?(?P<target>.+)", "hass_turn_off"),
+    (r"(?:turn|switch|power) (?:the )?(?P<target>.+) off", "hass_turn_off"),
+    (r"(?:activate|run) (?:the )?(?P<target>.+)", "hass_turn_on"),
+    (r"toggle (?:the )?(?P<target>.+)", "hass_toggle"),
+    (r"lock (?:the )?(?P<target>.+)", "hass_lock"),
+    (r"unlock (?:the )?(?P<target>.+)", "hass_unlock"),
+    (r"open (?:the )?(?P<target>.+)", "hass_open"),
+    (r"(?:close|shut) (?:the )?(?P<target>.+)", "hass_close"),
+]
+COMPILED_COMMAND_PATTERNS = [(re.compile(f"^{pattern}$"), tool_name)
+                             for pattern, tool_name in COMMAND_PATTERNS]
+
+# Polite words around a command that don't change its meaning
+POLITE_PREFIX_RE = re.compile(r"^(?:(?:please|hey|ok|okay|can you|could you|would you|will you)\s+)+")
+POLITE_SUFFIX_RE = re.compile(r"(?:\s+(?:please|for me|now|thanks|thank you))+$")
+
+# Replies to a command that succeeded, by tool
+FAST_PATH_REPLIES = {
+    "hass_turn_on": "Turned on {name}.",
+    "hass_turn_off": "Turned off {name}.",
+    "hass_toggle": "Toggled {name}.",
+    "hass_lock": "Locked {name}.",
+    "hass_unlock": "Unlocked {name}.",
+    "hass_open": "Opening {name}.",
+    "hass_close": "Closing {name}.",
+}
+FAST_PATH_FAILED = "Sorry, I couldn't do that to {name}."
+
+
+class FastPathMatch:
+    """A command matched to a tool and the entity it acts on."""
+
+    def __init__(self, tool_name: str, entity_id: str, name: str):
+        """Initialize the match."""
+        self.tool_name = tool_name
+        self.entity_id = entity_id
+        self.name = name
+
+    @property
+    def tool_args(self) -> dict:
+        """Return the arguments of the tool call."""
+        return {"entity_ids": [self.entity_id]}
+
+    def reply(self, tool_response: str) -> str:
+        """Return the reply to the command, given the response of the tool."""
+        if tool_response.startswith("Success"):
+            return FAST_PATH_REPLIES[self.tool_name].format(name=self.name)
+        return FAST_PATH_FAILED.format(name=self.name)
+
+
+class FastPathStats:
+    """Counters describing the fast path."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.matches = 0
+        self.no_command = 0
+        self.unknown_target = 0
+        self.ambiguous_target = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        return {
+            "matches": self.matches,
+            "no_command": self.no_command,
+            "unknown_target": self.unknown_target,
+            "ambiguous_target": self.ambiguous_target,
+        }
+
+
+class FastPathMatcher:
+    """Matches simple commands such as "turn off the kitchen light" to a tool call.
+
+    A command is only matched when it follows one of the known patterns and its
+    target is the name or an alias of exactly one exposed entity that the tool
+    supports. Everything else is left to the model. The names are kept up to date
+    from the exposed entity index. Only English commands are matched.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the matcher."""
+        self.hass = hass
+        self.stats = FastPathStats()
+        self._entity_names: dict[str, list[str]] = {}
+        self._names: dict[str, set[str]] = {}
+        self._display_names: dict[str, str] = {}
+        self._unsubscribe: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Index the names of the exposed entities and follow their updates."""
+        index = async_get_entity_index(self.hass)
+        for records in index.async_get_exposed_entities().values():
+            for record in records:
+                self._async_update_entity(record["entity_id"], record)
+        self._unsubscribe = index.async_add_listener(self._async_update_entity)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following entity updates."""
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+
+    @callback
+    def async_match(self, utterance: str, language: str) -> FastPathMatch | None:
+        """Return the tool call for a simple command, or None to leave it to the model."""
+        if not language.lower().startswith("en"):
+            return None
+
+        command = POLITE_SUFFIX_RE.sub("", POLITE_PREFIX_RE.sub("", normalize_utterance(utterance)))
+        for pattern, tool_name in COMPILED_COMMAND_PATTERNS:
+            if (match := pattern.match(command)) is None:
+                continue
+
+            target = match.group("target")
+            entity_ids = [
+                entity_id for entity_id in self._names.get(target, ())
+                if entity_id.split(".")[0] in SUPPORTED_DOMAINS[tool_name]
+            ]
+            if not entity_ids:
+                continue
+            if len(entity_ids) > 1:
+                LOGGER.debug("'%s' matches several entities: %s", target, entity_ids)
+                self.stats.ambiguous_target += 1
+                return None
+
+            self.stats.matches += 1
+            return FastPathMatch(tool_name, entity_ids[0], self._display_names[entity_ids[0]])
+
+        if any(pattern.match(command) for pattern, _tool_name in COMPILED_COMMAND_PATTERNS):
+            self.stats.unknown_target += 1
+        else:
+            self.stats.no_command += 1
+        return None
+
+    @callback
+    def _async_update_entity(self, entity_id: str, record: dict | None) -> None:
+        """Update the names of an entity, or forget them when it is no longer exposed."""
+        for name in self._entity_names.pop(entity_id, []):
+            entity_ids = self._names[name]
+            entity_ids.discard(entity_id)
+            if not entity_ids:
+                del self._names[name]
+        self._display_names.pop(entity_id, None)
+
+        if record is None:
+            return
+
+        names = {
+            normalized
+            for name in [record.get("name"), *(record.get("aliases") or [])]
+            if name and (normalized := normalize_utterance(str(name)))
+        }
+        for name in names:
+            self._names.setdefault(name, set()).add(entity_id)
+        self._entity_names[entity_id] = list(names)
+        self._display_names[entity_id] = record.get("name") or entity_id
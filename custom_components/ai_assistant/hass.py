@@ -1,11 +1,17 @@
 """This module provides a service class for interacting with Home Assistant."""
 
-import json
+import asyncio
+
+import async_timeout
+
 from .hass_provider import HassContextFactory
 
-from .const import LOGGER
+from .const import DOMAIN, LOGGER
 
+from .calendar_cache import async_get_calendar_cache, parse_calendar_time
 from .helpers import generate_available_time_slots_from_calendar_events
+from .serialization import json_dumps_str
+from .tracing import span
 
 from homeassistant.const import ATTR_ENTITY_ID
 
@@ -27,23 +33,34 @@ class ThermostatAttributes:
 class HomeAssistantServiceResult:
     """Result of a service call."""
 
-    def __init__(self, success: bool, error: list[str] | None = None, data=None):
+    def __init__(self, success: bool, error: list[str] | None = None, data=None, timed_out: bool = False, message: str | None = None):
         """Initialize the result."""
         self.success = success
         self.error = error
         self.data = data
+        self.timed_out = timed_out
+        self.message = message
 
     def __str__(self):
         """Return a string representation of the result."""
-        return f"Success: {self.success}, Error: {self.error}"
+        result = f"Success: {self.success}, Error: {self.error}, Timed out: {self.timed_out}"
+        if self.message:
+            result += f", Message: {self.message}"
+        return result
 
 
 class HomeAssistantService:
     """Service class for interacting with Home Assistant."""
 
     @staticmethod
-    async def async_call_service(entity_ids: list[str], domain: str, service: str, data: dict = None) -> HomeAssistantServiceResult:
-        """Call a service."""
+    async def async_call_service(entity_ids: list[str], domain: str, service: str, data: dict = None, timeout: float | None = None) -> HomeAssistantServiceResult:
+        """Call a service, giving up waiting after timeout seconds if one is set.
+
+        The service call runs in its own task, which is never cancelled, neither
+        when the timeout passes nor when the caller is cancelled, so a device is
+        not left half way through an action. A call that is still running then
+        finishes in the background and its outcome is logged.
+        """
 
         hass = HassContextFactory.get_instance()
 
@@ -51,18 +68,31 @@ class HomeAssistantService:
         if data is not None:
             service_data.update(data)
 
-        try:
-            await hass.services.async_call(
+        task = hass.async_create_task(
+            hass.services.async_call(
                 domain,
                 service,
                 service_data,
                 blocking=True,
-            )
+            ),
+            f"{DOMAIN} {domain}.{service}",
+        )
+        try:
+            with span("service", service=f"{domain}.{service}", entities=len(entity_ids)):
+                async with async_timeout.timeout(timeout):
+                    await asyncio.shield(task)
 
             return HomeAssistantServiceResult(success=True)
+        except asyncio.TimeoutError:
+            LOGGER.error(f"Timed out calling {domain}.{service} for entities {entity_ids}, it keeps running")
+            return HomeAssistantServiceResult(success=False, error=entity_ids, timed_out=True)
         except Exception as e:
-            LOGGER.error(f"Error while turning on entities {entity_ids}: {e}")
-            return HomeAssistantServiceResult(success=False, error=[entity_ids])
+            LOGGER.error(f"Error while calling {domain}.{service} for entities {entity_ids}: {e}")
+            return HomeAssistantServiceResult(success=False, error=entity_ids, message=_error_message(e))
+        finally:
+            if not task.done():
+                task.add_done_callback(
+                    lambda task: _log_late_service_call(task, f"{domain}.{service}", entity_ids))
 
     @staticmethod
     async def async_get_thermostat_mode(entity_id: str) -> ThermostatAttributes:
@@ -80,67 +110,44 @@ class HomeAssistantService:
 
     @staticmethod
     async def async_get_calendar_events(entity_ids: list[str], start_date: str, end_date: str) -> HomeAssistantServiceResult:
-        """Get events from a calendar."""
+        """Get events from calendars, through the calendar event cache."""
         hass = HassContextFactory.get_instance()
-
-        service_data = {ATTR_ENTITY_ID: entity_ids}
-        data = {
-            "start_date_time": start_date,
-            "end_date_time": end_date
-        }
-        service_data.update(data)
+        cache = async_get_calendar_cache(hass)
 
         try:
-            events = await hass.services.async_call(
-                "calendar",
-                "get_events",
-                service_data,
-                blocking=True,
-                return_response=True
-            )
-
-            LOGGER.debug(f"Events: {events}")
-
-            return HomeAssistantServiceResult(success=True, data=json.dumps(events))
+            start, end = parse_calendar_time(start_date), parse_calendar_time(end_date)
+            results = await asyncio.gather(
+                *(cache.async_get_events(entity_id, start, end) for entity_id in entity_ids))
+            events = {
+                entity_id: {"events": result}
+                for entity_id, result in zip(entity_ids, results)
+            }
+
+            return HomeAssistantServiceResult(success=True, data=json_dumps_str(events))
         except Exception as e:
             LOGGER.error(f"Error while getting events for calendar {
                 entity_ids}: {e}")
-            return HomeAssistantServiceResult(success=False, error=[entity_ids])
+            return HomeAssistantServiceResult(success=False, error=entity_ids, message=_error_message(e))
 
     @staticmethod
     async def async_get_calendar_availability(entity_id: str, start_date: str, end_date: str) -> HomeAssistantServiceResult:
-        """Get availability from a calendar."""
+        """Get availability from a calendar, through the calendar event cache."""
         hass = HassContextFactory.get_instance()
-
-        service_data = {ATTR_ENTITY_ID: entity_id}
-        data = {
-            "start_date_time": start_date,
-            "end_date_time": end_date
-        }
-        service_data.update(data)
+        cache = async_get_calendar_cache(hass)
 
         try:
-            events = await hass.services.async_call(
-                "calendar",
-                "get_events",
-                service_data,
-                blocking=True,
-                return_response=True
-            )
-
-            LOGGER.debug(f"Events: {events}")
-
-            list_of_events = events.get(entity_id).get("events")
+            list_of_events = await cache.async_get_events(
+                entity_id, parse_calendar_time(start_date), parse_calendar_time(end_date))
 
             available_slots = generate_available_time_slots_from_calendar_events(
                 list_of_events, start_date, end_date)
 
-            return HomeAssistantServiceResult(success=True, data=json.dumps(available_slots))
+            return HomeAssistantServiceResult(success=True, data=json_dumps_str(available_slots))
 
         except Exception as e:
             LOGGER.error(f"Error while getting events for calendar {
                 entity_id}: {e}")
-            return HomeAssistantServiceResult(success=False, error=[entity_id])
+            return HomeAssistantServiceResult(success=False, error=[entity_id], message=_error_message(e))
 
     @staticmethod
     async def async_create_calendar_event(entity_id: str, start_date: str, end_date: str, summary: str) -> HomeAssistantServiceResult:
@@ -164,10 +171,26 @@ class HomeAssistantService:
                 service_data,
                 blocking=True
             )
+            async_get_calendar_cache(hass).async_invalidate(entity_id)
 
             return HomeAssistantServiceResult(success=True)
 
         except Exception as e:
             LOGGER.error(f"Error while creating event for calendar {
                 entity_id}: {e}")
-            return HomeAssistantServiceResult(success=False, error=[entity_id])
+            return HomeAssistantServiceResult(success=False, error=[entity_id], message=_error_message(e))
+
+
+def _error_message(err: Exception) -> str:
+    """Return what went wrong in a service call, as told to the model."""
+    return str(err) or type(err).__name__
+
+
+def _log_late_service_call(task: asyncio.Task, service: str, entity_ids: list[str]) -> None:
+    """Log the outcome of a service call that was no longer waited for."""
+    if task.cancelled():
+        LOGGER.warning(f"Service call {service} for entities {entity_ids} was cancelled")
+    elif (err := task.exception()) is not None:
+        LOGGER.error(f"Service call {service} for entities {entity_ids} failed after timing out: {err}")
+    else:
+        LOGGER.info(f"Service call {service} for entities {entity_ids} finished after timing out")
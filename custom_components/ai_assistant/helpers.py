@@ -1,55 +1,34 @@
 """Helper functions for AI Assistant."""
 
 from datetime import datetime
+import re
 from homeassistant.components.conversation import DOMAIN as CONVERSATION_DOMAIN
 from homeassistant.components.homeassistant.exposed_entities import async_should_expose
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import entity_registry, area_registry
 
-from .const import ASSISTANT_ROLE, NAME_KEY, ROLE_KEY, SYSTEM_ROLE, CONTENT_KEY, TOOL_CALL_ID_KEY, TOOL_CALLS_KEY, TOOL_ROLE, USER_ROLE
+from .entity_index import exposed_entity_record
 
+from .const import DATA_ENTITY_INDEX, DOMAIN, ASSISTANT_ROLE, NAME_KEY, ROLE_KEY, SYSTEM_ROLE, CONTENT_KEY, TOOL_CALL_ID_KEY, TOOL_CALLS_KEY, TOOL_ROLE, USER_ROLE
+
+
+def get_exposed_entities(hass: HomeAssistant) -> dict[str, list[dict]]:
+    """Return exposed entities grouped by area.
+
+    Served from the exposed entity index when it is running, otherwise all
+    states are scanned.
+    """
+    if (index := hass.data.get(DOMAIN, {}).get(DATA_ENTITY_INDEX)) is not None:
+        return index.async_get_exposed_entities()
 
-def get_exposed_entities(hass: HomeAssistant) -> list[dict]:
-    """Return exposed entities grouped by area."""
     hass_entity = entity_registry.async_get(hass)
     hass_area = area_registry.async_get(hass)
     exposed_entities: dict = {"scenes": [], "scripts": [], "automations": [], }
 
     for state in hass.states.async_all():
         if async_should_expose(hass, CONVERSATION_DOMAIN, state.entity_id):
-
-            if state.domain == "scene":
-                exposed_entities["scenes"].append({
-                    "entity_id": state.entity_id,
-                    "name": state.name,
-                })
-            elif state.domain == "script":
-                exposed_entities["scripts"].append({
-                    "entity_id": state.entity_id,
-                    "name": state.name,
-                })
-            elif state.domain == "automation":
-                exposed_entities["automations"].append({
-                    "entity_id": state.entity_id,
-                    "name": state.name,
-                    "state": state.state,
-                })
-            else:
-                entity = hass_entity.async_get(state.entity_id)
-                area = hass_area.async_get_area(
-                    entity.area_id) if entity and entity.area_id else None
-                area_name = area.name if area else "No Area"
-
-                if area_name not in exposed_entities:
-                    exposed_entities[area_name] = []
-
-                exposed_entities[area_name].append({
-                    "entity_id": state.entity_id,
-                    "name": state.name,
-                    "state": state.state,
-                    "attributes": state.attributes,
-                    "aliases": entity.aliases if entity else [],
-                })
+            group, record = exposed_entity_record(hass_entity, hass_area, state)
+            exposed_entities.setdefault(group, []).append(record)
 
     return exposed_entities
 
@@ -88,11 +67,11 @@ def tool_message(tool_call_id: str, tool_name: str, tool_response: str) -> dict:
     }
 
 
-def assistant_tool_call_message(tool_call: dict) -> dict:
+def assistant_tool_call_message(tool_calls: list[dict]) -> dict:
     """Generate an assistant tool call message."""
     return {
         ROLE_KEY: ASSISTANT_ROLE,
-        TOOL_CALLS_KEY: [tool_call],
+        TOOL_CALLS_KEY: tool_calls,
     }
 
 
@@ -141,3 +120,33 @@ def generate_available_time_slots_from_calendar_events(events: list[dict], start
         })
 
     return {"open_slots": available_time_slots}
+
+
+SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+")
+NON_WORD_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_utterance(utterance: str) -> str:
+    """Return an utterance in lower case, without punctuation and extra whitespace."""
+    return " ".join(NON_WORD_RE.sub("", utterance.lower()).split())
+
+
+class SentenceSplitter:
+    """Split streamed text into complete sentences."""
+
+    def __init__(self):
+        """Initialize the splitter."""
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        """Add streamed text and return the sentences it completes."""
+        self._buffer += text
+        parts = SENTENCE_BOUNDARY_RE.split(self._buffer)
+        self._buffer = parts.pop()
+        return [part.strip() for part in parts if part.strip()]
+
+    def flush(self) -> list[str]:
+        """Return whatever text is left over once the stream has finished."""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return [remainder] if remainder else []
@@ -0,0 +1,393 @@
+"""This module provides a bounded store for conversation histories and keeps them across restarts."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import time
+
+from homeassistant.const import EVENT_HOMEASSISTANT_FINAL_WRITE
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, LOGGER, ROLE_KEY, SYSTEM_ROLE, TOOL_ROLE
+from .serialization import json_dumps
+
+HISTORY_STORAGE_VERSION = 1
+
+# Seconds changed conversations are collected for before they are written together
+HISTORY_SAVE_DELAY = 10
+
+
+class ConversationHistoryStats:
+    """Counters describing the conversation history store."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.lru_evictions = 0
+        self.ttl_evictions = 0
+        self.budget_evictions = 0
+        self.trimmed_messages = 0
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        return {
+            "lru_evictions": self.lru_evictions,
+            "ttl_evictions": self.ttl_evictions,
+            "budget_evictions": self.budget_evictions,
+            "trimmed_messages": self.trimmed_messages,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class ConversationHistoryEntry:
+    """A conversation held in the history store."""
+
+    def __init__(self, messages: list[dict], size: int, last_used: float):
+        """Initialize the entry."""
+        self.messages = messages
+        self.size = size
+        self.last_used = last_used
+
+
+class ConversationHistoryStore:
+    """LRU store of conversation histories with an idle TTL and size limits.
+
+    Conversations are kept in least recently used order. Conversations idle for
+    longer than the TTL are dropped, each conversation is capped to a number of
+    messages, and the least recently used conversations are evicted whenever the
+    number of conversations or the estimated resident size goes over its limit.
+    """
+
+    def __init__(self, max_conversations: int, idle_ttl: float, max_messages: int, max_bytes: int) -> None:
+        """Initialize the store.
+
+        Args:
+            max_conversations: The maximum number of conversations to keep.
+            idle_ttl: The number of seconds after which an unused conversation is dropped.
+            max_messages: The maximum number of non-system messages kept per conversation.
+            max_bytes: The estimated number of bytes all conversations may use together.
+
+        """
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.stats = ConversationHistoryStats()
+        self._entries: OrderedDict[str, ConversationHistoryEntry] = OrderedDict()
+        self._resident_bytes = 0
+
+    def __contains__(self, conversation_id: str) -> bool:
+        """Return whether a live conversation is stored under the ID."""
+        self._prune_expired(time.monotonic())
+        return conversation_id in self._entries
+
+    def __len__(self) -> int:
+        """Return the number of stored conversations."""
+        return len(self._entries)
+
+    @property
+    def resident_bytes(self) -> int:
+        """Return the estimated size of all stored conversations."""
+        return self._resident_bytes
+
+    def get(self, conversation_id: str | None) -> list[dict] | None:
+        """Return the messages of a conversation and mark it as recently used."""
+        now = time.monotonic()
+        self._prune_expired(now)
+
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        entry.last_used = now
+        self._entries.move_to_end(conversation_id)
+        return entry.messages
+
+    def set(self, conversation_id: str, messages: list[dict]) -> list[dict]:
+        """Store the messages of a conversation, trimming and evicting as needed, and return the stored messages."""
+        now = time.monotonic()
+        self._prune_expired(now)
+
+        messages = self._trim(messages)
+        size = _estimate_size(messages)
+
+        if (previous := self._entries.pop(conversation_id, None)) is not None:
+            self._resident_bytes -= previous.size
+
+        self._entries[conversation_id] = ConversationHistoryEntry(
+            messages, size, now)
+        self._resident_bytes += size
+
+        while len(self._entries) > self.max_conversations:
+            self._evict_oldest()
+            self.stats.lru_evictions += 1
+
+        while self._resident_bytes > self.max_bytes and len(self._entries) > 1:
+            self._evict_oldest()
+            self.stats.budget_evictions += 1
+
+        return messages
+
+    def remove(self, conversation_id: str) -> None:
+        """Remove a conversation."""
+        if (entry := self._entries.pop(conversation_id, None)) is not None:
+            self._resident_bytes -= entry.size
+
+    def as_dict(self) -> dict:
+        """Return the state of the store for diagnostics."""
+        return {
+            "conversations": len(self._entries),
+            "resident_bytes": self._resident_bytes,
+            "max_conversations": self.max_conversations,
+            "max_bytes": self.max_bytes,
+            "idle_ttl": self.idle_ttl,
+            "max_messages": self.max_messages,
+            **self.stats.as_dict(),
+        }
+
+    def _trim(self, messages: list[dict]) -> list[dict]:
+        """Cap a conversation to the most recent messages, keeping the system prompt."""
+        system_messages = []
+        while len(system_messages) < len(messages) and messages[len(system_messages)].get(ROLE_KEY) == SYSTEM_ROLE:
+            system_messages.append(messages[len(system_messages)])
+
+        other_messages = messages[len(system_messages):]
+        if len(other_messages) <= self.max_messages:
+            return messages
+
+        kept = other_messages[-self.max_messages:]
+        # Never start the kept history with tool results whose calls were dropped
+        while kept and kept[0].get(ROLE_KEY) == TOOL_ROLE:
+            kept = kept[1:]
+
+        self.stats.trimmed_messages += len(other_messages) - len(kept)
+        return system_messages + kept
+
+    def _prune_expired(self, now: float) -> None:
+        """Drop conversations that have been idle for longer than the TTL."""
+        while self._entries:
+            conversation_id, entry = next(iter(self._entries.items()))
+            if now - entry.last_used < self.idle_ttl:
+                break
+            LOGGER.debug("Dropping idle conversation %s", conversation_id)
+            self._evict_oldest()
+            self.stats.ttl_evictions += 1
+
+    def _evict_oldest(self) -> None:
+        """Evict the least recently used conversation."""
+        _conversation_id, entry = self._entries.popitem(last=False)
+        self._resident_bytes -= entry.size
+
+
+class ConversationHistoryStorageStats:
+    """Counters describing the conversation history storage."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.loads = 0
+        self.load_misses = 0
+        self.writes = 0
+        self.flushes = 0
+        self.removals = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        return {
+            "loads": self.loads,
+            "load_misses": self.load_misses,
+            "writes": self.writes,
+            "flushes": self.flushes,
+            "removals": self.removals,
+        }
+
+
+class ConversationHistoryStorage:
+    """Keeps conversation histories on disk so they survive a restart.
+
+    Every conversation is written to its own store, next to an index store
+    holding when each conversation was last used. Only the index is loaded at
+    startup, the messages of a conversation are loaded the first time it is
+    continued, so startup doesn't get slower as conversations pile up. Changed
+    conversations are collected and written together after a short delay, or
+    when Home Assistant shuts down, instead of once per turn.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, max_conversations: int, idle_ttl: float) -> None:
+        """Initialize the storage.
+
+        Args:
+            hass: The Home Assistant instance.
+            entry_id: The ID of the config entry the conversations belong to.
+            max_conversations: The maximum number of conversations to keep.
+            idle_ttl: The number of seconds after which an unused conversation is dropped.
+
+        """
+        self.hass = hass
+        self.entry_id = entry_id
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+        self.stats = ConversationHistoryStorageStats()
+        self._index_store: Store[dict[str, float]] = Store(
+            hass, HISTORY_STORAGE_VERSION, _index_key(entry_id), private=True)
+        # Conversation ID to the time it was last used, in seconds since the epoch
+        self._index: dict[str, float] = {}
+        self._index_changed = False
+        # Conversation ID to the messages to write, or None to remove the conversation
+        self._pending: dict[str, list[dict] | None] = {}
+        self._unsub_flush: CALLBACK_TYPE | None = None
+        self._unsub_final_write: CALLBACK_TYPE | None = None
+        # Held while writing, so stopping waits for a scheduled flush that is still writing
+        self._flush_lock = asyncio.Lock()
+
+    def __contains__(self, conversation_id: str | None) -> bool:
+        """Return whether a conversation that isn't expired is stored under the ID."""
+        last_used = self._index.get(conversation_id)
+        return last_used is not None and time.time() - last_used < self.idle_ttl
+
+    def __len__(self) -> int:
+        """Return the number of stored conversations."""
+        return len(self._index)
+
+    async def async_load(self) -> None:
+        """Load the index and drop the conversations that expired while Home Assistant was stopped."""
+        self._index = await self._index_store.async_load() or {}
+        now = time.time()
+        for conversation_id, last_used in list(self._index.items()):
+            if now - last_used >= self.idle_ttl:
+                self.async_remove(conversation_id)
+        self._unsub_final_write = self.hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_FINAL_WRITE, self._async_final_write)
+
+    async def async_get(self, conversation_id: str | None) -> list[dict] | None:
+        """Load the messages of a stored conversation."""
+        if conversation_id not in self:
+            return None
+
+        if conversation_id in self._pending:
+            messages = self._pending[conversation_id]
+        else:
+            record = await _conversation_store(self.hass, self.entry_id, conversation_id).async_load()
+            messages = record["messages"] if record is not None else None
+
+        if messages is None:
+            self.stats.load_misses += 1
+            self.async_remove(conversation_id)
+            return None
+
+        self.stats.loads += 1
+        return list(messages)
+
+    @callback
+    def async_save(self, conversation_id: str, messages: list[dict]) -> None:
+        """Write the messages of a conversation with the next batch."""
+        self._index.pop(conversation_id, None)
+        self._index[conversation_id] = time.time()
+        # Copy the list, as the messages of the next turn are appended to it
+        self._pending[conversation_id] = list(messages)
+        self._index_changed = True
+
+        while len(self._index) > self.max_conversations:
+            self.async_remove(next(iter(self._index)))
+
+        self._schedule_flush()
+
+    @callback
+    def async_remove(self, conversation_id: str) -> None:
+        """Remove a conversation with the next batch."""
+        if self._index.pop(conversation_id, None) is None:
+            return
+        self._pending[conversation_id] = None
+        self._index_changed = True
+        self.stats.removals += 1
+        self._schedule_flush()
+
+    async def async_flush(self) -> None:
+        """Write the changed conversations and the index now, after any flush in progress."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            for conversation_id, messages in pending.items():
+                store = _conversation_store(self.hass, self.entry_id, conversation_id)
+                if messages is None:
+                    await store.async_remove()
+                else:
+                    await store.async_save({"messages": messages})
+                    self.stats.writes += 1
+
+            if self._index_changed:
+                self._index_changed = False
+                await self._index_store.async_save(dict(self._index))
+
+            if pending:
+                self.stats.flushes += 1
+
+    async def async_stop(self) -> None:
+        """Write what is pending and stop listening for the shutdown."""
+        if self._unsub_final_write is not None:
+            self._unsub_final_write()
+            self._unsub_final_write = None
+        await self.async_flush()
+
+    def as_dict(self) -> dict:
+        """Return the state of the storage for diagnostics."""
+        return {
+            "conversations": len(self._index),
+            "pending": len(self._pending),
+            **self.stats.as_dict(),
+        }
+
+    @callback
+    def _schedule_flush(self) -> None:
+        """Flush after the save delay, unless a flush is already scheduled."""
+        if self._unsub_flush is None:
+            self._unsub_flush = async_call_later(
+                self.hass, HISTORY_SAVE_DELAY, self._async_scheduled_flush)
+
+    async def _async_scheduled_flush(self, _now) -> None:
+        """Flush once the save delay has passed."""
+        self._unsub_flush = None
+        await self.async_flush()
+
+    async def _async_final_write(self, _event: Event) -> None:
+        """Flush before Home Assistant stops."""
+        self._unsub_final_write = None
+        await self.async_flush()
+
+
+async def async_remove_conversation_history_storage(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the stored conversations of a config entry."""
+    index_store: Store[dict[str, float]] = Store(
+        hass, HISTORY_STORAGE_VERSION, _index_key(entry_id), private=True)
+    for conversation_id in await index_store.async_load() or {}:
+        await _conversation_store(hass, entry_id, conversation_id).async_remove()
+    await index_store.async_remove()
+
+
+def _index_key(entry_id: str) -> str:
+    """Return the storage key of the conversation index of a config entry."""
+    return f"{DOMAIN}.{entry_id}.history"
+
+
+def _conversation_store(hass: HomeAssistant, entry_id: str, conversation_id: str) -> Store[dict]:
+    """Return the store of a conversation.
+
+    Only IDs generated by the agent are stored, so they are safe to use in a file name.
+    The stores hold what users said, so they are private and marked as such in backups.
+    """
+    return Store(
+        hass, HISTORY_STORAGE_VERSION, f"{_index_key(entry_id)}.{conversation_id}", private=True)
+
+
+def _estimate_size(messages: list[dict]) -> int:
+    """Estimate the resident size of a list of messages in bytes."""
+    return len(json_dumps(messages, default=str))
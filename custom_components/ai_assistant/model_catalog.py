@@ -0,0 +1,89 @@
+"""This module caches the models served by the vLLM servers of a config entry."""
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+import time
+
+from .coalescing import SingleFlight
+from .response import VllmModelsApiResponse
+
+# Seconds a fetched model list is used for before it is fetched again
+MODEL_CATALOG_TTL = 600
+
+
+class ModelCatalogStats:
+    """Counters describing the model catalog."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.hits = 0
+        self.fetches = 0
+        self.refreshes = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        return {
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "refreshes": self.refreshes,
+        }
+
+
+class ModelCatalog:
+    """The model list of the servers, shared by the heartbeat and the config flow.
+
+    The list is fetched at most once per TTL. It is refreshed for free whenever
+    a heartbeat probe lists the models anyway, and callers asking while a fetch
+    is in flight wait for that fetch instead of sending their own.
+    """
+
+    def __init__(self, ttl: float = MODEL_CATALOG_TTL) -> None:
+        """Initialize the catalog."""
+        self.ttl = ttl
+        self.stats = ModelCatalogStats()
+        self._response: VllmModelsApiResponse | None = None
+        self._fetched_at = 0.0
+        self._flight: SingleFlight[VllmModelsApiResponse] = SingleFlight()
+
+    @property
+    def age(self) -> float | None:
+        """Return the seconds since the model list was fetched, None if it never was."""
+        if self._response is None:
+            return None
+        return time.monotonic() - self._fetched_at
+
+    async def async_get(self, fetch: Callable[[], Awaitable[VllmModelsApiResponse]]) -> VllmModelsApiResponse:
+        """Return the cached model list, fetching it when it is missing or stale."""
+        if (age := self.age) is not None and age < self.ttl:
+            self.stats.hits += 1
+            return self._response
+
+        async def async_fetch() -> VllmModelsApiResponse:
+            response = await fetch()
+            self.stats.fetches += 1
+            self.set(response)
+            return response
+
+        return await self._flight.async_do(None, async_fetch)
+
+    def set(self, response: VllmModelsApiResponse) -> None:
+        """Store a model list fetched elsewhere, such as by a heartbeat probe."""
+        if response.models:
+            self._response = response
+            self._fetched_at = time.monotonic()
+            self.stats.refreshes += 1
+
+    def invalidate(self) -> None:
+        """Forget the model list, so the next caller fetches it again."""
+        self._response = None
+
+    def as_dict(self) -> dict:
+        """Return the state of the catalog for diagnostics."""
+        age = self.age
+        return {
+            "models": [model.model_id for model in self._response.models] if self._response is not None else [],
+            "age_s": round(age, 1) if age is not None else None,
+            "ttl_s": self.ttl,
+            **self.stats.as_dict(),
+        }
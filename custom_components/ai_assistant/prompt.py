@@ -0,0 +1,109 @@
+"""This module provides a cache of compiled prompt templates."""
+
+from __future__ import annotations
+
+import re
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import template
+
+from .const import DATA_PROMPT_TEMPLATES, DOMAIN, LOGGER
+
+# Template expressions that render something changing from one request to the
+# next: entity states and attributes, and the current time
+_LIVE_STATE_PATTERN = re.compile(
+    r"\.state\b|\bstates\s*[(.\[]|\b(?:is_state|state_attr|is_state_attr|now)\s*\(")
+
+
+class PromptRenderStats:
+    """Timing of the renders of a prompt template."""
+
+    def __init__(self):
+        """Initialize the stats."""
+        self.compiles = 0
+        self.renders = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = 0.0
+
+    def add_render(self, duration: float) -> None:
+        """Record the duration of a render in seconds."""
+        self.renders += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.last_time = duration
+
+    def as_dict(self) -> dict:
+        """Return the stats as a dictionary, with times in milliseconds."""
+        return {
+            "compiles": self.compiles,
+            "renders": self.renders,
+            "average_ms": self.total_time / self.renders * 1000 if self.renders else 0.0,
+            "max_ms": self.max_time * 1000,
+            "last_ms": self.last_time * 1000,
+        }
+
+
+class PromptTemplateCache:
+    """Compiled prompt templates of a config entry.
+
+    Each template is parsed and compiled once and reused for every render until
+    its source changes, for example when the system prompt is edited in the
+    options flow.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache."""
+        self.hass = hass
+        self._templates: dict[str, tuple[str, template.Template]] = {}
+        self.stats: dict[str, PromptRenderStats] = {}
+
+    @callback
+    def async_render(self, name: str, raw_template: str, variables: dict[str, Any]) -> str:
+        """Render the template stored under name, compiling it first if its source changed."""
+        stats = self.stats.setdefault(name, PromptRenderStats())
+
+        cached = self._templates.get(name)
+        if cached is None or cached[0] != raw_template:
+            compiled = template.Template(raw_template, self.hass)
+            compiled.ensure_valid()
+            self._templates[name] = cached = (raw_template, compiled)
+            stats.compiles += 1
+
+        started = time.perf_counter()
+        rendered = cached[1].async_render(variables, parse_result=False)
+        stats.add_render(time.perf_counter() - started)
+
+        LOGGER.debug("Rendered %s prompt in %.2f ms",
+                     name, stats.last_time * 1000)
+        return rendered
+
+    def as_dict(self) -> dict:
+        """Return the render stats for diagnostics."""
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+
+def renders_live_state(raw_template: str) -> bool:
+    """Return whether a prompt template renders entity states or the current time."""
+    return _LIVE_STATE_PATTERN.search(raw_template) is not None
+
+
+@callback
+def async_get_prompt_template_cache(hass: HomeAssistant, entry_id: str) -> PromptTemplateCache:
+    """Return the prompt template cache of a config entry.
+
+    The cache outlives reloads of the entry, so changing unrelated options
+    doesn't throw the compiled templates away.
+    """
+    caches = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_PROMPT_TEMPLATES, {})
+    if (cache := caches.get(entry_id)) is None:
+        cache = caches[entry_id] = PromptTemplateCache(hass)
+    return cache
+
+
+@callback
+def async_remove_prompt_template_cache(hass: HomeAssistant, entry_id: str) -> None:
+    """Drop the prompt template cache of a config entry."""
+    hass.data.get(DOMAIN, {}).get(DATA_PROMPT_TEMPLATES, {}).pop(entry_id, None)
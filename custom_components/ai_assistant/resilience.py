@@ -0,0 +1,161 @@
+"""This module provides retries, request hedging and a circuit breaker for the vLLM API."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterator
+import random
+import time
+
+from .const import LOGGER
+from .exceptions import ApiCircuitOpenError
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# Number of recent request latencies the hedging delay is computed from
+LATENCY_WINDOW = 100
+
+# Number of latencies needed before requests are hedged
+MIN_HEDGE_SAMPLES = 20
+
+
+class ResilienceStats:
+    """Counters describing retried and hedged requests and heartbeats."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.retries = 0
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+        self.heartbeat_probes = 0
+        self.passive_heartbeats = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        return {
+            "retries": self.retries,
+            "hedged_requests": self.hedged_requests,
+            "hedge_wins": self.hedge_wins,
+            "heartbeat_probes": self.heartbeat_probes,
+            "passive_heartbeats": self.passive_heartbeats,
+        }
+
+
+class RetryPolicy:
+    """Number of attempts of a request and the jittered delays between them."""
+
+    def __init__(self, retries: int, base_delay: float, max_delay: float) -> None:
+        """Initialize the policy.
+
+        Args:
+            retries: The number of attempts after the first one.
+            base_delay: The delay before the first retry in seconds.
+            max_delay: The upper bound of the delay in seconds.
+
+        """
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delays(self) -> Iterator[float]:
+        """Yield the delay before each retry.
+
+        The delays grow exponentially and are drawn uniformly below that bound,
+        so clients failing at the same time don't retry in lockstep.
+        """
+        for attempt in range(self.retries):
+            yield random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class LatencyTracker:
+    """Recent request latencies, used to decide when to hedge a request."""
+
+    def __init__(self, percentile: float) -> None:
+        """Initialize the tracker."""
+        self.percentile = percentile
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, duration: float) -> None:
+        """Record the duration of a request in seconds."""
+        self._latencies.append(duration)
+
+    def hedge_delay(self) -> float | None:
+        """Return how long to wait for a request before hedging it.
+
+        Returns None as long as too few requests were seen to tell.
+        """
+        if len(self._latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return latencies[index]
+
+
+class CircuitBreaker:
+    """Fails requests fast while the backend is down.
+
+    The circuit opens after a number of consecutive failures. While it is open
+    requests are rejected right away, until the reset timeout has passed. Then a
+    single request is let through, which closes the circuit when it succeeds or
+    opens it again when it fails.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        """Initialize the breaker.
+
+        Args:
+            failure_threshold: The number of consecutive failures opening the circuit.
+            reset_timeout: The number of seconds the circuit stays open.
+
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.trips = 0
+
+    def before_request(self) -> None:
+        """Raise ApiCircuitOpenError when a request must not be sent."""
+        if self.state == CIRCUIT_CLOSED:
+            return
+
+        # Also let another request through when the previous one never finished
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            LOGGER.debug("Letting a request through the open circuit")
+            self.state = CIRCUIT_HALF_OPEN
+            self.opened_at = time.monotonic()
+            return
+
+        self.rejected += 1
+        raise ApiCircuitOpenError("the server is unavailable")
+
+    def record_success(self) -> None:
+        """Record a successful request."""
+        if self.state != CIRCUIT_CLOSED:
+            LOGGER.info("The vLLM server is reachable again")
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        """Record a failed request."""
+        self.failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or (
+                self.state == CIRCUIT_CLOSED and self.failures >= self.failure_threshold):
+            LOGGER.warning(
+                "The vLLM server is unreachable, failing requests for %s seconds", self.reset_timeout)
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+            self.trips += 1
+
+    def as_dict(self) -> dict:
+        """Return the state of the breaker for diagnostics."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
@@ -17,18 +17,30 @@ class VllmModel:
 class VllmChatApiResponse:
     """Represents a response from the VLLM API."""
 
-    def __init__(self, message: str, tool_call_id: str, tool_calls: list[dict]) -> None:
+    def __init__(self, message: str, tool_call_id: str, tool_calls: list[dict], usage: dict | None = None) -> None:
         """Initialize the VllmApiResponse object.
 
         Args:
             message (str): The response message.
             tool_call_id (str): The tool call ID.
             tool_calls (list[dict]): The list of tool calls.
+            usage (dict | None): The token counts of the request, if reported.
 
         """
         self.message = message
         self.tool_call_id = tool_call_id
         self.tool_calls = tool_calls
+        self.usage = usage
+
+    @property
+    def prompt_tokens(self) -> int | None:
+        """Return the number of prompt tokens, if reported.
+
+        Returns:
+            int | None: The number of prompt tokens.
+
+        """
+        return (self.usage or {}).get("prompt_tokens")
 
     def __str__(self) -> str:
         """Return the string representation of the object.
@@ -40,6 +52,104 @@ class VllmChatApiResponse:
         return f"VllmChatApiResponse(message={self.message}, tool_call_id={self.tool_call_id}, tool_calls={self.tool_calls})"
 
 
+class VllmChatStreamDelta:
+    """Represents a single chunk of a streamed response from the VLLM API."""
+
+    def __init__(self, content: str | None, tool_calls: list[dict] | None, finish_reason: str | None, usage: dict | None = None) -> None:
+        """Initialize the VllmChatStreamDelta object.
+
+        Args:
+            content (str | None): The content fragment carried by the chunk.
+            tool_calls (list[dict] | None): The tool call fragments carried by the chunk.
+            finish_reason (str | None): The reason the stream finished, if this is the last chunk.
+            usage (dict | None): The token counts of the request, carried by the last chunk if requested.
+
+        """
+        self.content = content
+        self.tool_calls = tool_calls
+        self.finish_reason = finish_reason
+        self.usage = usage
+
+    def __str__(self) -> str:
+        """Return the string representation of the object.
+
+        Returns:
+            str: The string representation of the object.
+
+        """
+        return f"VllmChatStreamDelta(content={self.content}, tool_calls={self.tool_calls}, finish_reason={self.finish_reason})"
+
+
+class VllmChatStreamAccumulator:
+    """Assembles streamed chunks into a complete chat response."""
+
+    def __init__(self) -> None:
+        """Initialize the VllmChatStreamAccumulator object."""
+        self._content: list[str] = []
+        self._tool_calls: dict[int, dict] = {}
+        self.finish_reason: str | None = None
+        self.usage: dict | None = None
+
+    def add(self, delta: VllmChatStreamDelta) -> None:
+        """Add a streamed chunk to the response.
+
+        Tool calls are streamed as fragments sharing an index. The first fragment
+        carries the ID and function name, the following ones carry pieces of the
+        JSON encoded arguments which are concatenated in order.
+
+        Args:
+            delta (VllmChatStreamDelta): The chunk to add.
+
+        """
+        if delta.content:
+            self._content.append(delta.content)
+
+        for fragment in delta.tool_calls or []:
+            index = fragment.get("index", len(self._tool_calls))
+            tool_call = self._tool_calls.setdefault(index, {
+                "id": "",
+                "type": "function",
+                "function": {"name": "", "arguments": ""},
+            })
+
+            if fragment.get("id"):
+                tool_call["id"] = fragment["id"]
+            if fragment.get("type"):
+                tool_call["type"] = fragment["type"]
+
+            function = fragment.get("function") or {}
+            if function.get("name"):
+                tool_call["function"]["name"] += function["name"]
+            if function.get("arguments"):
+                tool_call["function"]["arguments"] += function["arguments"]
+
+        if delta.finish_reason is not None:
+            self.finish_reason = delta.finish_reason
+        if delta.usage is not None:
+            self.usage = delta.usage
+
+    @property
+    def content(self) -> str:
+        """Return the content received so far."""
+        return "".join(self._content)
+
+    def response(self) -> VllmChatApiResponse:
+        """Return the assembled chat response.
+
+        Returns:
+            VllmChatApiResponse: The response assembled from all chunks received so far.
+
+        """
+        tool_calls = [self._tool_calls[index]
+                      for index in sorted(self._tool_calls)]
+        return VllmChatApiResponse(
+            message=self.content if self._content else None,
+            tool_call_id=None,
+            tool_calls=tool_calls if tool_calls else None,
+            usage=self.usage,
+        )
+
+
 class VllmModelsApiResponse:
     """Represents a response from the VLLM API."""
 
@@ -66,14 +176,14 @@ class VllmApiResponseDecoder:
     """Decode a VLLM API response."""
 
     @staticmethod
-    def decode(response: dict) -> VllmChatApiResponse | VllmModelsApiResponse:
+    def decode(response: dict) -> VllmChatApiResponse | VllmChatStreamDelta | VllmModelsApiResponse:
         """Decode a VLLM API response.
 
         Args:
             response (dict): The API response to decode.
 
         Returns:
-            VllmChatApiResponse | VllmModelsApiResponse: The decoded API response.
+            VllmChatApiResponse | VllmChatStreamDelta | VllmModelsApiResponse: The decoded API response.
 
         """
         if VllmApiResponseDecoder._contains_model_object(response):
@@ -86,6 +196,16 @@ class VllmApiResponseDecoder:
                 message=response["choices"][0]["message"]["content"],
                 tool_call_id=response["choices"][0]["message"]["tool_call_id"],
                 tool_calls=response["choices"][0]["message"]["tool_calls"],
+                usage=response.get("usage"),
+            )
+        elif VllmApiResponseDecoder._contains_chat_completion_chunk_object(response):
+            choices = response.get("choices") or [{}]
+            delta = choices[0].get("delta") or {}
+            return VllmChatStreamDelta(
+                content=delta.get("content"),
+                tool_calls=delta.get("tool_calls"),
+                finish_reason=choices[0].get("finish_reason"),
+                usage=response.get("usage"),
             )
         else:
             raise ValueError("Unknown response object: %s", response)
@@ -124,3 +244,19 @@ class VllmApiResponseDecoder:
             if response.get("object") == "chat.completion":
                 return True
         return False
+
+    @staticmethod
+    def _contains_chat_completion_chunk_object(response: dict) -> bool:
+        """Check if the response contains a streamed chat completion chunk.
+
+        Args:
+            response (dict): The API response to check.
+
+        Returns:
+            bool: True if the response contains a chat completion chunk, False otherwise.
+
+        """
+        if isinstance(response, dict):
+            if response.get("object") == "chat.completion.chunk":
+                return True
+        return False
@@ -0,0 +1,229 @@
+"""This module caches the answers to repeated read-only questions."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Iterable
+import time
+
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import LOGGER
+from .helpers import normalize_utterance
+
+# Tools that only read state, a turn calling any other tool is never cached
+READ_ONLY_TOOLS = frozenset({
+    "hass_get_agenda",
+    "hass_get_availability",
+    "hass_get_current_user",
+})
+
+# Maximum number of cached answers
+MAX_CACHED_RESPONSES = 256
+
+
+class ResponseCacheStats:
+    """Counters describing the response cache."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.uncacheable = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "uncacheable": self.uncacheable,
+            "invalidations": self.invalidations,
+            "expirations": self.expirations,
+        }
+
+
+class ResponseCacheEntry:
+    """A cached answer and the entity states it was based on."""
+
+    def __init__(self, answer: str, fingerprint: tuple[tuple[str, str | None], ...], expires_at: float):
+        """Initialize the entry."""
+        self.answer = answer
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+
+    @property
+    def entity_ids(self) -> list[str]:
+        """Return the IDs of the entities the answer depends on."""
+        return [entity_id for entity_id, _last_updated in self.fingerprint]
+
+
+class ResponseCache:
+    """Answers to read-only questions that started a conversation.
+
+    Answers are keyed on the normalized question, its language and the current
+    date, and are stored along with a fingerprint of the entities they depend on:
+    the entities passed to the tools that were called and the exposed entities
+    named in the question. An answer is dropped as soon as one of those entities
+    changes state, and is only served while the fingerprint still matches and
+    its TTL hasn't passed. Turns that called a state-changing tool, or whose
+    answer can't be tied to any entity, are never cached.
+    """
+
+    def __init__(self, hass: HomeAssistant, ttl: float) -> None:
+        """Initialize the cache.
+
+        Args:
+            hass: The Home Assistant instance.
+            ttl: The number of seconds an answer is served for at most.
+
+        """
+        self.hass = hass
+        self.ttl = ttl
+        self.stats = ResponseCacheStats()
+        self._entries: OrderedDict[tuple[str, str, str], ResponseCacheEntry] = OrderedDict()
+        self._keys_by_entity: dict[str, set[tuple[str, str, str]]] = {}
+        self._unsubscribe: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Start invalidating answers on state changes."""
+        self._unsubscribe = self.hass.bus.async_listen(
+            EVENT_STATE_CHANGED, self._async_state_changed)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening for state changes and drop all answers."""
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        self._entries.clear()
+        self._keys_by_entity.clear()
+
+    @callback
+    def async_get(self, utterance: str, language: str) -> str | None:
+        """Return the cached answer to a question, if there is a valid one."""
+        key = self._key(utterance, language)
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.stats.expirations += 1
+            entry = None
+
+        if entry is None or entry.fingerprint != self._fingerprint(entry.entity_ids):
+            if entry is not None:
+                self._remove(key)
+                self.stats.invalidations += 1
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        self._entries.move_to_end(key)
+        LOGGER.debug("Answering '%s' from the response cache", utterance)
+        return entry.answer
+
+    @callback
+    def async_store(self, utterance: str, language: str, answer: str, tool_calls: Iterable[tuple[str, list[str]]], exposed_entities: Iterable[dict]) -> bool:
+        """Cache the answer to a question, if it is cacheable.
+
+        Args:
+            utterance: The question.
+            language: The language of the question.
+            answer: The answer.
+            tool_calls: The name and the entity IDs of every tool called to answer.
+            exposed_entities: The records of the exposed entities.
+
+        Returns:
+            bool: Whether the answer was cached.
+
+        """
+        entity_ids: set[str] = set()
+        for tool_name, tool_entity_ids in tool_calls:
+            if tool_name not in READ_ONLY_TOOLS:
+                self.stats.uncacheable += 1
+                return False
+            entity_ids.update(tool_entity_ids)
+
+        entity_ids.update(_named_entity_ids(normalize_utterance(utterance), exposed_entities))
+        if not entity_ids:
+            self.stats.uncacheable += 1
+            return False
+
+        key = self._key(utterance, language)
+        self._remove(key)
+        self._entries[key] = ResponseCacheEntry(
+            answer, self._fingerprint(sorted(entity_ids)), time.monotonic() + self.ttl)
+        for entity_id in entity_ids:
+            self._keys_by_entity.setdefault(entity_id, set()).add(key)
+        self.stats.stores += 1
+
+        while len(self._entries) > MAX_CACHED_RESPONSES:
+            self._remove(next(iter(self._entries)))
+        return True
+
+    def as_dict(self) -> dict:
+        """Return the state of the cache for diagnostics."""
+        return {
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+            **self.stats.as_dict(),
+        }
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Drop the answers depending on an entity that changed state."""
+        keys = self._keys_by_entity.get(event.data["entity_id"])
+        if not keys:
+            return
+
+        for key in list(keys):
+            self._remove(key)
+            self.stats.invalidations += 1
+
+    def _remove(self, key: tuple[str, str, str]) -> None:
+        """Remove an answer and its entity references."""
+        if (entry := self._entries.pop(key, None)) is None:
+            return
+
+        for entity_id in entry.entity_ids:
+            keys = self._keys_by_entity.get(entity_id)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_entity[entity_id]
+
+    def _fingerprint(self, entity_ids: Iterable[str]) -> tuple[tuple[str, str | None], ...]:
+        """Return the last update time of each entity."""
+        fingerprint = []
+        for entity_id in entity_ids:
+            state = self.hass.states.get(entity_id)
+            fingerprint.append(
+                (entity_id, state.last_updated.isoformat() if state else None))
+        return tuple(fingerprint)
+
+    @staticmethod
+    def _key(utterance: str, language: str) -> tuple[str, str, str]:
+        """Return the cache key of a question, which includes the date for questions like "today"."""
+        return normalize_utterance(utterance), language, dt_util.now().date().isoformat()
+
+
+def _named_entity_ids(normalized_utterance: str, exposed_entities: Iterable[dict]) -> set[str]:
+    """Return the IDs of the exposed entities whose name or an alias appears in an utterance."""
+    padded = f" {normalized_utterance} "
+    entity_ids = set()
+    for record in exposed_entities:
+        names = [record.get("name") or "", *(record.get("aliases") or [])]
+        if any(
+            (name := normalize_utterance(str(raw_name))) and f" {name} " in padded
+            for raw_name in names
+        ):
+            entity_ids.add(record["entity_id"])
+    return entity_ids
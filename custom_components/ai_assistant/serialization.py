@@ -0,0 +1,44 @@
+"""This module provides the JSON serializer used for API requests and responses.
+
+orjson is used when it is installed, as it is with Home Assistant, and the
+standard library json module otherwise. Both encode to compact UTF-8 bytes and
+decode from bytes or strings.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def json_dumps(value: Any, default: Callable[[Any], Any] | None = None) -> bytes:
+    """Encode a value as compact JSON bytes.
+
+    Args:
+        value: The value to encode.
+        default: Called for values that can't be encoded natively.
+
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def json_dumps_str(value: Any, default: Callable[[Any], Any] | None = None) -> str:
+    """Encode a value as a compact JSON string."""
+    return json_dumps(value, default).decode("utf-8")
+
+
+def json_loads(data: bytes | bytearray | str) -> Any:
+    """Decode JSON from bytes or a string."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,75 @@
+"""This module provides the precomputed JSON schemas of the tools."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from types import MappingProxyType
+
+from .json_schema import get_json_schema
+from .serialization import json_dumps
+
+
+class ToolSchemaBundle:
+    """Frozen JSON schemas of a list of tools, along with their JSON encoding.
+
+    The schemas are generated once, and encoded once, so requests can splice the
+    encoded tools into their body instead of serializing the schemas every time.
+    """
+
+    __slots__ = ("schemas", "by_name", "encoded", "_encoded_by_name", "_subsets")
+
+    def __init__(self, schemas: Iterable[dict]) -> None:
+        """Initialize the bundle."""
+        self.schemas: tuple[dict, ...] = tuple(schemas)
+        self.by_name: MappingProxyType[str, dict] = MappingProxyType(
+            {schema["function"]["name"]: schema for schema in self.schemas})
+        self._encoded_by_name: dict[str, bytes] = {
+            name: encode_json(schema) for name, schema in self.by_name.items()}
+        self.encoded: bytes = _join_encoded(self._encoded_by_name.values())
+        self._subsets: dict[tuple[str, ...], bytes] = {}
+
+    def encode_subset(self, names: Iterable[str]) -> bytes:
+        """Return the encoded JSON array of the named tools, in bundle order."""
+        names = set(names)
+        key = tuple(name for name in self.by_name if name in names)
+        if (encoded := self._subsets.get(key)) is None:
+            encoded = self._subsets[key] = _join_encoded(
+                self._encoded_by_name[name] for name in key)
+        return encoded
+
+    def encoded_size(self, name: str) -> int:
+        """Return the size of the encoded schema of a tool in bytes."""
+        return len(self._encoded_by_name[name])
+
+    @classmethod
+    def build(cls, functions: list[Callable]) -> ToolSchemaBundle:
+        """Build the bundle for a list of tool functions.
+
+        Generating the schemas of all tools takes a few milliseconds, so the
+        bundle is only kept in memory and nothing is read from or written to
+        disk.
+
+        Args:
+            functions: The tool functions.
+
+        """
+        return cls(get_json_schema(function) for function in functions)
+
+
+def encode_json(value) -> bytes:
+    """Encode a value as compact JSON."""
+    return json_dumps(value)
+
+
+def splice_json_field(encoded: bytes, key: str, encoded_value: bytes) -> bytes:
+    """Add a field with an already encoded value to an encoded JSON object."""
+    field = encode_json(key) + b":" + encoded_value
+    if encoded.rstrip() == b"{}":
+        return b"{" + field + b"}"
+    return encoded.rstrip()[:-1] + b"," + field + b"}"
+
+
+def _join_encoded(encoded_values: Iterable[bytes]) -> bytes:
+    """Join encoded JSON values into an encoded JSON array."""
+    return b"[" + b",".join(encoded_values) + b"]"
+
@@ -0,0 +1,172 @@
+"""This module selects the tools that are relevant to a user request."""
+
+from __future__ import annotations
+
+import re
+
+from .const import ASSISTANT_ROLE, ROLE_KEY, TOOL_CALLS_KEY, TOOL_DOES_NOT_EXIST
+from .tools import SUPPORTED_DOMAINS, TOOL_NAMES, get_tool_schema_bundle
+
+# Rough number of characters per token, used to estimate the prompt tokens saved
+CHARS_PER_TOKEN = 4
+
+POWER_TOOLS = ("hass_turn_on", "hass_turn_off", "hass_toggle")
+CLIMATE_TOOLS = ("hass_set_temperature", "hass_set_humidity", "hass_set_fan_mode",
+                 "hass_set_hvac_mode", "hass_set_preset_mode")
+CALENDAR_TOOLS = ("hass_get_agenda", "hass_get_availability",
+                  "hass_create_event", "hass_get_current_user")
+LIGHT_TOOLS = ("hass_set_brightness", "hass_set_color",
+               "hass_set_light_temperature", "hass_turn_on")
+
+# Patterns matched against the user request, and the tools each of them selects
+TOOL_PATTERNS = [
+    (r"\b(turn|switch|power)(ed|ing)?\b.*\b(on|off)\b|\b(toggle|activate|deactivate|enable|disable|start|run|stop)\b",
+     POWER_TOOLS),
+    (r"\b(scene|script|automation|routine|mode)s?\b", POWER_TOOLS),
+    (r"\b(open|close|shut|raise|lower)\b|\b(garage|blinds?|shades?|curtains?|covers?|windows?)\b",
+     ("hass_open", "hass_close", "hass_toggle")),
+    (r"\b(lock|unlock|locked|unlocked|doors?)\b", ("hass_lock", "hass_unlock")),
+    (r"\b(thermostat|temperature|degrees?|warmer|cooler|heat|heating|cool|cooling|ac|hvac|humidity|humid|preset|eco|away)\b",
+     CLIMATE_TOOLS),
+    (r"\b(vacuum|clean|cleaning|dock|robot)\b", ("hass_vacuum_control",)),
+    (r"\b(fans?|speed)\b", ("hass_fan_control", "hass_set_fan_mode") + POWER_TOOLS),
+    (r"\b(play|pause|resume|next|previous|skip|volume|louder|quieter|mute|unmute|shuffle|music|songs?|tracks?|tv|speakers?)\b",
+     ("hass_media_control",) + POWER_TOOLS),
+    (r"\b(calendar|agenda|schedule|events?|meetings?|appointments?|busy|free|available|availability|today|tonight|tomorrow|week)\b",
+     CALENDAR_TOOLS),
+    (r"\b(bright|brightness|brighter|dim|dimmer|percent|colou?r|red|green|blue|purple|yellow|orange|pink|white|warm|kelvin|daylight)\b|%",
+     LIGHT_TOOLS),
+    (r"\b(lights?|lamps?)\b", LIGHT_TOOLS + POWER_TOOLS),
+    (r"\bwho am i\b|\bmy name\b", ("hass_get_current_user",)),
+]
+COMPILED_TOOL_PATTERNS = [(re.compile(pattern, re.IGNORECASE), tool_names)
+                          for pattern, tool_names in TOOL_PATTERNS]
+
+# Domains each tool acts on, tools without an entry don't depend on any domain
+TOOL_DOMAINS = {
+    **SUPPORTED_DOMAINS,
+    "hass_get_availability": ["calendar"],
+    "hass_create_event": ["calendar"],
+}
+
+
+class ToolSelection:
+    """The tools selected for a request."""
+
+    def __init__(self, tool_names: list[str], full: bool):
+        """Initialize the selection."""
+        self.tool_names = tool_names
+        self.full = full
+
+    @property
+    def encoded(self) -> bytes:
+        """Return the encoded JSON schemas of the selected tools."""
+        if self.full:
+            return get_tool_schema_bundle().encoded
+        return get_tool_schema_bundle().encode_subset(self.tool_names)
+
+
+class ToolSelectorStats:
+    """Counters describing the tool selector."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.requests = 0
+        self.narrowed_requests = 0
+        self.widened_turns = 0
+        self.tokens_saved = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary."""
+        return {
+            "requests": self.requests,
+            "narrowed_requests": self.narrowed_requests,
+            "widened_turns": self.widened_turns,
+            "estimated_tokens_saved": self.tokens_saved,
+        }
+
+
+class ToolSelector:
+    """Selects the subset of tools worth sending with a request.
+
+    The user request is matched against keyword patterns, the matching tools are
+    limited to the domains of the exposed entities, and the tools used earlier in
+    the conversation are kept. When nothing matches, every tool is selected.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the selector."""
+        self.stats = ToolSelectorStats()
+
+    def full(self) -> ToolSelection:
+        """Return a selection of every tool."""
+        return ToolSelection(list(TOOL_NAMES), full=True)
+
+    def select(self, utterance: str, exposed_domains: set[str], messages: list[dict]) -> ToolSelection:
+        """Select the tools relevant to a user request.
+
+        Args:
+            utterance: The text of the user request.
+            exposed_domains: The domains of the exposed entities.
+            messages: The conversation so far.
+
+        """
+        selected: set[str] = set()
+        for pattern, tool_names in COMPILED_TOOL_PATTERNS:
+            if pattern.search(utterance):
+                selected.update(tool_names)
+
+        selected = {
+            tool_name for tool_name in selected
+            if tool_name not in TOOL_DOMAINS or exposed_domains.intersection(TOOL_DOMAINS[tool_name])
+        }
+        selected.update(_used_tool_names(messages))
+
+        if not selected:
+            return self.full()
+
+        return ToolSelection([tool_name for tool_name in TOOL_NAMES if tool_name in selected], full=False)
+
+    def should_widen(self, selection: ToolSelection, tool_calls: list[dict], tool_responses: list[dict]) -> bool:
+        """Return whether the model needs every tool to finish the turn.
+
+        That is the case when it tried to call a tool it wasn't offered, or a tool
+        couldn't be found.
+        """
+        if selection.full:
+            return False
+
+        widen = any(
+            tool_call.get("function", {}).get("name") not in selection.tool_names
+            for tool_call in tool_calls
+        ) or any(
+            str(tool_response.get("content", "")).startswith(TOOL_DOES_NOT_EXIST)
+            for tool_response in tool_responses
+        )
+        if widen:
+            self.stats.widened_turns += 1
+        return widen
+
+    def record_request(self, selection: ToolSelection) -> None:
+        """Record that a request was sent with the selected tools."""
+        self.stats.requests += 1
+        if selection.full:
+            return
+
+        self.stats.narrowed_requests += 1
+        bundle = get_tool_schema_bundle()
+        self.stats.tokens_saved += sum(
+            bundle.encoded_size(tool_name) // CHARS_PER_TOKEN
+            for tool_name in TOOL_NAMES
+            if tool_name not in selection.tool_names
+        )
+
+
+def _used_tool_names(messages: list[dict]) -> set[str]:
+    """Return the names of the tools called earlier in the conversation."""
+    return {
+        tool_call.get("function", {}).get("name")
+        for message in messages
+        if message.get(ROLE_KEY) == ASSISTANT_ROLE
+        for tool_call in message.get(TOOL_CALLS_KEY) or []
+    } & set(TOOL_NAMES)
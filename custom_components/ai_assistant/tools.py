@@ -1,13 +1,17 @@
 """This module provides tools for interacting with Home Assistant entities."""
 
+import asyncio
 from datetime import datetime
 from enum import Enum
+from functools import cache
 
-from .json_schema import get_json_schema
+from .tool_schemas import ToolSchemaBundle
 
-from .const import LOGGER, TOOL_DOES_NOT_EXIST
+from .const import DEFAULT_SERVICE_CALL_TIMEOUT, LOGGER, TOOL_DOES_NOT_EXIST
 
+from .entity_resolver import EntityMatch, async_get_entity_resolver
 from .hass import HomeAssistantService, HomeAssistantServiceResult
+from .hass_provider import HassContextFactory
 
 
 class MediaAction(Enum):
@@ -95,6 +99,11 @@ SUPPORTED_DOMAINS = {
 }
 
 
+# Arguments naming the entities a tool call acts on. Tool calls that share an
+# entity are executed in order, all other tool calls can run concurrently.
+TOOL_ENTITY_ARGUMENTS = ("entity_id", "entity_ids")
+
+
 class ToolCallResult:
     """Result of a tool call."""
 
@@ -105,6 +114,9 @@ class ToolCallResult:
         self.missing_domain_entity_ids = []
         self.incorrect_domain_entity_ids = []
         self.domain_not_supported_entity_ids = []
+        self.timed_out_entity_ids = []
+        self.unknown_entity_ids = []
+        self.corrected_entity_ids = []
 
     def __str__(self):
         """Return a string representation of the result."""
@@ -125,12 +137,23 @@ class ToolCallResult:
         if len(self.domain_not_supported_entity_ids) > 0:
             return_string += f", the following entity IDs have a domain that is not supported by this tool: {
                 ', '.join(self.domain_not_supported_entity_ids)}"
+        if len(self.timed_out_entity_ids) > 0:
+            return_string += f", the following entity IDs did not respond in time and may still change: {
+                ', '.join(self.timed_out_entity_ids)}"
+        if len(self.unknown_entity_ids) > 0:
+            return_string += f", the following entity IDs do not exist: {
+                ', '.join(self.unknown_entity_ids)}"
+        if len(self.corrected_entity_ids) > 0:
+            return_string += f", the following entity IDs do not exist and were replaced: {
+                ', '.join(self.corrected_entity_ids)}"
 
         return return_string
 
-    def add_errored_entity_id(self, entity_id: list[str]):
-        """Add an entity ID that encountered an error."""
-        self.errored_entity_ids.extend(entity_id)
+    def add_errored_entity_id(self, entity_id: list[str], message: str | None = None):
+        """Add an entity ID that encountered an error, along with what went wrong."""
+        self.errored_entity_ids.extend(
+            f"{errored_entity_id} ({message})" if message else errored_entity_id
+            for errored_entity_id in entity_id)
 
     def add_missing_domain_entity_id(self, entity_id: list[str]):
         """Add an entity ID that is missing a valid domain."""
@@ -144,6 +167,18 @@ class ToolCallResult:
         """Add an entity ID that has a domain that is not supported by this tool."""
         self.domain_not_supported_entity_ids.extend(entity_id)
 
+    def add_timed_out_entity_id(self, entity_id: list[str]):
+        """Add an entity ID whose service call did not finish in time."""
+        self.timed_out_entity_ids.extend(entity_id)
+
+    def add_unknown_entity_id(self, entity_id: str, suggestions: list[EntityMatch]):
+        """Add an entity ID that does not exist, along with the closest exposed entities."""
+        self.unknown_entity_ids.append(describe_suggestions(entity_id, suggestions))
+
+    def add_corrected_entity_id(self, entity_id: str, corrected_entity_id: str):
+        """Add an entity ID that does not exist and the entity ID used instead."""
+        self.corrected_entity_ids.append(f"{entity_id} with {corrected_entity_id}")
+
 
 class ToolCallSuggestions:
     """Suggestions for tool calls based on entity IDs."""
@@ -152,6 +187,7 @@ class ToolCallSuggestions:
         """Initialize the suggestions."""
         self.suggested_tool_calls = []
         self.invalid_entity_ids = []
+        self.unknown_entity_ids = []
 
     def __str__(self):
         """Return a string representation of the suggestions."""
@@ -169,6 +205,10 @@ class ToolCallSuggestions:
                 ', '.join(self.invalid_entity_ids)}"
             return_string += ". Entity IDs must start with a valid domain followed by a period."
 
+        if len(self.unknown_entity_ids) > 0:
+            return_string += f"\nThe following entity IDs do not exist: {
+                ', '.join(self.unknown_entity_ids)}"
+
         return return_string
 
     def add_suggested_tool_call(self, tool_call: str):
@@ -177,7 +217,57 @@ class ToolCallSuggestions:
 
     def add_invalid_entity_id(self, entity_id: str):
         """Add an entity ID that is invalid."""
-        self.invalid_entity_ids.extend(entity_id)
+        self.invalid_entity_ids.append(entity_id)
+
+    def add_unknown_entity_id(self, entity_id: str, suggestions: list[EntityMatch]):
+        """Add an entity ID that does not exist, along with the closest exposed entities."""
+        self.unknown_entity_ids.append(describe_suggestions(entity_id, suggestions))
+
+
+def describe_suggestions(entity_id: str, suggestions: list[EntityMatch]) -> str:
+    """Describe an entity ID that does not exist and the exposed entities it may refer to."""
+    if not suggestions:
+        return entity_id
+    return f"{entity_id} (did you mean {' or '.join(str(match) for match in suggestions)}?)"
+
+
+def resolve_entity_id(entity_id: str, tool_call_result: ToolCallResult, tool_name: str) -> str | None:
+    """Return the entity ID a tool should act on.
+
+    Entity IDs of entities that don't exist are looked up among the exposed
+    entities the tool supports, and replaced when one of them is a clear match.
+    Otherwise the closest entities are suggested in the result.
+
+    Args:
+        entity_id: The entity ID to resolve.
+        tool_call_result: An instance of ToolCallResult to update with the results of resolving.
+        tool_name: The name of the tool making the call.
+
+    Returns:
+        str | None: The entity ID to act on, or None if there is none.
+
+    """
+    hass = HassContextFactory.get_instance()
+    if "." in entity_id and hass.states.get(entity_id) is not None:
+        if entity_id.split(".")[0] not in SUPPORTED_DOMAINS[tool_name]:
+            tool_call_result.add_domain_not_supported_entity_id([entity_id])
+            return None
+        return entity_id
+
+    corrected_entity_id, suggestions = async_get_entity_resolver(hass).async_resolve(
+        entity_id, SUPPORTED_DOMAINS[tool_name])
+    if corrected_entity_id is not None:
+        LOGGER.debug("Replaced the unknown entity ID %s with %s", entity_id, corrected_entity_id)
+        tool_call_result.add_corrected_entity_id(entity_id, corrected_entity_id)
+        return corrected_entity_id
+
+    if "." not in entity_id:
+        tool_call_result.add_missing_domain_entity_id([describe_suggestions(entity_id, suggestions)])
+    elif entity_id.split(".")[0] not in SUPPORTED_DOMAINS[tool_name]:
+        tool_call_result.add_domain_not_supported_entity_id([entity_id])
+    else:
+        tool_call_result.add_unknown_entity_id(entity_id, suggestions)
+    return None
 
 
 def validate_entity_ids(entity_ids: list[str], domain_entity_map: dict, tool_call_result: ToolCallResult, tool_name: str):
@@ -191,16 +281,11 @@ def validate_entity_ids(entity_ids: list[str], domain_entity_map: dict, tool_cal
 
     """
     for entity_id in entity_ids:
-        if "." not in entity_id:
-            tool_call_result.add_missing_domain_entity_id([entity_id])
+        if (entity_id := resolve_entity_id(entity_id, tool_call_result, tool_name)) is None:
             continue
 
         domain = entity_id.split(".")[0]
 
-        if domain not in SUPPORTED_DOMAINS[tool_name]:
-            tool_call_result.add_domain_not_supported_entity_id([entity_id])
-            continue
-
         if domain not in domain_entity_map:
             domain_entity_map[domain] = []
         domain_entity_map[domain].append(entity_id)
@@ -215,13 +300,34 @@ def process_service_call_results(service_call_results: list[HomeAssistantService
 
     """
     for result in service_call_results:
-        if not result.success:
-            tool_call_result.add_errored_entity_id(result.error)
+        if result.timed_out:
+            tool_call_result.add_timed_out_entity_id(result.error)
+        elif not result.success:
+            tool_call_result.add_errored_entity_id(result.error, result.message)
 
     tool_call_result.success = all(
         result.success for result in service_call_results)
 
 
+async def fan_out_service_calls(domain_entity_map: dict[str, list[str]], service: str, data: dict | None = None) -> list[HomeAssistantServiceResult]:
+    """Call a service for the entities of every domain concurrently.
+
+    A service call is made per domain, so one slow integration doesn't hold up the
+    others. Each call is given DEFAULT_SERVICE_CALL_TIMEOUT seconds to finish.
+
+    Args:
+        domain_entity_map: The entity IDs to call the service on, grouped by domain.
+        service: The service to call.
+        data: The data to pass to the service.
+
+    """
+    return await asyncio.gather(*(
+        HomeAssistantService.async_call_service(
+            ids, domain, service, data, timeout=DEFAULT_SERVICE_CALL_TIMEOUT)
+        for domain, ids in domain_entity_map.items()
+    ))
+
+
 async def make_service_call(entity_ids: list[str], service: str, tool_name: str):
     """Make a service call to Home Assistant.
 
@@ -234,16 +340,13 @@ async def make_service_call(entity_ids: list[str], service: str, tool_name: str)
     """
 
     domain_entity_map = {}
-    service_call_results: list[HomeAssistantServiceResult] = []
     tool_call_result = ToolCallResult()
 
     validate_entity_ids(entity_ids, domain_entity_map,
                         tool_call_result, tool_name)
 
-    for domain, ids in domain_entity_map.items():
-        result = await HomeAssistantService.async_call_service(
-            ids, domain, service)
-        service_call_results.append(result)
+    service_call_results = await fan_out_service_calls(
+        domain_entity_map, service)
 
     process_service_call_results(service_call_results, tool_call_result)
 
@@ -263,17 +366,11 @@ async def make_service_call_with_action(entity_id: str, action: str, tool_name:
 
     tool_call_result = ToolCallResult()
 
-    if "." not in entity_id:
-        tool_call_result.add_missing_domain_entity_id([entity_id])
-    else:
+    if (entity_id := resolve_entity_id(entity_id, tool_call_result, tool_name)) is not None:
         domain = entity_id.split(".")[0]
-
-        if domain not in SUPPORTED_DOMAINS[tool_name]:
-            tool_call_result.add_domain_not_supported_entity_id([entity_id])
-        else:
-            result = await HomeAssistantService.async_call_service(
-                [entity_id], domain, action)
-            process_service_call_results([result], tool_call_result)
+        result = await HomeAssistantService.async_call_service(
+            [entity_id], domain, action, timeout=DEFAULT_SERVICE_CALL_TIMEOUT)
+        process_service_call_results([result], tool_call_result)
 
     return str(tool_call_result)
 
@@ -290,16 +387,13 @@ async def make_service_call_with_data(entity_ids: list[str], service: str, data:
     """
 
     domain_entity_map = {}
-    service_call_results: list[HomeAssistantServiceResult] = []
     tool_call_result = ToolCallResult()
 
     validate_entity_ids(entity_ids, domain_entity_map,
                         tool_call_result, tool_name)
 
-    for domain, ids in domain_entity_map.items():
-        result = await HomeAssistantService.async_call_service(
-            ids, domain, service, data)
-        service_call_results.append(result)
+    service_call_results = await fan_out_service_calls(
+        domain_entity_map, service, data)
 
     process_service_call_results(service_call_results, tool_call_result)
 
@@ -313,22 +407,27 @@ def suggest_tool_call(entity_ids: list[str] | str) -> ToolCallSuggestions:
         entity_ids: The entity IDs to suggest a tool call for.
 
     """
-    if not isinstance(entity_ids, list) or not all(isinstance(id, str) for id in entity_ids) or not isinstance(entity_ids, str):
+    if not isinstance(entity_ids, list | str) or (
+            isinstance(entity_ids, list) and not all(isinstance(id, str) for id in entity_ids)):
         raise ValueError("entity_ids must be a list of strings")
-    if isinstance(entity_ids, list) and len(entity_ids) < 1:
-        raise ValueError("entity_ids must contain at least one entity ID")
 
     tool_call_suggestions = ToolCallSuggestions()
 
     if isinstance(entity_ids, str):
         entity_ids = [entity_ids]
 
+    hass = HassContextFactory.get_instance()
+    resolver = async_get_entity_resolver(hass)
     domain_entity_map = {}
     for entity_id in entity_ids:
         if "." not in entity_id:
             tool_call_suggestions.add_invalid_entity_id(entity_id)
             continue
 
+        if hass.states.get(entity_id) is None:
+            tool_call_suggestions.add_unknown_entity_id(
+                entity_id, resolver.async_lookup(entity_id))
+
         domain = entity_id.split(".")[0]
 
         if domain not in domain_entity_map:
@@ -343,6 +442,61 @@ def suggest_tool_call(entity_ids: list[str] | str) -> ToolCallSuggestions:
     return tool_call_suggestions
 
 
+def get_tool_call_entity_ids(tool_args: dict) -> set[str]:
+    """Return the entity IDs a tool call acts on.
+
+    Args:
+        tool_args: The arguments of the tool call.
+
+    """
+    entity_ids = set()
+    if not isinstance(tool_args, dict):
+        return entity_ids
+
+    for argument in TOOL_ENTITY_ARGUMENTS:
+        value = tool_args.get(argument)
+        if isinstance(value, str):
+            entity_ids.add(value)
+        elif isinstance(value, list):
+            entity_ids.update(
+                entity_id for entity_id in value if isinstance(entity_id, str))
+    return entity_ids
+
+
+def group_dependent_tool_calls(tool_args_list: list[dict]) -> list[list[int]]:
+    """Group tool calls that touch the same entities.
+
+    Tool calls are grouped transitively, so if the first and second call share an
+    entity, and the second and third call share another one, all three end up in
+    the same group. Each group lists the indexes of its tool calls in their
+    original order, and the groups are ordered by their first tool call.
+
+    Args:
+        tool_args_list: The arguments of each tool call.
+
+    """
+    parents = list(range(len(tool_args_list)))
+
+    def find(index: int) -> int:
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    entity_owners: dict[str, int] = {}
+    for index, tool_args in enumerate(tool_args_list):
+        for entity_id in get_tool_call_entity_ids(tool_args):
+            if entity_id in entity_owners:
+                parents[find(index)] = find(entity_owners[entity_id])
+            else:
+                entity_owners[entity_id] = index
+
+    groups: dict[int, list[int]] = {}
+    for index in range(len(tool_args_list)):
+        groups.setdefault(find(index), []).append(index)
+    return sorted(groups.values(), key=lambda group: group[0])
+
+
 def validate_time_range(start_date: str, end_date: str):
     """Validate the time range specified in the 'start_time' and 'end_time' parameters.
 
@@ -933,31 +1087,40 @@ def hass_get_current_user():
     return "Hemanth Pai"
 
 
-tools = [
-    get_json_schema(hass_turn_on),
-    get_json_schema(hass_turn_off),
-    get_json_schema(hass_toggle),
-    get_json_schema(hass_open),
-    get_json_schema(hass_close),
-    get_json_schema(hass_set_temperature),
-    get_json_schema(hass_set_humidity),
-    get_json_schema(hass_set_fan_mode),
-    get_json_schema(hass_set_hvac_mode),
-    get_json_schema(hass_set_preset_mode),
-    get_json_schema(hass_lock),
-    get_json_schema(hass_unlock),
-    get_json_schema(hass_vacuum_control),
-    get_json_schema(hass_fan_control),
-    get_json_schema(hass_media_control),
-    get_json_schema(hass_get_current_user),
-    get_json_schema(hass_get_agenda),
-    get_json_schema(hass_get_availability),
-    get_json_schema(hass_create_event),
-    get_json_schema(hass_set_brightness),
-    get_json_schema(hass_set_color),
-    get_json_schema(hass_set_light_temperature),
+TOOL_SCHEMA_FUNCTIONS = [
+    hass_turn_on,
+    hass_turn_off,
+    hass_toggle,
+    hass_open,
+    hass_close,
+    hass_set_temperature,
+    hass_set_humidity,
+    hass_set_fan_mode,
+    hass_set_hvac_mode,
+    hass_set_preset_mode,
+    hass_lock,
+    hass_unlock,
+    hass_vacuum_control,
+    hass_fan_control,
+    hass_media_control,
+    hass_get_current_user,
+    hass_get_agenda,
+    hass_get_availability,
+    hass_create_event,
+    hass_set_brightness,
+    hass_set_color,
+    hass_set_light_temperature,
 ]
 
+TOOL_NAMES = tuple(function.__name__ for function in TOOL_SCHEMA_FUNCTIONS)
+
+
+@cache
+def get_tool_schema_bundle() -> ToolSchemaBundle:
+    """Return the schema bundle of the tools, building it the first time a request needs it."""
+    return ToolSchemaBundle.build(TOOL_SCHEMA_FUNCTIONS)
+
+
 TOOL_FUNCTIONS = {
     "hass_turn_on": hass_turn_on,
     "hass_turn_off": hass_turn_off,
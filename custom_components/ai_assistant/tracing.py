@@ -0,0 +1,168 @@
+"""This module traces where the time of a conversation turn goes."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Any
+
+# Number of recent turns kept for diagnostics
+MAX_TRACES = 100
+
+# Percentiles of the span durations reported for diagnostics
+SUMMARY_PERCENTILES = (50, 95, 99)
+
+_current_span: ContextVar[Span | None] = ContextVar("ai_assistant_span", default=None)
+
+
+class Span:
+    """A timed step of a turn, with the steps it is made of."""
+
+    def __init__(self, name: str, attributes: dict[str, Any]):
+        """Initialize and start the span."""
+        self.name = name
+        self.attributes = attributes
+        self.children: list[Span] = []
+        self.started = time.monotonic()
+        self.duration: float | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set an attribute of the span."""
+        self.attributes[key] = value
+
+    def mark(self, key: str) -> None:
+        """Record the milliseconds since the span started as an attribute, such as the time to first token."""
+        self.attributes.setdefault(key, _ms(time.monotonic() - self.started))
+
+    def add_time(self, key: str, seconds: float) -> None:
+        """Add a duration to an attribute in milliseconds, such as the time spent waiting for a connection."""
+        self.attributes[key] = round(self.attributes.get(key, 0.0) + seconds * 1000, 1)
+
+    def end(self) -> None:
+        """Stop the span."""
+        if self.duration is None:
+            self.duration = time.monotonic() - self.started
+
+    def walk(self) -> Iterator[Span]:
+        """Yield the span and all spans below it."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def as_dict(self, origin: float | None = None) -> dict:
+        """Return the span and its children, with times in milliseconds from the start of the trace."""
+        origin = self.started if origin is None else origin
+        return {
+            "name": self.name,
+            "start_ms": _ms(self.started - origin),
+            "duration_ms": _ms(self.duration) if self.duration is not None else None,
+            **self.attributes,
+            "children": [child.as_dict(origin) for child in self.children],
+        }
+
+
+class Tracer:
+    """Records the spans of recent turns in a ring buffer.
+
+    A trace is started for every turn, and the steps of the turn are traced with
+    span(), which attaches them to the span that is current in the task, so the
+    code doing the work doesn't need a reference to the tracer. Tasks started
+    within a span, such as concurrent tool calls, attach to it as well.
+    """
+
+    def __init__(self, max_traces: int = MAX_TRACES) -> None:
+        """Initialize the tracer."""
+        self.traces: deque[Span] = deque(maxlen=max_traces)
+
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Trace a turn, keeping it in the ring buffer once it is finished."""
+        root = Span(name, attributes)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as err:
+            root.set_attribute("error", type(err).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end()
+            self.traces.append(root)
+
+    def summary(self) -> dict:
+        """Return the count and the duration percentiles of every kind of span in the buffer."""
+        durations: dict[str, list[float]] = {}
+        for trace in self.traces:
+            for traced_span in trace.walk():
+                if traced_span.duration is not None:
+                    durations.setdefault(traced_span.name, []).append(traced_span.duration)
+
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                "count": len(values),
+                **{f"p{percentile}_ms": _ms(_percentile(values, percentile))
+                   for percentile in SUMMARY_PERCENTILES},
+                "max_ms": _ms(values[-1]),
+            }
+        return summary
+
+    def as_dict(self) -> dict:
+        """Return the summary and the recent traces for diagnostics, newest first."""
+        return {
+            "summary": self.summary(),
+            "traces": [trace.as_dict() for trace in reversed(self.traces)],
+        }
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """Trace a step as part of the current span, does nothing outside of a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, attributes)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as err:
+        child.set_attribute("error", type(err).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def set_span_attribute(key: str, value: Any) -> None:
+    """Set an attribute of the current span, if there is one."""
+    if (current := _current_span.get()) is not None:
+        current.set_attribute(key, value)
+
+
+def mark_span(key: str) -> None:
+    """Record the milliseconds since the current span started, if there is one."""
+    if (current := _current_span.get()) is not None:
+        current.mark(key)
+
+
+def add_span_time(key: str, seconds: float) -> None:
+    """Add a duration to an attribute of the current span, if there is one."""
+    if (current := _current_span.get()) is not None:
+        current.add_time(key, seconds)
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    """Return a percentile of sorted values."""
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+
+def _ms(seconds: float) -> float:
+    """Return seconds as milliseconds."""
+    return round(seconds * 1000, 1)
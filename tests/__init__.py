@@ -0,0 +1,16 @@
+"""Tests for the AI Assistant integration."""
+
+import json
+
+# A streamed reply of the vLLM server, ending with the usage chunk sent when stream_options.include_usage is set
+CHAT_STREAM = b"".join(
+    b"data: " + json.dumps(chunk).encode() + b"\n\n"
+    for chunk in [
+        {"object": "chat.completion.chunk",
+         "choices": [{"delta": {"content": "Hello"}, "finish_reason": None}]},
+        {"object": "chat.completion.chunk",
+         "choices": [{"delta": {"content": " there."}, "finish_reason": "stop"}]},
+        {"object": "chat.completion.chunk", "choices": [],
+         "usage": {"prompt_tokens": 42, "completion_tokens": 3, "total_tokens": 45}},
+    ]
+) + b"data: [DONE]\n\n"
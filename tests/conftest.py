@@ -0,0 +1,19 @@
+"""Fixtures for the AI Assistant tests."""
+
+import pytest
+
+from custom_components.ai_assistant.hass_provider import HassContextFactory
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Enable loading the integration from custom_components."""
+    yield
+
+
+@pytest.fixture
+def hass_context(hass):
+    """Make the test Home Assistant instance the one the tools act on."""
+    HassContextFactory._instance = hass
+    yield hass
+    HassContextFactory._instance = None
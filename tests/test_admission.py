@@ -0,0 +1,61 @@
+"""Tests for admitting conversation turns."""
+
+import asyncio
+
+import pytest
+
+from custom_components.ai_assistant.admission import (
+    PRIORITY_AUTOMATION,
+    PRIORITY_VOICE,
+    AdmissionController,
+)
+from custom_components.ai_assistant.exceptions import TurnRejectedError
+
+
+async def test_turns_are_admitted_by_priority():
+    """Waiting voice turns are admitted before automation turns that arrived earlier."""
+    admission = AdmissionController(max_concurrent=1)
+    admitted: list[str] = []
+
+    async def turn(name: str, priority: int) -> None:
+        async with admission.async_admit(priority):
+            admitted.append(name)
+
+    async with admission.async_admit(PRIORITY_AUTOMATION):
+        automation = asyncio.create_task(turn("automation", PRIORITY_AUTOMATION))
+        await asyncio.sleep(0)
+        voice = asyncio.create_task(turn("voice", PRIORITY_VOICE))
+        await asyncio.sleep(0)
+        assert admission.queue_depth == 2
+
+    await asyncio.gather(automation, voice)
+    assert admitted == ["voice", "automation"]
+    assert admission.active == 0
+
+
+async def test_full_queue_rejects_turns():
+    """A turn arriving at a full queue is rejected right away."""
+    admission = AdmissionController(max_concurrent=1, max_queued=0)
+
+    async with admission.async_admit(PRIORITY_VOICE):
+        with pytest.raises(TurnRejectedError):
+            async with admission.async_admit(PRIORITY_VOICE):
+                pass
+
+    assert admission.stats.rejected == 1
+
+
+async def test_waiting_turn_times_out():
+    """A turn that waits longer than its timeout is rejected and leaves the queue."""
+    admission = AdmissionController(max_concurrent=1)
+
+    async with admission.async_admit(PRIORITY_AUTOMATION):
+        with pytest.raises(TurnRejectedError):
+            async with admission.async_admit(PRIORITY_VOICE, timeout=0.01):
+                pass
+        assert admission.queue_depth == 0
+
+    assert admission.stats.timed_out == 1
+    assert admission.active == 0
+    async with admission.async_admit(PRIORITY_VOICE, timeout=0.01):
+        assert admission.active == 1
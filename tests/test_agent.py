@@ -0,0 +1,170 @@
+"""Tests for the conversation agent."""
+
+import asyncio
+import json
+import logging
+from unittest.mock import patch
+
+from homeassistant.components import conversation
+from homeassistant.core import Context, HomeAssistant
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.ai_assistant.admission import PRIORITY_AUTOMATION
+from custom_components.ai_assistant.agent import AIConversationAgent
+from custom_components.ai_assistant.api import VllmApiClient
+from custom_components.ai_assistant.const import (
+    CONF_BASE_URL,
+    CONF_HISTORY_PERSIST,
+    CONF_MAX_CONCURRENT_TURNS,
+    CONF_PROMPT_CACHE_FRIENDLY,
+    CONF_PROMPT_SYSTEM,
+    CONF_STREAM,
+    CONF_TURN_TIMEOUT,
+    DEFAULT_PROMPT_SYSTEM,
+    DOMAIN,
+    TOOL_NOT_RUN,
+    TOOL_TIMED_OUT,
+    TURN_BUSY,
+    TURN_TIMED_OUT,
+)
+from custom_components.ai_assistant.tracing import span
+
+from . import CHAT_STREAM
+
+BASE_URL = "http://vllm.local:8000"
+
+
+def _create_agent(hass: HomeAssistant, session, **options) -> AIConversationAgent:
+    """Create an agent talking to the mocked server."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={CONF_BASE_URL: BASE_URL},
+        options={CONF_HISTORY_PERSIST: False, **options},
+    )
+    return AIConversationAgent(hass, entry, VllmApiClient(BASE_URL, 10, session))
+
+
+def _tool_call(tool_call_id: str, name: str, arguments: dict) -> dict:
+    """Return a tool call of the model."""
+    return {"id": tool_call_id, "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+async def test_streamed_query_records_usage(hass: HomeAssistant, aioclient_mock):
+    """A streamed round traces its token counts and calibrates the token estimate."""
+    aioclient_mock.post(f"{BASE_URL}/v1/chat/completions", content=CHAT_STREAM)
+    session = aioclient_mock.create_session(hass.loop)
+    agent = _create_agent(hass, session, **{CONF_STREAM: True})
+
+    messages = [
+        {"role": "system", "content": "You are a voice assistant."},
+        {"role": "user", "content": "Hello"},
+    ]
+    with agent.tracer.trace("turn") as turn, span("llm"):
+        response = await agent.query(messages, use_tools=False)
+    await session.close()
+
+    assert response.message == "Hello there."
+    llm = turn.children[0]
+    assert llm.attributes["stream"] is True
+    assert llm.attributes["prompt_tokens"] == 42
+    assert llm.attributes["completion_tokens"] == 3
+    assert agent.context.estimator.calibrations == 1
+
+
+async def test_timed_out_round_keeps_tools_that_ran(hass: HomeAssistant, aioclient_mock):
+    """Running out of time while tools run keeps the round, answering unfinished calls."""
+    tool_calls = [
+        _tool_call("call_1", "fast_tool", {"entity_id": "light.kitchen"}),
+        _tool_call("call_2", "slow_tool", {"entity_id": "light.hallway"}),
+        _tool_call("call_3", "fast_tool", {"entity_id": "light.hallway"}),
+    ]
+    aioclient_mock.post(f"{BASE_URL}/v1/chat/completions", json={
+        "object": "chat.completion",
+        "choices": [{"message": {"content": None, "tool_call_id": None, "tool_calls": tool_calls}}],
+    })
+    session = aioclient_mock.create_session(hass.loop)
+    agent = _create_agent(hass, session, **{CONF_TURN_TIMEOUT: 0.5})
+
+    async def fast_tool(entity_id: str) -> str:
+        return f"Turned on {entity_id}"
+
+    async def slow_tool(entity_id: str) -> str:
+        await asyncio.sleep(10)
+        return f"Turned on {entity_id}"
+
+    messages = [
+        {"role": "system", "content": "You are a voice assistant."},
+        {"role": "user", "content": "Turn on the lights"},
+    ]
+    with patch.dict("custom_components.ai_assistant.agent.TOOL_FUNCTIONS",
+                    {"fast_tool": fast_tool, "slow_tool": slow_tool}):
+        answer = await agent._async_generate_response(messages, "en", "conversation")
+    await session.close()
+
+    assert answer == TURN_TIMED_OUT
+    assert [message["role"] for message in messages] == [
+        "system", "user", "assistant", "tool", "tool", "tool", "assistant"]
+    assert messages[2]["tool_calls"] == tool_calls
+    assert [(message["tool_call_id"], message["content"]) for message in messages[3:6]] == [
+        ("call_1", "Turned on light.kitchen"),
+        ("call_2", TOOL_TIMED_OUT),
+        ("call_3", TOOL_NOT_RUN),
+    ]
+
+
+async def test_timed_out_round_without_tools_is_dropped(hass: HomeAssistant, aioclient_mock):
+    """Running out of time waiting for the model leaves only the apology."""
+    session = aioclient_mock.create_session(hass.loop)
+    agent = _create_agent(hass, session)
+
+    messages = [
+        {"role": "system", "content": "You are a voice assistant."},
+        {"role": "user", "content": "Turn on the lights"},
+    ]
+    with patch.object(agent, "query", side_effect=asyncio.TimeoutError):
+        answer = await agent._async_generate_response(messages, "en", "conversation")
+    await session.close()
+
+    assert answer == TURN_TIMED_OUT
+    assert [message["role"] for message in messages] == ["system", "user", "assistant"]
+
+
+async def test_waiting_turn_runs_out_of_time(hass_context: HomeAssistant, aioclient_mock):
+    """A turn still waiting for a slot when its time is up is answered as busy."""
+    assert await async_setup_component(hass_context, "homeassistant", {})
+    session = aioclient_mock.create_session(hass_context.loop)
+    agent = _create_agent(hass_context, session, **{CONF_TURN_TIMEOUT: 0.05, CONF_MAX_CONCURRENT_TURNS: 1})
+
+    async with agent.admission.async_admit(PRIORITY_AUTOMATION):
+        result = await agent.async_process(conversation.ConversationInput(
+            text="Turn on the lights",
+            context=Context(),
+            conversation_id=None,
+            device_id="satellite",
+            language="en",
+        ))
+    await session.close()
+
+    assert result.response.speech["plain"]["speech"] == TURN_BUSY
+    assert aioclient_mock.call_count == 0
+    assert agent.admission.stats.timed_out == 1
+
+
+async def test_custom_prompt_with_states_warns(hass: HomeAssistant, aioclient_mock, caplog):
+    """A custom system prompt repeating the live state in the cache friendly layout is warned about."""
+    session = aioclient_mock.create_session(hass.loop)
+
+    with caplog.at_level(logging.WARNING):
+        _create_agent(hass, session, **{
+            CONF_PROMPT_CACHE_FRIENDLY: True, CONF_PROMPT_SYSTEM: DEFAULT_PROMPT_SYSTEM})
+        _create_agent(hass, session, **{
+            CONF_PROMPT_CACHE_FRIENDLY: True, CONF_PROMPT_SYSTEM: "You are 'Friday'."})
+        assert "system prompt renders entity states" not in caplog.text
+
+        _create_agent(hass, session, **{
+            CONF_PROMPT_CACHE_FRIENDLY: True,
+            CONF_PROMPT_SYSTEM: "You are 'Friday'. The kitchen light is {{ states('light.kitchen') }}."})
+        assert "system prompt renders entity states" in caplog.text
+    await session.close()
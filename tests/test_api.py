@@ -0,0 +1,60 @@
+"""Tests for the vLLM API client."""
+
+import json
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ai_assistant.api import VllmApiClient
+from custom_components.ai_assistant.response import VllmChatStreamAccumulator
+
+from . import CHAT_STREAM
+
+BASE_URL = "http://vllm.local:8000"
+
+
+async def test_chat_stream_requests_usage(hass: HomeAssistant, aioclient_mock):
+    """Streamed requests ask for the token counts, which end up in the response."""
+    aioclient_mock.post(f"{BASE_URL}/v1/chat/completions", content=CHAT_STREAM)
+    session = aioclient_mock.create_session(hass.loop)
+    client = VllmApiClient(BASE_URL, 10, session)
+
+    accumulator = VllmChatStreamAccumulator()
+    async for delta in client.async_chat_stream({"model": "test", "messages": []}):
+        accumulator.add(delta)
+    await session.close()
+
+    _, _, body, _ = aioclient_mock.mock_calls[0]
+    request = json.loads(body)
+    assert request["stream"] is True
+    assert request["stream_options"] == {"include_usage": True}
+
+    response = accumulator.response()
+    assert response.message == "Hello there."
+    assert response.prompt_tokens == 42
+    assert response.usage["completion_tokens"] == 3
+
+
+async def test_only_chat_requests_record_latency(hass: HomeAssistant, aioclient_mock):
+    """Listing the models leaves the latencies used for hedging and routing unchanged."""
+    aioclient_mock.get(f"{BASE_URL}/v1/models", json={
+        "object": "list", "data": [{"id": "test", "object": "model"}]})
+    aioclient_mock.post(f"{BASE_URL}/v1/chat/completions", json={
+        "object": "chat.completion",
+        "choices": [{"message": {"content": "Hello there.", "tool_call_id": None, "tool_calls": None}}],
+    })
+    session = aioclient_mock.create_session(hass.loop)
+    client = VllmApiClient(BASE_URL, 10, session, hedge_percentile=95)
+    endpoint = client.endpoints.endpoints[0]
+
+    for _ in range(3):
+        client.model_catalog.invalidate()
+        await client.async_get_models()
+    assert aioclient_mock.call_count == 3
+    assert len(client.latencies._latencies) == 0
+    assert endpoint.latency is None
+
+    await client.async_chat({"model": "test", "messages": []})
+    await session.close()
+
+    assert len(client.latencies._latencies) == 1
+    assert endpoint.latency is not None
@@ -0,0 +1,43 @@
+"""Tests for routing requests across vLLM servers."""
+
+from custom_components.ai_assistant.balancer import LATENCY_HALF_LIFE, VllmEndpointPool
+from custom_components.ai_assistant.const import ROUTING_LATENCY
+
+
+def test_latency_strategy_picks_the_fastest_endpoint():
+    """New conversations go to the endpoint with the lowest average latency."""
+    pool = VllmEndpointPool(["http://fast:8000", "http://slow:8000"], ROUTING_LATENCY)
+    fast, slow = pool.endpoints
+    fast.add_latency(0.5)
+    slow.add_latency(2.0)
+
+    assert pool.select("conversation") is fast
+
+
+def test_stale_latency_decays():
+    """The latency of an endpoint without requests halves every half-life."""
+    pool = VllmEndpointPool(["http://slow:8000"], ROUTING_LATENCY)
+    endpoint = pool.endpoints[0]
+    endpoint.add_latency(2.0)
+
+    now = endpoint.latency_updated
+    assert endpoint.current_latency(now) == 2.0
+    assert endpoint.current_latency(now + LATENCY_HALF_LIFE) == 1.0
+    assert endpoint.current_latency(now + 2 * LATENCY_HALF_LIFE) == 0.5
+
+
+def test_slow_endpoint_is_tried_again():
+    """An endpoint that was slow once gets a request again once its latency went stale."""
+    pool = VllmEndpointPool(["http://fast:8000", "http://slow:8000"], ROUTING_LATENCY)
+    fast, slow = pool.endpoints
+    slow.add_latency(2.0)
+    fast.add_latency(0.5)
+    assert pool.select() is fast
+
+    # The fast endpoint keeps answering while the slow one got nothing for a while
+    slow.latency_updated -= 3 * LATENCY_HALF_LIFE
+    assert pool.select() is slow
+
+    # A new measurement is folded into the decayed average
+    slow.add_latency(2.0)
+    assert 0.5 < slow.latency < 2.0
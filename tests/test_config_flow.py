@@ -0,0 +1,43 @@
+"""Tests for the config flow."""
+
+from homeassistant.core import HomeAssistant
+from homeassistant.data_entry_flow import FlowResultType
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.ai_assistant.const import (
+    CONF_BASE_URL,
+    CONF_EXTRA_BASE_URLS,
+    DOMAIN,
+)
+
+BASE_URL = "http://vllm.local:8000"
+
+
+async def _async_configure_general(hass: HomeAssistant, extra_base_urls: str) -> dict:
+    """Submit the general settings with the given additional base URLs."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_BASE_URL: BASE_URL})
+    entry.add_to_hass(hass)
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {"next_step_id": "general_config"})
+    return await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_EXTRA_BASE_URLS: extra_base_urls})
+
+
+async def test_extra_base_urls_are_validated(hass: HomeAssistant):
+    """A malformed additional base URL is rejected like the base URL."""
+    result = await _async_configure_general(
+        hass, "http://vllm-2.local:8000, htp//vllm-3.local:8000")
+
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"] == {CONF_EXTRA_BASE_URLS: "invalid_url"}
+
+
+async def test_extra_base_urls_are_saved(hass: HomeAssistant):
+    """Valid additional base URLs are saved."""
+    result = await _async_configure_general(
+        hass, "http://vllm-2.local:8000, http://vllm-3.local:8000")
+
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"][CONF_EXTRA_BASE_URLS] == "http://vllm-2.local:8000, http://vllm-3.local:8000"
@@ -0,0 +1,40 @@
+"""Tests for the heartbeat coordinator."""
+
+import aiohttp
+import pytest
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ai_assistant.api import VllmApiClient
+from custom_components.ai_assistant.coordinator import (
+    HEARTBEAT_MAX_INTERVAL,
+    HEARTBEAT_MIN_INTERVAL,
+    AIConversationDataUpdateCoordinator,
+)
+from custom_components.ai_assistant.exceptions import ApiCommError
+
+BASE_URL = "http://vllm.local:8000"
+EXTRA_BASE_URL = "http://vllm-2.local:8000"
+
+
+async def test_request_ejecting_endpoint_probes_it_soon(hass: HomeAssistant, aioclient_mock):
+    """An endpoint ejected by a failed request is probed right away, even while the heartbeat is backed off."""
+    aioclient_mock.get(f"{BASE_URL}/v1/models", json={
+        "object": "list", "data": [{"id": "test", "object": "model"}]})
+    aioclient_mock.get(f"{EXTRA_BASE_URL}/v1/models", exc=aiohttp.ClientError)
+    session = aioclient_mock.create_session(hass.loop)
+    client = VllmApiClient(BASE_URL, 10, session, extra_base_urls=[EXTRA_BASE_URL])
+    coordinator = AIConversationDataUpdateCoordinator(hass, client)
+    coordinator.update_interval = HEARTBEAT_MAX_INTERVAL
+    endpoint = client.endpoints.endpoints[1]
+
+    with pytest.raises(ApiCommError), client.endpoints.track(endpoint):
+        raise ApiCommError("unknown error while talking to the server")
+    await hass.async_block_till_done()
+    await session.close()
+
+    assert not endpoint.healthy
+    assert coordinator.update_interval == HEARTBEAT_MIN_INTERVAL
+    assert [str(url) for _, url, _, _ in aioclient_mock.mock_calls] == [
+        f"{BASE_URL}/v1/models", f"{EXTRA_BASE_URL}/v1/models"]
+    await coordinator.async_shutdown()
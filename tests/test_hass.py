@@ -0,0 +1,64 @@
+"""Tests for the service calls made by the tools."""
+
+import asyncio
+
+import pytest
+
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import HomeAssistantError
+
+from custom_components.ai_assistant.hass import HomeAssistantService
+from custom_components.ai_assistant.tools import make_service_call
+
+
+@pytest.fixture
+def slow_service(hass_context: HomeAssistant) -> list[ServiceCall]:
+    """Register a light service that takes a while, returning the calls it finished."""
+    finished: list[ServiceCall] = []
+
+    async def handle(call: ServiceCall) -> None:
+        await asyncio.sleep(0.2)
+        finished.append(call)
+
+    hass_context.services.async_register("light", "turn_on", handle)
+    return finished
+
+
+async def test_service_error_is_reported_per_entity(hass_context: HomeAssistant):
+    """The error of a failed service call is told for each of its entities."""
+    hass_context.states.async_set("light.kitchen", "off")
+    hass_context.states.async_set("light.hallway", "off")
+
+    async def handle(call: ServiceCall) -> None:
+        raise HomeAssistantError("Device is offline")
+
+    hass_context.services.async_register("light", "turn_on", handle)
+
+    result = await make_service_call(["light.kitchen", "light.hallway"], "turn_on", "hass_turn_on")
+
+    assert result.startswith("Failure")
+    assert "light.kitchen (Device is offline), light.hallway (Device is offline)" in result
+
+
+async def test_timed_out_service_call_keeps_running(hass_context: HomeAssistant, slow_service):
+    """A service call that times out is not cancelled."""
+    result = await HomeAssistantService.async_call_service(
+        ["light.kitchen"], "light", "turn_on", timeout=0.01)
+
+    assert result.timed_out
+    assert not slow_service
+    await hass_context.async_block_till_done()
+    assert len(slow_service) == 1
+
+
+async def test_cancelled_caller_leaves_service_call_running(hass_context: HomeAssistant, slow_service):
+    """Cancelling the caller, such as when the turn runs out of time, doesn't cancel the service call."""
+    caller = asyncio.create_task(HomeAssistantService.async_call_service(
+        ["light.kitchen"], "light", "turn_on"))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+
+    await hass_context.async_block_till_done()
+    assert len(slow_service) == 1
@@ -0,0 +1,43 @@
+"""Tests for keeping conversations across restarts."""
+
+from unittest.mock import patch
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.ai_assistant.agent import AIConversationAgent
+from custom_components.ai_assistant.api import VllmApiClient
+from custom_components.ai_assistant.const import CONF_BASE_URL, CONF_HISTORY_PERSIST, DOMAIN
+from custom_components.ai_assistant.history import (
+    ConversationHistoryStorage,
+    async_remove_conversation_history_storage,
+)
+
+BASE_URL = "http://vllm.local:8000"
+
+
+async def test_history_is_not_persisted_by_default(hass: HomeAssistant, aioclient_mock):
+    """Conversations are only written to disk when the option is turned on."""
+    session = aioclient_mock.create_session(hass.loop)
+    client = VllmApiClient(BASE_URL, 10, session)
+
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_BASE_URL: BASE_URL})
+    assert AIConversationAgent(hass, entry, client).history_storage is None
+
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_BASE_URL: BASE_URL},
+                            options={CONF_HISTORY_PERSIST: True})
+    assert AIConversationAgent(hass, entry, client).history_storage is not None
+    await session.close()
+
+
+async def test_history_is_stored_privately(hass: HomeAssistant, hass_storage):
+    """Every store of the conversations is private, so backups mark them as such."""
+    with patch("custom_components.ai_assistant.history.Store", wraps=Store) as store:
+        storage = ConversationHistoryStorage(hass, "entry", max_conversations=10, idle_ttl=600)
+        storage.async_save("conversation", [{"role": "user", "content": "Unlock the front door"}])
+        await storage.async_flush()
+        await async_remove_conversation_history_storage(hass, "entry")
+
+    assert store.call_count == 4
+    assert all(call.kwargs.get("private") is True for call in store.call_args_list)
@@ -0,0 +1,31 @@
+"""Tests for setting up the integration."""
+
+from unittest.mock import patch
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.ai_assistant.const import (
+    CONF_BASE_URL,
+    DATA_CONNECTION_POOL,
+    DOMAIN,
+)
+
+
+async def test_connection_pool_closes_with_home_assistant(hass: HomeAssistant):
+    """The connection pool is closed when Home Assistant stops."""
+    assert await async_setup_component(hass, "homeassistant", {})
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_BASE_URL: "http://vllm.local:8000"})
+    entry.add_to_hass(hass)
+
+    with patch("custom_components.ai_assistant.VllmApiClient.async_get_heartbeat", return_value=True):
+        assert await hass.config_entries.async_setup(entry.entry_id)
+    pool = hass.data[DOMAIN][entry.entry_id][DATA_CONNECTION_POOL]
+    assert not pool.session.closed
+
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_CLOSE)
+    await hass.async_block_till_done()
+
+    assert pool.session.closed
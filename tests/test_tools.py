@@ -0,0 +1,115 @@
+"""Tests for resolving entity IDs and suggesting tool calls."""
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+
+from custom_components.ai_assistant.entity_index import (
+    async_get_entity_index,
+    async_release_entity_index,
+)
+from custom_components.ai_assistant.entity_resolver import (
+    async_get_entity_resolver,
+    async_release_entity_resolver,
+)
+from custom_components.ai_assistant.tools import (
+    TOOL_DOES_NOT_EXIST,
+    TOOL_NAMES,
+    ToolCallResult,
+    get_tool_schema_bundle,
+    resolve_entity_id,
+    suggest_tool_call,
+)
+
+
+@pytest.fixture
+async def exposed_entities(hass_context: HomeAssistant):
+    """Expose a few lights and a switch to the resolver."""
+    assert await async_setup_component(hass_context, "homeassistant", {})
+    hass_context.states.async_set(
+        "light.kitchen_ceiling", "off", {"friendly_name": "Kitchen Ceiling"})
+    hass_context.states.async_set(
+        "light.living_room_lamp", "on", {"friendly_name": "Living Room Lamp"})
+    hass_context.states.async_set(
+        "switch.coffee_maker", "off", {"friendly_name": "Coffee Maker"})
+    async_get_entity_index(hass_context)
+    async_get_entity_resolver(hass_context)
+    yield hass_context
+    async_release_entity_resolver(hass_context)
+    async_release_entity_index(hass_context)
+
+
+async def test_resolve_existing_entity_id(exposed_entities):
+    """An entity that exists in a supported domain is used as is."""
+    result = ToolCallResult()
+    assert resolve_entity_id("light.kitchen_ceiling", result, "hass_turn_on") == "light.kitchen_ceiling"
+    assert str(result) == "Failure"
+
+
+async def test_resolve_corrects_misspelled_entity_id(exposed_entities):
+    """A clear match for an entity that doesn't exist replaces it."""
+    result = ToolCallResult()
+    assert resolve_entity_id("light.kitchen_cieling", result, "hass_turn_on") == "light.kitchen_ceiling"
+    assert result.corrected_entity_ids
+    assert "light.kitchen_cieling" in str(result)
+
+
+async def test_resolve_name_without_domain(exposed_entities):
+    """A name is resolved to the entity it names."""
+    result = ToolCallResult()
+    assert resolve_entity_id("Living Room Lamp", result, "hass_turn_on") == "light.living_room_lamp"
+
+
+async def test_resolve_unknown_entity_id(exposed_entities):
+    """An entity ID matching nothing is reported as unknown."""
+    result = ToolCallResult()
+    assert resolve_entity_id("light.garage_door_opener", result, "hass_turn_on") is None
+    assert "light.garage_door_opener" in result.unknown_entity_ids[0]
+    assert "do not exist" in str(result)
+
+
+async def test_resolve_unsupported_domain(exposed_entities):
+    """An entity in a domain the tool doesn't support is rejected."""
+    result = ToolCallResult()
+    assert resolve_entity_id("switch.coffee_maker", result, "hass_get_agenda") is None
+    assert result.domain_not_supported_entity_ids == ["switch.coffee_maker"]
+
+
+async def test_suggest_tool_call(exposed_entities):
+    """Suggestions name the tools for the domains and describe the bad entity IDs."""
+    suggestions = suggest_tool_call(["light.kitchen_ceiling", "light.kitchen_cieling", "kitchen"])
+
+    assert suggestions.invalid_entity_ids == ["kitchen"]
+    assert len(suggestions.unknown_entity_ids) == 1
+    assert "light.kitchen_ceiling" in suggestions.unknown_entity_ids[0]
+    assert "hass_turn_on" in suggestions.suggested_tool_calls
+
+    description = str(suggestions)
+    assert description.startswith(TOOL_DOES_NOT_EXIST)
+    assert "the following entity IDs are invalid: kitchen" in description
+    assert "do not exist: light.kitchen_cieling" in description
+
+
+async def test_suggest_tool_call_for_existing_entities(exposed_entities):
+    """Suggestions for entities that exist only list the tools."""
+    suggestions = suggest_tool_call("switch.coffee_maker")
+
+    assert suggestions.unknown_entity_ids == []
+    assert suggestions.invalid_entity_ids == []
+    assert str(suggestions).startswith(TOOL_DOES_NOT_EXIST)
+    assert "do not exist" not in str(suggestions)
+
+
+async def test_suggest_tool_call_rejects_non_strings(exposed_entities):
+    """Entity IDs must be strings."""
+    with pytest.raises(ValueError):
+        suggest_tool_call([1, 2])
+
+
+def test_tool_schema_bundle_is_built_once():
+    """The schemas are built on first use, for every tool, and reused after."""
+    bundle = get_tool_schema_bundle()
+
+    assert tuple(bundle.by_name) == TOOL_NAMES
+    assert get_tool_schema_bundle() is bundle